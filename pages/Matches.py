@@ -12,6 +12,11 @@ seasons = utils_match.get_seasons_list()
 selected_season = st.selectbox("Select a season", seasons,
                                format_func=lambda x: "Season " + str(x))
 
+# Record of our club and totals of its players in the selected season
+components_match.component_season_summary(
+    utils_match.get_season_summary(selected_season),
+    utils_match.get_season_players(selected_season))
+
 # Get matches ids and matches from selected season
 matches_ids_selected_season, matches_clubs = utils_match.get_matches_season(
     selected_season)
@@ -24,26 +24,26 @@ CREATE TABLE Clubs (
 
 CREATE TABLE Players (
         name TEXT PRIMARY KEY,
-        gamesPlayed TEXT,
-        winRate TEXT,
-        goals TEXT,
-        assists TEXT,
-        cleanSheetsDef TEXT,
-        cleanSheetsGK TEXT,
-        shotSuccessRate TEXT,
-        passesMade TEXT,
-        passSuccessRate TEXT,
-        tacklesMade TEXT,
-        tackleSuccessRate TEXT,
+        gamesPlayed INTEGER,
+        winRate INTEGER,
+        goals INTEGER,
+        assists INTEGER,
+        cleanSheetsDef INTEGER,
+        cleanSheetsGK INTEGER,
+        shotSuccessRate INTEGER,
+        passesMade INTEGER,
+        passSuccessRate INTEGER,
+        tacklesMade INTEGER,
+        tackleSuccessRate INTEGER,
         proName TEXT,
-        proPos TEXT,
-        proStyle TEXT,
-        proHeight TEXT,
-        proNationality TEXT,
-        proOverall TEXT,
-        manOfTheMatch TEXT,
-        redCards TEXT,
-        prevGoals TEXT,
+        proPos INTEGER,
+        proStyle INTEGER,
+        proHeight INTEGER,
+        proNationality INTEGER,
+        proOverall INTEGER,
+        manOfTheMatch INTEGER,
+        redCards INTEGER,
+        prevGoals INTEGER,
         favoritePosition TEXT,
         clubId TEXT,
         FOREIGN KEY (clubId) REFERENCES Clubs (clubId)
@@ -51,23 +51,23 @@ CREATE TABLE Players (
 
 CREATE TABLE Matches (
         matchId TEXT PRIMARY KEY,
-        timestamp TEXT
+        timestamp INTEGER
     );
 
 CREATE TABLE ClubsMatches (
         clubId TEXT,
         matchId TEXT,
-        gameNumber TEXT,
-        goals TEXT,
-        goalsAgainst TEXT,
-        losses TEXT,
-        result TEXT,
-        score TEXT,
-        season_id TEXT,
-        TEAM TEXT,
-        ties TEXT,
-        winnerByDnf TEXT,
-        wins TEXT,
+        gameNumber INTEGER,
+        goals INTEGER,
+        goalsAgainst INTEGER,
+        losses INTEGER,
+        result INTEGER,
+        score INTEGER,
+        season_id INTEGER,
+        TEAM INTEGER,
+        ties INTEGER,
+        winnerByDnf INTEGER,
+        wins INTEGER,
         PRIMARY KEY (clubId, matchId),
         FOREIGN KEY (clubId) REFERENCES Clubs (clubId),
         FOREIGN KEY (matchId) REFERENCES Matches (matchId)
@@ -75,30 +75,30 @@ CREATE TABLE ClubsMatches (
 
 CREATE TABLE PlayersMatches (
         playerId TEXT,
-        assists TEXT,
-        cleansheetsany TEXT,
-        cleansheetsdef TEXT,
-        cleansheetsgk TEXT,
-        goals TEXT,
-        goalsconceded TEXT,
-        losses TEXT,
-        mom TEXT,
+        assists INTEGER,
+        cleansheetsany INTEGER,
+        cleansheetsdef INTEGER,
+        cleansheetsgk INTEGER,
+        goals INTEGER,
+        goalsconceded INTEGER,
+        losses INTEGER,
+        mom INTEGER,
         namespace TEXT,
-        passattempts TEXT,
-        passesmade TEXT,
+        passattempts INTEGER,
+        passesmade INTEGER,
         pos TEXT,
-        rating TEXT,
-        realtimegame TEXT,
-        realtimeidle TEXT,
-        redcards TEXT,
-        saves TEXT,
-        SCORE TEXT,
-        shots TEXT,
-        tackleattempts TEXT,
-        tacklesmade TEXT,
+        rating REAL,
+        realtimegame INTEGER,
+        realtimeidle INTEGER,
+        redcards INTEGER,
+        saves INTEGER,
+        SCORE INTEGER,
+        shots INTEGER,
+        tackleattempts INTEGER,
+        tacklesmade INTEGER,
         vproattr TEXT,
         vprohackreason TEXT,
-        wins TEXT,
+        wins INTEGER,
         playername TEXT,
         matchId TEXT,
         clubId TEXT,
@@ -111,30 +111,30 @@ CREATE TABLE PlayersMatches (
 CREATE TABLE ClubsMatchesAgg (
         clubId TEXT,
         matchId TEXT,
-        assists TEXT,
-        cleansheetsany TEXT,
-        cleansheetsdef TEXT,
-        cleansheetsgk TEXT,
-        goals TEXT,
-        goalsconceded TEXT,
-        losses TEXT,
-        mom TEXT,
+        assists INTEGER,
+        cleansheetsany INTEGER,
+        cleansheetsdef INTEGER,
+        cleansheetsgk INTEGER,
+        goals INTEGER,
+        goalsconceded INTEGER,
+        losses INTEGER,
+        mom INTEGER,
         namespace TEXT,
-        passattempts TEXT,
-        passesmade TEXT,
+        passattempts INTEGER,
+        passesmade INTEGER,
         pos TEXT,
-        rating TEXT,
-        realtimegame TEXT,
-        realtimeidle TEXT,
-        redcards TEXT,
-        saves TEXT,
-        SCORE TEXT,
-        shots TEXT,
-        tackleattempts TEXT,
-        tacklesmade TEXT,
+        rating REAL,
+        realtimegame INTEGER,
+        realtimeidle INTEGER,
+        redcards INTEGER,
+        saves INTEGER,
+        SCORE INTEGER,
+        shots INTEGER,
+        tackleattempts INTEGER,
+        tacklesmade INTEGER,
         vproattr TEXT,
         vprohackreason TEXT,
-        wins TEXT,
+        wins INTEGER,
         PRIMARY KEY (clubId, matchId),
         FOREIGN KEY (clubId) REFERENCES Clubs (clubId),
         FOREIGN KEY (matchId) REFERENCES Matches (matchId)
@@ -249,3 +249,12 @@ CREATE TABLE Seasonals (
         FOREIGN KEY (clubId) REFERENCES Clubs (clubId)
     );
 
+CREATE TABLE SyncState (
+        clubId TEXT,
+        matchType TEXT,
+        lastMatchId TEXT,
+        lastTimestamp INTEGER,
+        updatedAt INTEGER,
+        PRIMARY KEY (clubId, matchType)
+    );
+
@@ -0,0 +1,176 @@
+"""Archive of the raw API responses. Every response received from the API is
+appended to a gzip-compressed JSON Lines file, one file per day, endpoint
+and segment (data/archive/YYYY/MM/DD/<endpoint>.<segment>.jsonl.gz), so the
+database can be rebuilt from what the API really returned (see
+src/replay.py) instead of scrapping it again.
+
+Each line is a JSON object with the endpoint, the query parameters, the time
+the response was received and the body as returned by the API. Each line is
+also a gzip member of its own, and a process never appends to a file after a
+member that may be cut in half: every archive writes to new segments, and
+starts new ones after a write that failed. The files are read member by
+member, skipping the damaged ones.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlparse
+
+
+ARCHIVE_FOLDER = "data/archive"
+
+API_PATH = "/api/fifa/"
+
+# First bytes of a gzip member: the magic number and the deflate method
+GZIP_MAGIC = b"\x1f\x8b\x08"
+
+
+def get_endpoint(url: str) -> str:
+    """Name of the endpoint of a URL, such as clubs/info."""
+    return urlparse(url).path.split(API_PATH, 1)[-1].strip("/")
+
+
+class ResponseArchive:
+    """Append-only archive of responses. Each response is written as a new
+    gzip member, so a crash can only lose the response being written.
+
+    Attributes:
+        folder: Root folder of the archive.
+        writer_id: Added to the file names, so that many processes can
+            archive at the same time without sharing files. None in a single
+            process.
+        segment: Added to the file names, so that each archive, and each
+            one after a failed write, starts new files.
+    """
+    def __init__(self, folder: str = ARCHIVE_FOLDER,
+                 writer_id: str = None) -> None:
+        self.folder = folder
+        self.writer_id = writer_id
+        self._lock = threading.Lock()
+        self.new_segment()
+
+    def new_segment(self):
+        """Write the next responses to new files."""
+        self.segment = (time.strftime("%H%M%S", time.gmtime()) + "-" +
+                        uuid.uuid4().hex[:8])
+
+    def path(self, endpoint: str, fetched_at: float) -> str:
+        """Path of the file of an endpoint in the day of fetched_at."""
+        day = time.strftime("%Y/%m/%d", time.gmtime(fetched_at))
+        name = endpoint.replace("/", "_")
+        if self.writer_id is not None:
+            name += f".{self.writer_id}"
+        return os.path.join(self.folder, day,
+                            f"{name}.{self.segment}.jsonl.gz")
+
+    def append(self, url: str, params: dict, body: bytes):
+        """Archive a response.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            body (bytes): The body of the response, which must be JSON.
+        """
+        self.append_chunks(url, params, [body])
+
+    def append_chunks(self, url: str, params: dict, chunks):
+        """Archive a response read in chunks, without joining them.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            chunks: Iterable of the bytes of the body, which must be JSON.
+        """
+        fetched_at = time.time()
+        endpoint = get_endpoint(url)
+        header = json.dumps({"endpoint": endpoint, "params": params or {},
+                             "fetched_at": fetched_at})
+
+        with self._lock:
+            path = self.path(endpoint, fetched_at)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                with gzip.open(path, "ab") as f:
+                    f.write(header[:-1].encode() + b', "body": ')
+                    # The body is written as it came, only without line
+                    # breaks, which in JSON can only be whitespace.
+                    for chunk in chunks:
+                        f.write(chunk.replace(b"\r", b" ")
+                                .replace(b"\n", b" "))
+                    f.write(b"}\n")
+            except BaseException:
+                # The member may be cut in half, or hold half a record
+                self.new_segment()
+                raise
+
+
+def iter_members(data: bytes):
+    """Decompress the gzip members of a file one at a time. A damaged
+    member, like one cut in half by a crash, is skipped, and the reading
+    goes on from the next gzip header after its start.
+
+    Args:
+        data (bytes): The content of the file.
+
+    Yields:
+        bytes: The decompressed content of each complete member.
+    """
+    view = memoryview(data)
+    start = 0
+    while start < len(data):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            content = decompressor.decompress(view[start:])
+            complete = decompressor.eof
+        except zlib.error:
+            complete = False
+        if complete:
+            yield content
+            start = len(data) - len(decompressor.unused_data)
+            continue
+        start = data.find(GZIP_MAGIC, start + 1)
+        if start < 0:
+            return
+
+
+def read_records(path: str) -> list:
+    """Read all the records of an archive file. The damaged members and the
+    records cut in half are skipped, and the ones after them are still
+    read.
+
+    Args:
+        path (str): Path of the archive file.
+
+    Returns:
+        list: The records, as dictionaries.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    records = []
+    for content in iter_members(data):
+        for line in content.splitlines():
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                pass
+    return records
+
+
+def list_days(folder: str = ARCHIVE_FOLDER) -> list:
+    """List the day folders of the archive, from the oldest to the newest.
+
+    Args:
+        folder (str): Root folder of the archive.
+
+    Returns:
+        list: The paths of the day folders.
+    """
+    days = []
+    for root, _, files in os.walk(folder):
+        if any(file.endswith(".jsonl.gz") for file in files):
+            days.append(root)
+    return sorted(days)
@@ -0,0 +1,221 @@
+"""Benchmark the analytical queries of src/query_backend.py on copies of the
+database scaled to several times its size: loading whole tables into pandas
+and filtering there, as src/utils does, against running the queries in
+SQLite, in DuckDB attached to the SQLite file and in DuckDB over the Parquet
+exports.
+
+The copies are made of the rows of ClubsMatches, Matches and PlayersMatches
+repeated with new club IDs, match IDs and player names, as if many more
+clubs were scraped. Our club keeps its own rows only.
+
+Usage:
+    python -m src.benchmark_backends --scales 1 10 100
+"""
+import argparse
+import os
+import tempfile
+import time
+import pandas as pd
+import src.database as database
+import src.export_parquet as export_parquet
+import src.query_backend as query_backend
+
+
+# Added to the club IDs of each copy of the rows, larger than any real ID
+CLUB_ID_OFFSET = 10 ** 9
+
+APPROACHES = ["sqlite+pandas", "sqlite", "duckdb", "duckdb+parquet"]
+
+
+def scale_database(source_file: str, database_file: str, scale: int):
+    """Copy a database with the match rows repeated scale times.
+
+    Args:
+        source_file (str): Path of the database to copy.
+        database_file (str): Path of the copy.
+        scale (int): How many times the rows are in the copy.
+    """
+    source = database.connect(source_file, read_only=True)
+    connection = database.connect(database_file)
+    source.backup(connection)
+    source.close()
+    with connection:
+        for copy in range(1, scale):
+            offset = copy * CLUB_ID_OFFSET
+            suffix = f"#{copy}"
+            connection.execute(
+                """INSERT INTO Matches SELECT matchId || ?, timestamp,
+                    homeClub + ?, awayClub + ?, homeGoals, awayGoals,
+                    createdAt, updatedAt
+                FROM Matches WHERE matchId NOT LIKE '%#%'""",
+                (suffix, offset, offset))
+            connection.execute(
+                """INSERT INTO ClubsMatches SELECT clubMatchId || ?,
+                    clubId + ?, matchId || ?, passattempts, passesmade,
+                    rating, shots, goals, goalsConceded, assists,
+                    tackleattempts, tacklesmade, createdAt, updatedAt,
+                    seasonid
+                FROM ClubsMatches WHERE matchId NOT LIKE '%#%'""",
+                (suffix, offset, suffix))
+            connection.execute(
+                """INSERT INTO PlayersMatches SELECT memberMatchId || ?,
+                    name || ?, matchId || ?, passattempts, passesmade,
+                    rating, shots, goals, mom, assists, tackleattempts,
+                    tacklesmade, pos, vproattr, createdAt, updatedAt,
+                    clubid + ?
+                FROM PlayersMatches WHERE matchId NOT LIKE '%#%'""",
+                (suffix, suffix, suffix, offset))
+    connection.close()
+
+
+def read_table(connection, table: str) -> pd.DataFrame:
+    """Read a whole table into a DataFrame, like the functions of
+    src/utils."""
+    cursor = connection.execute(f"SELECT * FROM {table}")
+    columns = [description[0] for description in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def run_pandas(connection, name: str, parameters: tuple) -> pd.DataFrame:
+    """Run one of the queries of query_backend.QUERIES by reading the whole
+    tables and filtering and grouping them in pandas.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        name (str): Name of the query.
+        parameters (tuple): Its parameters.
+
+    Returns:
+        pd.DataFrame: The rows of the result.
+    """
+    clubs_matches = read_table(connection, "ClubsMatches")
+    clubs_matches = clubs_matches[clubs_matches["seasonid"].notna()]
+    if name == "seasons":
+        club_id, = parameters
+        seasons = clubs_matches[clubs_matches["clubId"] == club_id]
+        return pd.DataFrame(
+            {"seasonid": sorted(seasons["seasonid"].unique())})
+
+    clubs_matches = clubs_matches.assign(
+        win=clubs_matches["goals"] > clubs_matches["goalsConceded"],
+        draw=clubs_matches["goals"] == clubs_matches["goalsConceded"],
+        loss=clubs_matches["goals"] < clubs_matches["goalsConceded"])
+    if name == "season_results":
+        club_id, = parameters
+        club_matches = clubs_matches[clubs_matches["clubId"] == club_id]
+        return club_matches.groupby("seasonid").agg(
+            matches=("matchId", "count"), wins=("win", "sum"),
+            draws=("draw", "sum"), losses=("loss", "sum"),
+            goals=("goals", "sum"),
+            goalsConceded=("goalsConceded", "sum")).reset_index()
+
+    if name == "season_tables":
+        clubs_matches = clubs_matches.assign(
+            points=3 * clubs_matches["win"] + clubs_matches["draw"],
+            goalDifference=(clubs_matches["goals"] -
+                            clubs_matches["goalsConceded"]))
+        tables = clubs_matches.groupby(["seasonid", "clubId"]).agg(
+            matches=("matchId", "count"), points=("points", "sum"),
+            goalDifference=("goalDifference", "sum")).reset_index()
+        return tables.sort_values(
+            ["seasonid", "points", "goalDifference", "clubId"],
+            ascending=[True, False, False, True])
+
+    players_matches = read_table(connection, "PlayersMatches")
+    if name == "top_scorers":
+        scorers = players_matches.groupby("name").agg(
+            matches=("matchId", "count"), goals=("goals", "sum"))
+        return scorers.reset_index().sort_values(
+            ["goals", "name"], ascending=[False, True]).head(20)
+
+    club_id, = parameters
+    players_matches = players_matches[players_matches["clubid"] == club_id]
+    players_matches = players_matches.merge(
+        clubs_matches[["matchId", "clubId", "seasonid"]],
+        left_on=["matchId", "clubid"], right_on=["matchId", "clubId"])
+    return players_matches.groupby(["seasonid", "name"]).agg(
+        matches=("matchId", "count"), goals=("goals", "sum"),
+        assists=("assists", "sum"), mom=("mom", "sum"),
+        rating=("rating", "mean")).reset_index()
+
+
+def time_query(run, repeats: int) -> tuple:
+    """The best time of some runs of a query, and the rows of its result."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = len(run())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def benchmark(source_file: str, folder: str, scale: int,
+              repeats: int) -> dict:
+    """Time the queries with every approach on a scaled copy of a
+    database.
+
+    Args:
+        source_file (str): Path of the database.
+        folder (str): Folder of the copy and its Parquet exports.
+        scale (int): How many times the rows are in the copy.
+        repeats (int): Runs of each query, the best one is kept.
+
+    Returns:
+        dict: For each query and approach, the best time in seconds and the
+            number of rows of the result.
+    """
+    database_file = os.path.join(folder, f"scale_{scale}.db")
+    parquet_folder = os.path.join(folder, f"parquet_{scale}")
+    scale_database(source_file, database_file, scale)
+    connection = database.connect(database_file, read_only=True,
+                                  check_same_thread=False)
+    for name, query in export_parquet.get_queries(connection).items():
+        export_parquet.export(connection, name, query, parquet_folder)
+
+    backends = {
+        "sqlite": query_backend.SQLiteBackend(database_file),
+        "duckdb": query_backend.DuckDBBackend(database_file),
+        "duckdb+parquet": query_backend.DuckDBBackend(
+            parquet_folder=parquet_folder),
+    }
+    results = {}
+    for name, parameters in query_backend.PARAMETERS.items():
+        query = query_backend.QUERIES[name]
+        results[name] = {"sqlite+pandas": time_query(
+            lambda: run_pandas(connection, name, parameters), repeats)}
+        for approach, backend in backends.items():
+            results[name][approach] = time_query(
+                lambda: backend.dataframe(query, parameters), repeats)
+
+    for backend in backends.values():
+        backend.close()
+    connection.close()
+    return results
+
+
+def main():
+    """Run the benchmark at the scales of the command line and print the
+    times in milliseconds."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=database.APP_DATABASE_FILE)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in args.scales:
+            results = benchmark(args.database, folder, scale, args.repeats)
+            print(f"\n{scale}x data, best of {args.repeats} runs in ms")
+            print(f"{'query':<22}" +
+                  "".join(f"{approach:>16}" for approach in APPROACHES))
+            for name, times in results.items():
+                print(f"{name:<22}" + "".join(
+                    f"{times[approach][0] * 1000:>16.1f}"
+                    for approach in APPROACHES))
+                if len({rows for _, rows in times.values()}) > 1:
+                    print(f"  Different numbers of rows: {times}")
+
+
+if __name__ == "__main__":
+    main()
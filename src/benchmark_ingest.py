@@ -0,0 +1,121 @@
+"""Benchmark the writing of the matches into the database: the old way, with
+one statement and one commit per row, against scrapper.insert_matches, with
+one executemany per table in a single transaction. The payload is synthetic,
+built by the mock API (src/mock_api.py).
+
+The old way is much slower, so by default it only writes part of the
+payload. The rows per second are comparable anyway.
+
+Usage:
+    python -m src.benchmark_ingest --matches 10000 --legacy-matches 500
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import src.create_mock_db as create_mock_db
+import src.mock_api as mock_api
+import src.scrapper as scrapper
+
+
+def insert_matches_per_row(connection: sqlite3.Connection, response: list):
+    """Insert the matches as scrapper.insert_matches used to, with a new
+    cursor and a commit for every row.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        response (list): The matches, as returned by the API.
+    """
+    def insert(table: str, row: dict):
+        cursor = connection.cursor()
+        columns = ", ".join(row.keys())
+        placeholders = ", ".join(["?" for _ in row.keys()])
+        cursor.execute(f"""INSERT OR REPLACE INTO {table}
+                       ({columns}) VALUES ({placeholders})""",
+                       tuple(row.values()))
+        connection.commit()
+        cursor.close()
+
+    for match in response:
+        insert("Matches", {"matchId": match["matchId"],
+                           "timestamp": match["timestamp"]})
+        for key, value in match["clubs"].items():
+            club_dict = dict(value, matchId=match["matchId"], clubId=key)
+            club_dict.pop("details")
+            insert("ClubsMatches", club_dict)
+        for club_key, club_value in match["players"].items():
+            for player_key, player_value in club_value.items():
+                insert("PlayersMatches",
+                       dict(player_value, matchId=match["matchId"],
+                            clubId=club_key, playerId=player_key))
+        for key, value in match["aggregate"].items():
+            insert("ClubsMatchesAgg",
+                   dict(value, matchId=match["matchId"], clubId=key))
+
+
+def insert_matches_transaction(connection: sqlite3.Connection,
+                               response: list):
+    """Insert the matches with scrapper.insert_matches."""
+    scrapper.insert_matches(connection, scrapper.CLUB_ID, response)
+
+
+def synthetic_matches(n_matches: int) -> list:
+    """Build a response of /clubs/matches with n_matches matches.
+
+    Args:
+        n_matches (int): Number of matches.
+
+    Returns:
+        list: The matches.
+    """
+    return [mock_api.match_payload(scrapper.CLUB_ID, match_index)
+            for match_index in range(n_matches)]
+
+
+def count_rows(response: list) -> int:
+    """Number of rows written for a response of /clubs/matches."""
+    return sum(1 + len(match["clubs"]) + len(match["aggregate"]) +
+               sum(len(players) for players in match["players"].values())
+               for match in response)
+
+
+def benchmark(insert_function, response: list, folder: str) -> float:
+    """Write the response into a new mock database.
+
+    Returns:
+        float: The rows written per second.
+    """
+    database_file = os.path.join(folder, f"{insert_function.__name__}.db")
+    create_mock_db.main(database_file)
+    connection = sqlite3.connect(database_file)
+    start = time.perf_counter()
+    insert_function(connection, response)
+    elapsed = time.perf_counter() - start
+    connection.close()
+
+    return count_rows(response) / elapsed
+
+
+def main():
+    """Run both ways of writing and print the rows per second of each."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--matches", type=int, default=10000)
+    parser.add_argument("--legacy-matches", type=int, default=500,
+                        help="Matches written the old way.")
+    args = parser.parse_args()
+
+    response = synthetic_matches(args.matches)
+    print(f"Payload: {args.matches} matches, {count_rows(response)} rows")
+
+    with tempfile.TemporaryDirectory() as folder:
+        legacy = benchmark(insert_matches_per_row,
+                           response[:args.legacy_matches], folder)
+        bulk = benchmark(insert_matches_transaction, response, folder)
+
+    print(f"    per row: {legacy:10.0f} rows/s")
+    print(f"transaction: {bulk:10.0f} rows/s ({bulk / legacy:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
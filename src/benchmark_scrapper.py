@@ -0,0 +1,171 @@
+"""Benchmark the throughput of the scrapper against the local mock API
+(src/mock_api.py): clubs updated per minute, requests per second and rows
+written per second, for the sequential scrapper and the concurrent crawler
+at several levels of concurrency. Each run writes to a new mock database.
+
+Usage:
+    python -m src.benchmark_scrapper --clubs 50 --concurrency 0 4 16
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import src.client as client
+import src.create_mock_db as create_mock_db
+import src.crawler as crawler
+import src.mock_api as mock_api
+import src.scrapper as scrapper
+
+
+# Tables written when updating a club
+TABLES = ["Clubs", "Players", "Matches", "ClubsMatches", "PlayersMatches",
+          "ClubsMatchesAgg", "Seasonals"]
+
+
+def create_benchmark_database(database_file: str, n_clubs: int):
+    """Create an empty mock database where our club played against n_clubs
+    other clubs, so that there are clubs to update.
+
+    Args:
+        database_file (str): Path of the database to create.
+        n_clubs (int): Number of other clubs.
+    """
+    create_mock_db.main(database_file)
+    connection = sqlite3.connect(database_file)
+    connection.executemany(
+        "INSERT INTO ClubsMatches (clubId, matchId) VALUES (?, ?)",
+        [(club_id, club_id) for club_id in range(1, n_clubs + 1)])
+    connection.commit()
+    connection.close()
+
+
+def count_rows(database_file: str) -> int:
+    """Total number of rows of the tables written by the scrapper."""
+    connection = sqlite3.connect(database_file)
+    rows = sum(connection.execute(f"SELECT COUNT(*) FROM {table}")
+               .fetchone()[0] for table in TABLES)
+    connection.close()
+    return rows
+
+
+def new_client(requests_per_second: float) -> client.APIClient:
+    """Create a client without cache or archive, so every run makes all its
+    requests and counts only its own."""
+    return scrapper.make_client(requests_per_second,
+                                burst=requests_per_second, cache=None,
+                                archive=None)
+
+
+def run_sequential(database_file: str,
+                   api_client: client.APIClient) -> float:
+    """Update the other clubs with scrapper.update_other_clubs.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    scrapper.DATABASE_FILE = database_file
+    scrapper.set_client(api_client)
+    start = time.perf_counter()
+    scrapper.update_other_clubs()
+    return time.perf_counter() - start
+
+
+def run_crawler(database_file: str, concurrency: int,
+                requests_per_second: float,
+                api_client: client.APIClient) -> float:
+    """Update the other clubs with the concurrent crawler.
+
+    Returns:
+        float: The elapsed time in seconds.
+    """
+    stats = crawler.crawl_other_clubs(database_file, concurrency,
+                                      requests_per_second, api_client)
+    return stats["elapsed"]
+
+
+def benchmark(folder: str, n_clubs: int, concurrency: int,
+              requests_per_second: float) -> dict:
+    """Update n_clubs clubs in a new database and measure the throughput.
+
+    Args:
+        folder (str): Folder of the database.
+        n_clubs (int): Number of clubs to update.
+        concurrency (int): Requests in flight of the crawler, or 0 for the
+            sequential scrapper.
+        requests_per_second (float): Maximum requests per second.
+
+    Returns:
+        dict: Elapsed seconds, clubs per minute, requests (attempts) and
+            failed attempts per second, and rows written per second.
+    """
+    database_file = os.path.join(folder, f"concurrency_{concurrency}.db")
+    create_benchmark_database(database_file, n_clubs)
+    rows_before = count_rows(database_file)
+
+    if concurrency == 0:
+        api_client = new_client(requests_per_second)
+        elapsed = run_sequential(database_file, api_client)
+    else:
+        # The crawler throttles the requests itself
+        api_client = new_client(None)
+        elapsed = run_crawler(database_file, concurrency,
+                              requests_per_second, api_client)
+
+    report = api_client.latency_report().values()
+    requests = sum(stats["requests"] for stats in report)
+    errors = sum(stats["errors"] for stats in report)
+    rows = count_rows(database_file) - rows_before
+    return {
+        "elapsed": elapsed,
+        "clubs_per_minute": n_clubs / elapsed * 60,
+        "requests_per_second": requests / elapsed,
+        "errors": errors,
+        "rows_per_second": rows / elapsed
+    }
+
+
+def main():
+    """Run the scrapper at each concurrency level and print the throughput
+    of each one."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clubs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[0, 1, 4, 8, 16, 32],
+                        help="Levels of concurrency of the crawler. 0 is the "
+                             "sequential scrapper.")
+    parser.add_argument("--rate", type=float, default=1000)
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="Seconds the mock API waits for each request.")
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0)
+    parser.add_argument("--members", type=int,
+                        default=mock_api.MEMBERS_PER_CLUB)
+    parser.add_argument("--matches", type=int,
+                        default=mock_api.MATCHES_PER_CLUB)
+    args = parser.parse_args()
+
+    server = mock_api.start_server(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, n_members=args.members,
+        n_matches=args.matches)
+    scrapper.API_URL = f"http://127.0.0.1:{server.server_port}/api/fifa"
+
+    print(f"{'concurrency':>12}{'elapsed':>10}{'clubs/min':>11}"
+          f"{'req/s':>9}{'errors':>8}{'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for concurrency in args.concurrency:
+            result = benchmark(folder, args.clubs, concurrency, args.rate)
+            name = str(concurrency) if concurrency else "sequential"
+            print(f"{name:>12}{result['elapsed']:>9.2f}s"
+                  f"{result['clubs_per_minute']:>11.0f}"
+                  f"{result['requests_per_second']:>9.1f}"
+                  f"{result['errors']:>8}"
+                  f"{result['rows_per_second']:>10.0f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
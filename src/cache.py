@@ -0,0 +1,242 @@
+"""On-disk cache of the API responses. Club info, seasonal stats and member
+stats rarely change between runs, so their responses are kept for a while
+(the TTL of each endpoint) and, after that, revalidated with the ETag and
+Last-Modified headers of the stored response. Bodies are stored compressed
+and the least recently used entries are evicted when the cache grows past
+its size limit. Bodies can also be read and written in chunks, for the
+responses that are streamed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Seconds a response is used without asking the API again. Endpoints that
+# aren't here aren't cached, like the matches, that change every game.
+TTLS = {
+    "clubs/info": 24 * 60 * 60,
+    "clubs/seasonalStats": 6 * 60 * 60,
+    "members/stats": 6 * 60 * 60,
+}
+
+CACHE_FOLDER = "data/cache"
+
+MAX_BYTES = 200 * 1024 * 1024
+
+
+class CacheEntry:
+    """A response stored in the cache.
+
+    Attributes:
+        body: The decompressed body of the response, or a file to read it
+            from, for the entries got with stream=True.
+        etag: The ETag header of the response, if any.
+        last_modified: The Last-Modified header of the response, if any.
+        stored_at: When the response was stored or revalidated.
+    """
+    def __init__(self, body: bytes, etag: str, last_modified: str,
+                 stored_at: float) -> None:
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+
+    def validation_headers(self) -> dict:
+        """Headers for a conditional request of this response."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CacheWriter:
+    """A response being stored in the cache chunk by chunk. The entry is
+    only replaced when the whole body was written and commit is called.
+
+    Attributes:
+        path: Path of the entry without extension.
+        suffix: Suffix of the temporary files.
+    """
+    def __init__(self, cache, path: str, etag: str,
+                 last_modified: str) -> None:
+        self._cache = cache
+        self.path = path
+        # Temporary files that are renamed at the end, so that other threads
+        # never read half an entry.
+        self.suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        self._etag = etag
+        self._last_modified = last_modified
+        self._file = gzip.open(path + ".gz" + self.suffix, "wb")
+
+    def write(self, chunk: bytes):
+        """Write the next chunk of the body."""
+        self._file.write(chunk)
+
+    def commit(self):
+        """Store the entry and evict old entries if the cache is full."""
+        self._file.close()
+        self._cache._write_meta(self.path, self.suffix, self._etag,
+                                self._last_modified)
+        os.replace(self.path + ".gz" + self.suffix, self.path + ".gz")
+        os.replace(self.path + ".json" + self.suffix, self.path + ".json")
+        self._cache.evict()
+
+    def abort(self):
+        """Drop the body written so far, keeping the old entry, if any."""
+        self._file.close()
+        try:
+            os.remove(self.path + ".gz" + self.suffix)
+        except FileNotFoundError:
+            pass
+
+
+class ResponseCache:
+    """Cache of responses keyed by endpoint and parameters. Each entry is a
+    gzip file with the body and a JSON file with the headers used to
+    revalidate it.
+
+    Attributes:
+        folder: Folder where the entries are stored.
+        max_bytes: Size of the stored bodies above which entries are evicted.
+        ttls: Seconds each endpoint is fresh.
+    """
+    def __init__(self, folder: str = CACHE_FOLDER, max_bytes: int = MAX_BYTES,
+                 ttls: dict = None) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.ttls = TTLS if ttls is None else ttls
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def ttl(self, url: str) -> float:
+        """Seconds a response of the endpoint is fresh, 0 if the endpoint
+        isn't cached."""
+        path = urlparse(url).path
+        for endpoint, ttl in self.ttls.items():
+            if path.endswith(endpoint):
+                return ttl
+        return 0
+
+    def _path(self, url: str, params: dict) -> str:
+        """Path of the entry without extension. The key is a hash of the
+        endpoint and the sorted parameters."""
+        params = sorted((key, str(value))
+                        for key, value in (params or {}).items())
+        key = hashlib.sha256(
+            json.dumps([urlparse(url).path, params]).encode()).hexdigest()
+        return os.path.join(self.folder, key)
+
+    def get(self, url: str, params: dict,
+            stream: bool = False) -> CacheEntry:
+        """Get a stored response, fresh or not.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            stream (bool): Whether to return the body as an open file,
+                which the caller closes, instead of reading it.
+
+        Returns:
+            CacheEntry: The entry, or None if the response isn't stored.
+        """
+        path = self._path(url, params)
+        try:
+            with open(path + ".json", "r") as f:
+                meta = json.load(f)
+            if stream:
+                body = gzip.open(path + ".gz", "rb")
+            else:
+                with gzip.open(path + ".gz", "rb") as f:
+                    body = f.read()
+        except (FileNotFoundError, EOFError, OSError, ValueError):
+            return None
+
+        # The modification time of the body is the last access, for the
+        # eviction
+        os.utime(path + ".gz")
+        return CacheEntry(body, meta["etag"], meta["last_modified"],
+                          meta["stored_at"])
+
+    def is_fresh(self, url: str, entry: CacheEntry) -> bool:
+        """Whether the entry can be used without asking the API."""
+        return time.time() - entry.stored_at < self.ttl(url)
+
+    def put(self, url: str, params: dict, body: bytes, etag: str = None,
+            last_modified: str = None):
+        """Store a response and evict old entries if the cache is full.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            body (bytes): The body of the response.
+            etag (str): The ETag header of the response.
+            last_modified (str): The Last-Modified header of the response.
+        """
+        writer = self.writer(url, params, etag, last_modified)
+        writer.write(body)
+        writer.commit()
+
+    def writer(self, url: str, params: dict, etag: str = None,
+               last_modified: str = None) -> CacheWriter:
+        """Start storing a response whose body is written in chunks.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            etag (str): The ETag header of the response.
+            last_modified (str): The Last-Modified header of the response.
+
+        Returns:
+            CacheWriter: The writer, to commit when the body is complete
+                or to abort.
+        """
+        return CacheWriter(self, self._path(url, params), etag,
+                           last_modified)
+
+    def refresh(self, url: str, params: dict, entry: CacheEntry):
+        """Mark an entry as fresh again, after the API answered 304 Not
+        Modified.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            entry (CacheEntry): The entry that is still valid.
+        """
+        path = self._path(url, params)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        self._write_meta(path, suffix, entry.etag, entry.last_modified)
+        os.replace(path + ".json" + suffix, path + ".json")
+
+    def _write_meta(self, path: str, suffix: str, etag: str,
+                    last_modified: str):
+        """Write the headers of an entry to a temporary file."""
+        with open(path + ".json" + suffix, "w") as f:
+            json.dump({"etag": etag, "last_modified": last_modified,
+                       "stored_at": time.time()}, f)
+
+    def evict(self):
+        """Remove the least recently used entries until the stored bodies
+        fit in max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.folder):
+                if entry.name.endswith(".gz"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for file_path in [path, path[:-len(".gz")] + ".json"]:
+                    try:
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
@@ -0,0 +1,101 @@
+"""Check that the lookups of src/utils/repository.py use the indexes of
+src.migrate. Each query is run with EXPLAIN QUERY PLAN against a copy of the
+database in memory, migrated to the latest version, and the check fails if
+any of them scans a whole table.
+
+The queries that read whole tables on purpose, like the list of all the
+clubs or the stadiums of the index of src/utils/club_info.py, are not
+checked.
+
+Usage:
+    python -m src.check_query_plans --database data/raw/clubedorobson.db
+"""
+import argparse
+import sqlite3
+import sys
+import src.migrate as migrate
+import src.utils.repository as repository
+
+
+# The filtered queries of src.utils.repository, with sample parameters
+QUERIES = {
+    "CLUB": (repository.CLUB, (6703918,)),
+    "CLUBS": (repository.CLUBS, ("[6703918, 1337408]",)),
+    "CLUB_LAST_MATCHES": (repository.CLUB_LAST_MATCHES, (6703918, 6703918)),
+    "SEASONS": (repository.SEASONS, (6703918,)),
+    "SEASON_SUMMARY": (repository.SEASON_SUMMARY, (50, 6703918)),
+    "SEASON_PLAYERS": (repository.SEASON_PLAYERS, (50, 6703918)),
+    "SEASON_CLUBS_MATCHES": (repository.SEASON_CLUBS_MATCHES,
+                             (6703918, 50)),
+    "PLAYERS_IN_MATCH": (repository.PLAYERS_IN_MATCH, ("50388625350348",)),
+    "CLUB_PLAYERS": (repository.CLUB_PLAYERS, (6703918,)),
+    "PLAYER_LAST_MATCH": (repository.PLAYER_LAST_MATCH, ("Robson",)),
+    "PLAYER": (repository.PLAYER, ("Robson",)),
+}
+
+
+def get_query_plan(connection: sqlite3.Connection, query: str,
+                   parameters: tuple) -> list:
+    """Get the steps of the plan of a query.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        query (str): The query.
+        parameters (tuple): Parameters of the query.
+
+    Returns:
+        list: The description of each step, like
+            "SEARCH Clubs USING INDEX ClubsClubId (clubId=?)".
+    """
+    plan = connection.execute(f"EXPLAIN QUERY PLAN {query}", parameters)
+    return [detail for _, _, _, detail in plan.fetchall()]
+
+
+def find_scans(connection: sqlite3.Connection) -> dict:
+    """Find the queries that scan a whole table.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the migrated
+            database.
+
+    Returns:
+        dict: The steps that scan a table, by query name. Empty if every
+            query uses an index.
+    """
+    scans = {}
+    for name, (query, parameters) in QUERIES.items():
+        # Scans of virtual tables, like json_each, read the parameters
+        steps = [step for step in get_query_plan(connection, query,
+                                                 parameters)
+                 if step.startswith("SCAN ")
+                 and "VIRTUAL TABLE" not in step]
+        if steps:
+            scans[name] = steps
+    return scans
+
+
+def main():
+    """Check the plans of the queries, exiting with status 1 if any of
+    them scans a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=migrate.DATABASE_FILE)
+    args = parser.parse_args()
+
+    # The database itself is left as it is
+    connection = sqlite3.connect(":memory:")
+    source = sqlite3.connect(args.database)
+    source.backup(connection)
+    source.close()
+    migrate.migrate(connection)
+
+    scans = find_scans(connection)
+    connection.close()
+    for name, steps in scans.items():
+        print(f"{name} scans a table: {'; '.join(steps)}")
+    if scans:
+        sys.exit(1)
+    print(f"All the {len(QUERIES)} queries use indexes")
+
+
+if __name__ == "__main__":
+    main()
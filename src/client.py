@@ -0,0 +1,391 @@
+"""HTTP client shared by the scrapper functions. A single requests.Session
+keeps the connections to the API alive between requests, a token bucket
+throttles how fast requests are made, and failed requests (connection
+errors, 429 and 5xx) are retried with jittered exponential backoff. The
+latency of every request is recorded by endpoint, and the HTTP and decoding
+times and the bytes received go to the metrics (src/metrics.py). Optionally,
+responses are kept in an on-disk cache (src/cache.py) and archived
+(src/archive.py). Long arrays can be streamed and decoded one element at a
+time (src/streaming.py).
+"""
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from src.archive import ResponseArchive, get_endpoint
+from src.cache import ResponseCache
+from src.metrics import Metrics
+from src.streaming import CHUNK_SIZE, iter_array
+
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Bytes of a streamed body kept in memory before spilling to a temporary file,
+# while it waits to be archived.
+SPOOL_SIZE = 1024 * 1024
+
+
+class TokenBucket:
+    """Token bucket rate limiter. Tokens are refilled at a constant rate up to
+    the capacity, and each request takes one, so bursts of up to capacity
+    requests are allowed while the average stays at the rate. It can be
+    shared by many threads.
+
+    Attributes:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens stored.
+    """
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until there is one available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class APIClient:
+    """Pooled HTTP client with rate limiting and retries.
+
+    Attributes:
+        session: Session with the connection pool and the default headers.
+        rate_limiter: Token bucket used before every request, or None when
+            the caller throttles the requests itself, like the crawler.
+        max_retries: Number of retries after the first attempt.
+        backoff: Base time in seconds of the exponential backoff.
+        max_backoff: Maximum time in seconds to wait between attempts.
+        timeout: Timeout in seconds of each attempt.
+        latencies: Latencies in seconds of each endpoint.
+        errors: Number of failed attempts of each endpoint.
+        cache: Cache of the responses, or None to always ask the API.
+        archive: Archive of the responses received, or None.
+        metrics: Metrics of the HTTP and decoding times and of the bytes
+            received.
+    """
+    def __init__(self, headers: dict = None,
+                 requests_per_second: float = 10, burst: int = 10,
+                 max_retries: int = 5, backoff: float = 0.5,
+                 max_backoff: float = 30, timeout: float = 30,
+                 pool_size: int = 32, cache: ResponseCache = None,
+                 archive: ResponseArchive = None,
+                 metrics: Metrics = None) -> None:
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter = (TokenBucket(requests_per_second, burst)
+                             if requests_per_second else None)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.cache = cache
+        self.archive = archive
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._lock = threading.Lock()
+
+    def _wait_time(self, attempt: int,
+                   response: requests.Response = None) -> float:
+        """Time to wait before the next attempt. The server's Retry-After
+        header is respected, otherwise it's a random time up to the
+        exponential backoff (full jitter)."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+    def _record(self, url: str, latency: float, failed: bool):
+        """Save the latency of an attempt."""
+        endpoint = urlparse(url).path
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            if failed:
+                self.errors[endpoint] += 1
+        self.metrics.observe("http", get_endpoint(url), latency)
+        if failed:
+            self.metrics.count("errors", get_endpoint(url))
+
+    def get(self, url: str, params: dict = None, headers: dict = None,
+            stream: bool = False) -> requests.Response:
+        """Make a GET request, retrying when it fails.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            headers (dict): Headers added to the default ones.
+            stream (bool): Whether to return before downloading the body.
+                The latency is then the time until the headers arrive.
+
+        Returns:
+            requests.Response: The successful response.
+
+        Raises:
+            requests.RequestException: If all the attempts failed or the
+                response has a status that shouldn't be retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params,
+                                            headers=headers,
+                                            timeout=self.timeout,
+                                            stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(url, time.perf_counter() - start, True)
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._wait_time(attempt))
+                continue
+
+            failed = response.status_code in RETRY_STATUS
+            self._record(url, time.perf_counter() - start, failed)
+            if not failed or attempt == self.max_retries:
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError:
+                    response.close()
+                    raise
+                if not stream:
+                    self.metrics.count("bytes", get_endpoint(url),
+                                       len(response.content))
+                return response
+            # Give the connection back to the pool before waiting
+            response.close()
+            time.sleep(self._wait_time(attempt, response))
+
+    def get_json(self, url: str, params: dict = None):
+        """Make a GET request and decode the JSON response. If the endpoint
+        is cached, a fresh cached response is used without asking the API,
+        and a stale one is revalidated with a conditional request.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+
+        Returns:
+            The decoded JSON.
+        """
+        if self.cache is None or self.cache.ttl(url) == 0:
+            response = self.get(url, params)
+            self._archive(url, params, response)
+            return self._decode(url, response.content)
+
+        entry = self.cache.get(url, params)
+        if entry is not None and self.cache.is_fresh(url, entry):
+            return self._decode(url, entry.body)
+
+        headers = entry.validation_headers() if entry is not None else None
+        response = self.get(url, params, headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(url, params, entry)
+            return self._decode(url, entry.body)
+
+        self._archive(url, params, response)
+        self.cache.put(url, params, response.content,
+                       response.headers.get("ETag"),
+                       response.headers.get("Last-Modified"))
+        return self._decode(url, response.content)
+
+    def _decode(self, url: str, body: bytes):
+        """Decode a JSON body, timing it."""
+        with self.metrics.timer("decode", get_endpoint(url)):
+            return json.loads(body)
+
+    def iter_json(self, url: str, params: dict = None, key: str = None):
+        """Make a GET request and decode the JSON array of the response one
+        element at a time, as the body arrives. Cached endpoints are
+        streamed too: a fresh cached response is read from its file, and a
+        response from the API is written to the cache as it's read.
+
+        Args:
+            url (str): The URL of the endpoint.
+            params (dict): The query parameters.
+            key (str): If given, the body is an object and the array is the
+                value of this key.
+
+        Yields:
+            The decoded elements of the array.
+        """
+        cached = self.cache is not None and self.cache.ttl(url) > 0
+        entry = self.cache.get(url, params, stream=True) if cached else None
+        try:
+            if entry is not None and self.cache.is_fresh(url, entry):
+                yield from self._iter_elements(url, _read_chunks(entry.body),
+                                               key)
+                return
+            headers = (entry.validation_headers() if entry is not None
+                       else None)
+            response = self.get(url, params, headers, stream=True)
+            if response.status_code == 304 and entry is not None:
+                response.close()
+                self.cache.refresh(url, params, entry)
+                yield from self._iter_elements(url, _read_chunks(entry.body),
+                                               key)
+                return
+        finally:
+            if entry is not None:
+                entry.body.close()
+
+        chunks = response.iter_content(CHUNK_SIZE)
+        spool = None
+        writer = None
+        try:
+            if self.archive is not None:
+                # The body goes to the archive after the last element, so
+                # it's kept in a temporary file meanwhile.
+                spool = tempfile.SpooledTemporaryFile(SPOOL_SIZE)
+                chunks = _tee(chunks, spool.write)
+            if cached:
+                writer = self.cache.writer(
+                    url, params, response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"))
+                chunks = _tee(chunks, writer.write)
+            yield from self._iter_elements(url, chunks, key, received=True)
+            if writer is not None:
+                writer.commit()
+                writer = None
+            if spool is not None:
+                spool.seek(0)
+                self.archive.append_chunks(
+                    url, params, iter(lambda: spool.read(CHUNK_SIZE), b""))
+        finally:
+            response.close()
+            if writer is not None:
+                writer.abort()
+            if spool is not None:
+                spool.close()
+
+    def _iter_elements(self, url: str, chunks, key: str,
+                       received: bool = False):
+        """Decode the elements of the JSON array of a body read in chunks,
+        timing the reading and the decoding. The whole body is read, even
+        after the array.
+
+        Args:
+            url (str): The URL of the endpoint.
+            chunks: Iterable of the bytes of the body.
+            key (str): If given, the body is an object and the array is the
+                value of this key.
+            received (bool): Whether the chunks come from the API, to count
+                the bytes received.
+
+        Yields:
+            The decoded elements of the array.
+        """
+        endpoint = get_endpoint(url)
+        # Reading the chunks is streaming time, the rest of the time spent
+        # in the parser is decoding.
+        read_time = [0]
+
+        def count_bytes(chunk: bytes):
+            if received:
+                self.metrics.count("bytes", endpoint, len(chunk))
+        chunks = _timed(chunks, read_time, count_bytes)
+        elements = iter_array(chunks, key)
+        parse_time = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                element = next(elements)
+            except StopIteration:
+                break
+            finally:
+                parse_time += time.perf_counter() - start
+            yield element
+        # The rest of the body, after the array
+        for _ in chunks:
+            pass
+        self.metrics.observe("stream", endpoint, read_time[0])
+        self.metrics.observe("decode", endpoint,
+                             max(0, parse_time - read_time[0]))
+
+    def _archive(self, url: str, params: dict, response: requests.Response):
+        """Archive a response received from the API, if there's an
+        archive."""
+        if self.archive is not None:
+            self.archive.append(url, params, response.content)
+
+    def latency_report(self) -> dict:
+        """Summary of the latencies of each endpoint.
+
+        Returns:
+            dict: For each endpoint, the number of attempts, failed attempts
+                and the mean, median, 95th percentile and maximum latency in
+                seconds.
+        """
+        report = {}
+        with self._lock:
+            for endpoint, latencies in self.latencies.items():
+                latencies = sorted(latencies)
+                report[endpoint] = {
+                    "requests": len(latencies),
+                    "errors": self.errors[endpoint],
+                    "mean": sum(latencies) / len(latencies),
+                    "p50": latencies[len(latencies) // 2],
+                    "p95": latencies[int(len(latencies) * 0.95)],
+                    "max": latencies[-1]
+                }
+        return report
+
+    def print_latency_report(self):
+        """Print the latency report as a table."""
+        print(f"{'endpoint':<28}{'requests':>9}{'errors':>8}"
+              f"{'mean':>8}{'p50':>8}{'p95':>8}{'max':>8}")
+        for endpoint, stats in self.latency_report().items():
+            print(f"{endpoint:<28}{stats['requests']:>9}{stats['errors']:>8}"
+                  f"{stats['mean']:>8.3f}{stats['p50']:>8.3f}"
+                  f"{stats['p95']:>8.3f}{stats['max']:>8.3f}")
+
+
+def _timed(chunks, read_time: list, callback):
+    """Add the time spent reading each chunk to read_time[0] and call the
+    callback with each chunk."""
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            read_time[0] += time.perf_counter() - start
+        callback(chunk)
+        yield chunk
+
+
+def _tee(chunks, write):
+    """Pass the chunks to a write function as they are read."""
+    for chunk in chunks:
+        write(chunk)
+        yield chunk
+
+
+def _read_chunks(file):
+    """Read a file in chunks of CHUNK_SIZE bytes."""
+    return iter(lambda: file.read(CHUNK_SIZE), b"")
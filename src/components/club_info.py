@@ -259,9 +259,10 @@ def component_last_matches(matches: pd.DataFrame):
                      showgrid=False)
 
     # For each match, include the opponent club crest on top of the bar.
+    opponent_clubs = utils_club.get_clubs_info(matches["opponent_club_id"])
     for i, row in matches.iterrows():
         opponent_club_id = row['opponent_club_id']
-        opponent_club = utils_club.get_club_info(opponent_club_id)
+        opponent_club = opponent_clubs[opponent_club_id]
         # Get the image from the url and add it to the plotly figure
         response = requests.get(opponent_club.crest_path)
         img = Image.open(BytesIO(response.content))
@@ -24,6 +24,39 @@ def update_edited_rows():
     st.session_state["selected_match"] = selected_match
 
 
+def component_season_summary(summary: dict, players: pd.DataFrame):
+    """Component to show the record of our club in a season and the totals
+    of its players.
+
+    Args:
+        summary (dict): Matches, wins, draws, losses and goals of the club in
+            the season, from utils_match.get_season_summary.
+        players (pd.DataFrame): Totals of the players in the season, from
+            utils_match.get_season_players.
+    """
+    if summary is None:
+        return
+
+    columns = st.columns(6)
+    labels = ["Matches", "Wins", "Draws", "Losses", "Goals",
+              "Goals conceded"]
+    for column, label, value in zip(columns, labels, summary.values()):
+        column.metric(label, value)
+
+    st.dataframe(
+        players,
+        column_config={
+            "name": st.column_config.TextColumn("Player"),
+            "matches": st.column_config.NumberColumn("Matches"),
+            "goals": st.column_config.NumberColumn("⚽"),
+            "assists": st.column_config.NumberColumn("Assists"),
+            "mom": st.column_config.NumberColumn("MOTM"),
+            "rating": st.column_config.NumberColumn("Rating",
+                                                    format="%.2f")},
+        hide_index=True, use_container_width=True
+    )
+
+
 def component_season_matches(matches_df: pd.DataFrame):
     """Component to show all matches from a season. It's possible to show the
     details of a match by clicking on it."""
@@ -122,7 +155,7 @@ def component_players_in_match(players_match: pd.DataFrame):
         player["vproattr"] = player_row["vproattr"]
         player = utils_player.Player(player.to_dict())
         st.subheader(player.proName)
-        if player_row["mom"] != "0":
+        if player_row["mom"] != 0:
             st.image("assets/football-icons/motm.png", width=50)
         col_1, col_2 = st.columns(2)
         with col_1:
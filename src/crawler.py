@@ -0,0 +1,239 @@
+"""Concurrent crawler to update the clubs that played against us. The
+requests of src/scrapper.py are blocking, so each one runs in a worker thread
+while asyncio limits how many are in flight and how fast each host is hit.
+The crawler makes the requests with a client of its own that doesn't
+throttle them again.
+All the responses go through a queue to a single writer, so only one
+connection ever writes to the SQLite database.
+
+Usage:
+    python -m src.crawler --concurrency 16 --rate 20
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import src.client as client
+import src.database as database
+import src.scrapper as scrapper
+
+
+# Endpoints that accept many clubs in a single request, asked in batches of
+# scrapper.CLUBS_PER_REQUEST clubs.
+BATCH_ENDPOINTS = [
+    (scrapper.get_clubs, scrapper.insert_club),
+    (scrapper.get_clubs_seasonals, scrapper.insert_seasonals),
+]
+
+# Endpoints asked for each club.
+CLUB_ENDPOINTS = [
+    (scrapper.get_players, scrapper.insert_players),
+    (scrapper.get_matches, scrapper.insert_matches),
+]
+
+
+class HostRateLimiter:
+    """Space out the requests made to the same host, so that no host receives
+    more than requests_per_second requests.
+
+    Attributes:
+        interval: Minimum time in seconds between two requests to a host.
+    """
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_slot = {}
+        self._locks = {}
+
+    async def wait(self, host: str):
+        """Wait until a request to the host is allowed.
+
+        Args:
+            host (str): The host that will receive the request.
+        """
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            next_slot = self._next_slot.get(host, now)
+            if next_slot > now:
+                await asyncio.sleep(next_slot - now)
+            self._next_slot[host] = max(now, next_slot) + self.interval
+
+
+class Crawler:
+    """Fetch the data of many clubs concurrently and write it with a single
+    connection.
+
+    Attributes:
+        database_file: Path to the database that receives the data.
+        concurrency: Maximum number of requests in flight.
+        rate_limiter: Limiter of requests per second for each host, the
+            only one applied to the requests.
+        client: Client of the requests, without a rate limiter of its own.
+        batch_size: Number of clubs in each request of the batch
+            endpoints.
+        batch_endpoints: Pairs of get and insert functions of the batch
+            endpoints.
+        club_endpoints: Pairs of get and insert functions of the endpoints
+            asked for each club.
+        stats: Number of clubs, requests and failures of the last run.
+        failed_clubs: IDs of the clubs with a failed request or write in the
+            last run.
+    """
+    def __init__(self, database_file: str = scrapper.DATABASE_FILE,
+                 concurrency: int = 8,
+                 requests_per_second: float = 10,
+                 batch_size: int = scrapper.CLUBS_PER_REQUEST,
+                 api_client: client.APIClient = None) -> None:
+        self.database_file = database_file
+        self.concurrency = concurrency
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        if api_client is None:
+            api_client = scrapper.make_client(requests_per_second=None)
+        self.client = api_client
+        self.batch_size = batch_size
+        self.batch_endpoints = BATCH_ENDPOINTS
+        self.club_endpoints = CLUB_ENDPOINTS
+        self.stats = {}
+        self.failed_clubs = set()
+
+    def _fail(self, key):
+        """Count a failed request or write of a club or batch of clubs."""
+        self.stats["failed"] += 1
+        self.failed_clubs.update(key if isinstance(key, list) else [key])
+
+    async def _fetch(self, semaphore: asyncio.Semaphore,
+                     queue: asyncio.Queue, get_function, insert_function,
+                     key):
+        """Make one request in a worker thread, respecting the concurrency
+        and rate limits, and send the response to the writer.
+
+        Args:
+            semaphore (asyncio.Semaphore): Limit of requests in flight.
+            queue (asyncio.Queue): Queue of the writer.
+            get_function: Function that makes the request.
+            insert_function: Function that writes the response.
+            key: The club ID, or the list of IDs of a batch.
+        """
+        host = urlparse(scrapper.API_URL).netloc
+        async with semaphore:
+            await self.rate_limiter.wait(host)
+            self.stats["requests"] += 1
+            try:
+                response = await asyncio.to_thread(
+                    get_function, key, api_client=self.client)
+            except Exception as e:
+                self._fail(key)
+                print(f"Failed {get_function.__name__}({key}): {e}")
+                return
+
+        await queue.put((insert_function, key, response))
+
+    async def _write(self, queue: asyncio.Queue):
+        """Write the responses of each club as they arrive. The writes run in
+        a single thread that owns the connection, so the event loop keeps
+        scheduling requests meanwhile."""
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            connection = await loop.run_in_executor(
+                executor, lambda: scrapper.connect(self.database_file,
+                                                  check_same_thread=False))
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                insert_function, key, response = item
+                try:
+                    await loop.run_in_executor(
+                        executor, insert_function, connection, key, response)
+                    self.stats["responses"] += 1
+                except Exception as e:
+                    # Keep consuming the queue, otherwise the fetchers
+                    # would wait forever for a free slot.
+                    self._fail(key)
+                    print(f"Failed {insert_function.__name__}({key}): {e}")
+            await loop.run_in_executor(executor, database.checkpoint,
+                                       connection)
+            await loop.run_in_executor(executor, connection.close)
+
+    async def crawl(self, club_ids: list) -> dict:
+        """Fetch and write the data of the clubs.
+
+        Args:
+            club_ids (list): The IDs of the clubs.
+
+        Returns:
+            dict: Number of clubs, requests made, responses written,
+                requests or writes that failed and the elapsed time in
+                seconds.
+        """
+        self.stats = {"clubs": len(club_ids), "requests": 0, "responses": 0,
+                      "failed": 0}
+        self.failed_clubs = set()
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        queue = asyncio.Queue(maxsize=self.concurrency)
+
+        requests = [(get_function, insert_function, batch)
+                    for batch in scrapper.batches(club_ids, self.batch_size)
+                    for get_function, insert_function in self.batch_endpoints]
+        requests += [(get_function, insert_function, club_id)
+                     for club_id in club_ids
+                     for get_function, insert_function in self.club_endpoints]
+
+        writer = asyncio.create_task(self._write(queue))
+        await asyncio.gather(
+            *[self._fetch(semaphore, queue, *request)
+              for request in requests])
+        await queue.put(None)
+        await writer
+
+        self.stats["elapsed"] = time.perf_counter() - start
+        return self.stats
+
+
+def crawl_other_clubs(database_file: str = scrapper.DATABASE_FILE,
+                      concurrency: int = 8,
+                      requests_per_second: float = 10,
+                      api_client: client.APIClient = None) -> dict:
+    """Concurrent version of scrapper.update_other_clubs.
+
+    Args:
+        database_file (str): Path to the database.
+        concurrency (int): Maximum number of requests in flight.
+        requests_per_second (float): Maximum requests per second to the API.
+        api_client (client.APIClient): Client of the requests. Defaults to
+            a new one, see Crawler.
+
+    Returns:
+        dict: The stats of the crawl.
+    """
+    connection = scrapper.connect(database_file)
+    other_clubs = scrapper.get_other_clubs(connection)
+    connection.close()
+
+    crawler = Crawler(database_file, concurrency, requests_per_second,
+                      api_client=api_client)
+    return asyncio.run(crawler.crawl(other_clubs))
+
+
+def main():
+    """Update the other clubs with the options of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=scrapper.DATABASE_FILE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10,
+                        help="Maximum requests per second to each host.")
+    args = parser.parse_args()
+
+    api_client = scrapper.make_client(requests_per_second=None)
+    stats = crawl_other_clubs(args.database, args.concurrency, args.rate,
+                              api_client)
+    print(f"{stats['clubs']} clubs updated with {stats['requests']} requests "
+          f"in {stats['elapsed']:.1f}s ({stats['failed']} failed)")
+    api_client.print_latency_report()
+    scrapper.METRICS.export("crawler")
+
+
+if __name__ == "__main__":
+    main()
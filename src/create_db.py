@@ -1,58 +1,685 @@
-"""Create the database from sql dump created from Postgres. To speed things
-up I'll use the sqlite3 module to create the database and then use the
-sqlalchemy module to create the tables and insert the data."""
+"""Create the database from the SQL dumps exported from Postgres. The tables
+are created from the create_*.sql files and filled with the rows of the
+insert_*.sql files.
 
+The dumps are parsed with a small SQL tokenizer instead of being split on
+";", which would break on the names with semicolons, and each table is
+loaded with executemany in a single transaction. The files are parsed in
+parallel, and the database is built with journaling and syncing off into a
+temporary file that replaces the old database when it's complete. The
+indexes and the other migrations of src.migrate are applied after the rows
+are loaded.
 
-import sqlite3
+With --sync, the database is updated instead of rebuilt. The dumps are
+loaded into a staging database, compared with the current one row by row,
+and only the rows that changed are deleted and inserted, in a shadow copy of
+the database that then takes its place. The app keeps reading the old file
+until the swap, and only the summaries of the seasons of the changed matches
+are computed again. Without changes, the database isn't copied or written.
+
+Usage:
+    python -m src.create_db --database data/raw/clubedorobson.db
+    python -m src.create_db --database data/raw/clubedorobson.db --sync
+"""
+import argparse
 import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import src.database as database
+import src.migrate as migrate
+import src.summaries as summaries
+
+
+DATABASE_FILE = "data/raw/clubedorobson.db"
+
+SQL_FOLDER = "sql"
+
+# Safe only because a failed build is thrown away: there's no journal to
+# roll back and nothing is synced to disk until the end.
+BUILD_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    # Negative sizes are in KiB
+    "PRAGMA cache_size = -262144",
+]
+
+# A sync swaps the files only once the WAL of the database is empty, or its
+# frames would be lost. Readers can hold the checkpoint back for a while.
+CHECKPOINT_ATTEMPTS = 5
+CHECKPOINT_RETRY_SECONDS = 1
+# Error of the writes to a database replaced by a sync
+REPLACED_MESSAGE = "The database was replaced by a sync, connect again"
+
+# Commas only separate columns and values, so they are skipped with the
+# whitespace and the comments, and each token has a group of its kind. The
+# quoted strings are unrolled so runs of plain characters match at once.
+TOKEN_PATTERN = re.compile(r"""
+    [\s,]*(?:--[^\n]*[\s,]*)*
+    (?:
+        ('[^']*(?:''[^']*)*')
+        | (-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+        | ([A-Za-z_][A-Za-z0-9_$]*|"[^"]*(?:""[^"]*)*")
+        | ([().;])
+        | (\S)
+    )
+""", re.VERBOSE)
+
+# Literals written as words
+KEYWORD_VALUES = {"NULL": None, "TRUE": 1, "FALSE": 0}
+
+
+def tokenize(sql: str) -> list:
+    """Split SQL in tokens, skipping whitespace, commas and comments.
+
+    Args:
+        sql (str): The SQL.
+
+    Returns:
+        list: For each token, a tuple with its text in the position of its
+            kind: string, number, name, symbol and other, the rest being
+            empty strings.
+    """
+    return TOKEN_PATTERN.findall(sql)
+
+
+def token_value(token: tuple):
+    """The Python value of a literal token.
+
+    Raises:
+        ValueError: If the token isn't a literal.
+    """
+    string, number, name, symbol, other = token
+    if string:
+        return string[1:-1].replace("''", "'")
+    if number and any(character in number for character in ".eE"):
+        return float(number)
+    if number:
+        return int(number)
+    if name.upper() in KEYWORD_VALUES:
+        return KEYWORD_VALUES[name.upper()]
+    raise ValueError(f"Expected a value, found {''.join(token)!r}")
+
+
+def unquote(name: str) -> str:
+    """Remove the double quotes of an identifier."""
+    if name.startswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name
+
+
+def parse_inserts(sql: str):
+    """Parse the INSERT statements of a dump. Other statements are skipped.
+
+    Args:
+        sql (str): The SQL of the dump.
+
+    Yields:
+        tuple: The table, the columns (None if the statement doesn't list
+            them) and the rows of each statement. Tables qualified with a
+            schema, like public."Clubs", keep only the table name.
+
+    Raises:
+        ValueError: If an INSERT statement is malformed.
+    """
+    tokens = tokenize(sql)
+    n_tokens = len(tokens)
+    i = 0
+    while i < n_tokens:
+        if tokens[i][2].upper() != "INSERT":
+            # Skip the rest of the statement
+            while i < n_tokens and tokens[i][3] != ";":
+                i += 1
+            i += 1
+            continue
+
+        if tokens[i + 1][2].upper() != "INTO":
+            raise ValueError(f"Expected INTO, found {tokens[i + 1]!r}")
+        table = unquote(tokens[i + 2][2])
+        i += 3
+        while tokens[i][3] == ".":
+            table = unquote(tokens[i + 1][2])
+            i += 2
+
+        columns = None
+        if tokens[i][3] == "(":
+            end = i + 1
+            while tokens[end][3] != ")":
+                end += 1
+            columns = [unquote(token[2]) for token in tokens[i + 1:end]]
+            i = end + 1
+        if tokens[i][2].upper() != "VALUES":
+            raise ValueError(f"Expected VALUES, found {tokens[i]!r}")
+        i += 1
+
+        rows = []
+        while i < n_tokens and tokens[i][3] != ";":
+            if tokens[i][3] != "(":
+                raise ValueError(f"Expected a row, found {tokens[i]!r}")
+            end = i + 1
+            while tokens[end][3] != ")":
+                end += 1
+            rows.append(tuple(token_value(token)
+                              for token in tokens[i + 1:end]))
+            i = end + 1
+        i += 1
+        yield table, columns, rows
+
+
+def parse_file(path: str) -> dict:
+    """Parse the INSERT statements of a dump file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        dict: For each table and list of columns, the rows, and the seconds
+            the parsing took, in the key "seconds".
+    """
+    start = time.perf_counter()
+    with open(path, "r") as f:
+        sql = f.read()
+    tables = {}
+    for table, columns, rows in parse_inserts(sql):
+        key = (table, tuple(columns) if columns else None)
+        tables.setdefault(key, []).extend(rows)
+    return {"tables": tables, "seconds": time.perf_counter() - start}
+
+
+def get_insert_query(table: str, columns: tuple, n_values: int) -> str:
+    """INSERT statement with placeholders for a row of n_values values."""
+    placeholders = ", ".join(["?"] * n_values)
+    if columns is None:
+        return f"INSERT INTO {table} VALUES ({placeholders})"
+    return (f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({placeholders})")
+
+
+def load(connection: sqlite3.Connection, folder: str = SQL_FOLDER,
+         workers: int = None) -> dict:
+    """Create the tables of a folder in a database and load their rows.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        folder (str): Folder of the create_*.sql and insert_*.sql files.
+        workers (int): Number of processes parsing the dumps. Defaults to
+            the number of CPUs.
+
+    Returns:
+        dict: For each table, the rows loaded and the seconds spent parsing
+            and loading them.
+    """
+    files = sorted(os.listdir(folder))
+    create_files = [os.path.join(folder, file) for file in files
+                    if file.endswith(".sql") and "create" in file.lower()]
+    insert_files = [os.path.join(folder, file) for file in files
+                    if file.endswith(".sql") and "insert" in file.lower()]
+
+    with connection:
+        for file in create_files:
+            with open(file, "r") as f:
+                connection.executescript(f.read())
+
+    timings = {}
+    workers = workers or os.cpu_count()
+    # Starting the processes isn't worth it with a single CPU
+    executor = (ProcessPoolExecutor(max_workers=workers) if workers > 1
+                else None)
+    parsed_files = (executor.map(parse_file, insert_files) if executor
+                    else map(parse_file, insert_files))
+    try:
+        # The files are loaded as they are parsed, in order
+        for parsed in parsed_files:
+            for (table, columns), rows in parsed["tables"].items():
+                start = time.perf_counter()
+                # Rows of different lengths need different statements
+                rows_by_length = {}
+                for row in rows:
+                    rows_by_length.setdefault(len(row), []).append(row)
+                with connection:
+                    for n_values, same_length in rows_by_length.items():
+                        connection.executemany(
+                            get_insert_query(table, columns, n_values),
+                            same_length)
+                timing = timings.setdefault(
+                    table, {"rows": 0, "parse": 0, "load": 0})
+                timing["rows"] += len(rows)
+                timing["parse"] += parsed["seconds"]
+                timing["load"] += time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return timings
+
+
+def build(database_file: str = DATABASE_FILE, folder: str = SQL_FOLDER,
+          workers: int = None) -> dict:
+    """Create the database from the dumps of a folder.
+
+    The create_*.sql files keep the TEXT columns of the Postgres export, so
+    the dumps load as they are, and migration 2 of src.migrate then copies
+    Players, PlayersMatches, ClubsMatches and Matches once more to give
+    them their INTEGER and REAL types. That copy takes about as long as
+    loading those tables, and is the price of converting the old databases
+    and the new builds with the same statements.
+
+    Args:
+        database_file (str): Path of the database. It's replaced only when
+            the new one is complete, and the temporary file is removed if
+            the build fails.
+        folder (str): Folder of the create_*.sql and insert_*.sql files.
+        workers (int): Number of processes parsing the dumps. Defaults to
+            the number of CPUs.
+
+    Returns:
+        dict: For each table, the rows loaded and the seconds spent parsing
+            and loading them, and the seconds of the migrations, in the key
+            "migrations".
+    """
+    temporary_file = database_file + ".tmp"
+    if os.path.exists(temporary_file):
+        os.remove(temporary_file)
+    connection = sqlite3.connect(temporary_file)
+    try:
+        for pragma in BUILD_PRAGMAS:
+            connection.execute(pragma)
+        timings = load(connection, folder, workers)
+
+        # Indexes are faster to build once than to update in every insert
+        start = time.perf_counter()
+        migrate.migrate(connection)
+        timings["migrations"] = {"rows": 0, "parse": 0,
+                                 "load": time.perf_counter() - start}
+    except BaseException:
+        connection.close()
+        os.remove(temporary_file)
+        raise
+    connection.close()
+    os.replace(temporary_file, database_file)
+    return timings
+
 
+def diff_table(connection: sqlite3.Connection, table: str) -> tuple:
+    """Compare a table of the database with the one of the attached staging
+    database.
 
-# Delete file if exists
-if os.path.exists("data/raw/clubedorobson.db"):
-    os.remove("data/raw/clubedorobson.db")
-database_file = "data/raw/clubedorobson.db"
-connection = sqlite3.connect(database_file)
+    The tables have no primary keys, so a row is identified by all its
+    values, and equal rows are matched one to one. The comparison runs in
+    SQLite, sorting the rows of both tables together, so only the rows that
+    changed are read into memory.
 
-# List of sql files to create the database
-create_files = [file for file in os.listdir("sql")
-                if file.endswith(".sql") and "create" in file.lower()]
+    Args:
+        connection (sqlite3.Connection): Connection to the database, with
+            the staging database attached as staging.
+        table (str): The table.
 
-for file in create_files:
-    with open(f"sql/{file}", "r") as f:
+    Returns:
+        tuple: The rowids of the rows to delete, the rows to insert and the
+            columns of the rows.
+    """
+    columns = [column[1] for column in connection.execute(
+        f'PRAGMA staging.table_info("{table}")')]
+    names = ", ".join(f'"{column}"' for column in columns)
+    # The nth copy of a row in one table is left alone if the other table
+    # has at least n copies of it. Side 0 is the database, and 1 the staging
+    # database.
+    query = f"""
+        SELECT side, id, {names} FROM (
+            SELECT *,
+                ROW_NUMBER() OVER (
+                    PARTITION BY side, {names} ORDER BY id) AS copy,
+                SUM(side = 0) OVER same_rows AS current_copies,
+                SUM(side = 1) OVER same_rows AS staging_copies
+            FROM (
+                SELECT 0 AS side, rowid AS id, {names} FROM main."{table}"
+                UNION ALL
+                SELECT 1, rowid, {names} FROM staging."{table}")
+            WINDOW same_rows AS (PARTITION BY {names}))
+        WHERE copy > IIF(side = 0, staging_copies, current_copies)"""
+    deleted = []
+    inserted = []
+    for side, rowid, *row in connection.execute(query):
+        if side == 0:
+            deleted.append(rowid)
+        else:
+            inserted.append(tuple(row))
+    return deleted, inserted, columns
+
+
+def get_match_ids(connection: sqlite3.Connection, table: str,
+                  rowids: list) -> set:
+    """IDs of the matches of some rows of a table."""
+    match_ids = set()
+    for start in range(0, len(rowids), summaries.MATCHES_PER_QUERY):
+        batch = rowids[start:start + summaries.MATCHES_PER_QUERY]
+        placeholders = ", ".join(["?" for _ in batch])
+        match_ids.update(match_id for match_id, in connection.execute(
+            f"""SELECT matchId FROM "{table}"
+            WHERE rowid IN ({placeholders})""", batch))
+    return match_ids
+
+
+def diff_tables(connection: sqlite3.Connection) -> dict:
+    """Compare every table of a database but the summaries with the staging
+    database attached to it.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database, with
+            the staging database attached as "staging".
+
+    Returns:
+        dict: For each table, the rowids of the rows to delete, the rows to
+            insert and the columns, as returned by diff_table.
+    """
+    tables = [table for table, in connection.execute(
+        """SELECT name FROM staging.sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name""") if table not in summaries.TABLES]
+    return {table: diff_table(connection, table) for table in tables}
+
+
+def has_changes(database_file: str, staging_file: str) -> bool:
+    """Check over a read-only connection whether a sync would change a
+    database. A database that isn't at the latest version always changes,
+    since its tables may not match the staging ones before the migrations.
+
+    Args:
+        database_file (str): Path of the database.
+        staging_file (str): Path of the staging database.
+
+    Returns:
+        bool: Whether any row differs.
+    """
+    connection = database.connect(database_file, read_only=True)
+    try:
+        if migrate.get_version(connection) < len(migrate.MIGRATIONS):
+            return True
+        connection.execute("ATTACH DATABASE ? AS staging", (staging_file,))
+        return any(deleted or inserted for deleted, inserted, _
+                   in diff_tables(connection).values())
+    finally:
+        connection.close()
+
+
+def apply_changes(connection: sqlite3.Connection,
+                  staging_file: str) -> dict:
+    """Apply the differences between a database and a staging database to
+    the first one in a single transaction, with the summaries of the seasons
+    of the changed matches.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        staging_file (str): Path of the staging database.
+
+    Returns:
+        dict: For each table, the rows deleted and inserted.
+    """
+    connection.execute("ATTACH DATABASE ? AS staging", (staging_file,))
+    try:
+        diffs = diff_tables(connection)
+        match_ids = set()
+        for table, (deleted, inserted, columns) in diffs.items():
+            if "matchId" in columns:
+                match_ids |= get_match_ids(connection, table, deleted)
+                match_ids |= {row[columns.index("matchId")]
+                              for row in inserted}
+        # The seasons of the deleted rows are read before they're gone
+        keys = summaries.get_keys(connection, match_ids)
+
+        changes = {}
+        with connection:
+            for table, (deleted, inserted, columns) in diffs.items():
+                connection.executemany(
+                    f'DELETE FROM "{table}" WHERE rowid = ?',
+                    [(rowid,) for rowid in deleted])
+                connection.executemany(
+                    get_insert_query(f'"{table}"', tuple(
+                        f'"{column}"' for column in columns),
+                        len(columns)),
+                    inserted)
+                changes[table] = {"deleted": len(deleted),
+                                  "inserted": len(inserted)}
+            keys |= summaries.get_keys(connection, match_ids)
+            summaries.refresh(connection, keys)
+    finally:
+        connection.execute("DETACH DATABASE staging")
+    return changes
+
+
+def checkpoint_all(connection: sqlite3.Connection,
+                   attempts: int = CHECKPOINT_ATTEMPTS):
+    """Copy the whole WAL of a database back into it, retrying while
+    readers block the checkpoint.
+
+    Args:
+        connection (sqlite3.Connection): A connection that can write.
+        attempts (int): Checkpoints tried before giving up.
+
+    Raises:
+        sqlite3.OperationalError: If the WAL couldn't be checkpointed.
+    """
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(CHECKPOINT_RETRY_SECONDS)
+        busy, wal_pages, copied_pages = database.checkpoint(connection)
+        # Both are -1 when the database isn't in WAL mode
+        if not busy and wal_pages == copied_pages:
+            return
+    raise sqlite3.OperationalError(
+        f"The WAL was still in use after {attempts} checkpoints, "
+        f"{copied_pages} of {wal_pages} pages copied")
+
+
+def lock(database_file: str,
+         attempts: int = CHECKPOINT_ATTEMPTS) -> sqlite3.Connection:
+    """Open a connection to a database that holds its write lock, with the
+    WAL empty. SQLite can't checkpoint inside the transaction that holds
+    the lock, so the WAL is checkpointed first, and again if a writer got in
+    before the lock was taken.
+
+    Args:
+        database_file (str): Path of the database.
+        attempts (int): Times the lock is taken before giving up.
+
+    Returns:
+        sqlite3.Connection: The connection, in autocommit mode and inside a
+            BEGIN IMMEDIATE transaction.
+
+    Raises:
+        sqlite3.OperationalError: If the WAL couldn't be emptied or the lock
+            wasn't released by the other writers within the busy timeout.
+    """
+    connection = sqlite3.connect(database_file,
+                                 timeout=database.BUSY_TIMEOUT,
+                                 isolation_level=None)
+    try:
+        for attempt in range(attempts):
+            checkpoint_all(connection)
+            connection.execute("BEGIN IMMEDIATE")
+            wal_file = database_file + "-wal"
+            if (not os.path.exists(wal_file)
+                    or not os.path.getsize(wal_file)):
+                return connection
+            connection.execute("ROLLBACK")
+        raise sqlite3.OperationalError(
+            f"Writers kept filling the WAL after {attempts} checkpoints")
+    except BaseException:
+        connection.close()
+        raise
+
+
+def block_writes(connection: sqlite3.Connection):
+    """Make every write to the tables of a database fail, with triggers
+    committed in the transaction that holds its write lock. Writers that
+    were waiting for the lock, or that keep a connection to the file after
+    it's replaced, get an error instead of writing rows that would be lost.
+
+    Args:
+        connection (sqlite3.Connection): Connection returned by lock.
+    """
+    tables = [table for table, in connection.execute(
+        """SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'""").fetchall()]
+    for table in tables:
+        for operation in ("INSERT", "UPDATE", "DELETE"):
+            connection.execute(
+                f"""CREATE TRIGGER "{table}Replaced{operation.title()}"
+                BEFORE {operation} ON "{table}"
+                BEGIN SELECT RAISE(ABORT, '{REPLACED_MESSAGE}'); END""")
+    connection.execute("COMMIT")
+
+
+def unblock_writes(connection: sqlite3.Connection):
+    """Drop the triggers of block_writes.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database, in
+            autocommit mode.
+    """
+    triggers = [trigger for trigger, in connection.execute(
+        """SELECT name FROM sqlite_master
+        WHERE type = 'trigger' AND name LIKE '%Replaced%'""").fetchall()]
+    connection.execute("BEGIN IMMEDIATE")
+    for trigger in triggers:
+        connection.execute(f'DROP TRIGGER "{trigger}"')
+    connection.execute("COMMIT")
+
+
+def sync(database_file: str = DATABASE_FILE, folder: str = SQL_FOLDER,
+         workers: int = None) -> dict:
+    """Update the database with the rows of the dumps that aren't in it yet,
+    and delete the ones that aren't in the dumps anymore. A row that changed
+    is deleted and inserted again.
+
+    The dumps are loaded into a staging database with build, and compared
+    with the database over a read-only connection. Without changes, the
+    sync stops there and the database isn't written. Otherwise the write
+    lock of the database is taken with its WAL emptied, so the new file
+    doesn't pick up its frames, and kept while the database is copied to a
+    shadow file with the backup API, migrated, and the changes of every
+    table are applied to the shadow in a single transaction, with the
+    summaries of the seasons of the changed matches. Writers wait for the
+    lock, and fail once they get it: the lock is released with triggers
+    that abort every write to the old file, which the shadow then replaces.
+    If readers keep the WAL from being emptied, the sync fails and the
+    database is left as it was. The staging and shadow files are removed
+    either way.
+
+    Args:
+        database_file (str): Path of the database. It's built if it doesn't
+            exist.
+        folder (str): Folder of the create_*.sql and insert_*.sql files.
+        workers (int): Number of processes parsing the dumps.
+
+    Returns:
+        dict: For each table, the rows deleted and inserted, and the seconds
+            of each step, in the key "seconds". Without changes, only the
+            seconds.
+    """
+    if not os.path.exists(database_file):
+        build(database_file, folder, workers)
+        return {"seconds": {}}
+
+    seconds = {}
+    staging_file = database_file + ".staging"
+    shadow_file = database_file + ".shadow"
+    current = shadow = None
+    try:
+        start = time.perf_counter()
+        build(staging_file, folder, workers)
+        seconds["staging"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        changed = has_changes(database_file, staging_file)
+        seconds["check"] = time.perf_counter() - start
+        if not changed:
+            return {"seconds": seconds}
+
+        start = time.perf_counter()
+        current = lock(database_file)
+        if os.path.exists(shadow_file):
+            os.remove(shadow_file)
+        shadow = sqlite3.connect(shadow_file)
+        # The backup API can't read through the connection holding the lock
+        reader = database.connect(database_file, read_only=True)
         try:
-            sql = f.read()
-            cursor = connection.cursor()
-            cursor.execute(sql)
-        except Exception as e:
-            cursor.close()
-            connection.rollback()
-            connection.close()
-            raise e
+            reader.backup(shadow)
         finally:
-            cursor.close()
-            connection.commit()
+            reader.close()
+        migrate.migrate(shadow)
+        seconds["shadow"] = time.perf_counter() - start
 
-# List of sql files to insert data into the database
-populate_files = [file for file in os.listdir("sql")
-                  if file.endswith(".sql") and "insert" in file.lower()]
+        start = time.perf_counter()
+        changes = apply_changes(shadow, staging_file)
+        seconds["diff"] = time.perf_counter() - start
 
-for file in populate_files:
-    with open(f"sql/{file}", "r") as f:
+        start = time.perf_counter()
+        database.checkpoint(shadow)
+        shadow.close()
+        shadow = None
+        block_writes(current)
         try:
-            sql = f.read()
-            cursor = connection.cursor()
-            # Split the SQL statements by semicolon and execute them one by one
-            statements = sql.split(";")
-            for statement in statements:
-                if statement.strip() != "":
-                    cursor.execute(statement)
-        except Exception as e:
-            cursor.close()
-            connection.rollback()
-            connection.close()
-            raise e
-        finally:
-            cursor.close()
-            connection.commit()
+            # The triggers were committed to the WAL
+            checkpoint_all(current)
+        except BaseException:
+            unblock_writes(current)
+            raise
+        os.replace(shadow_file, database_file)
+        seconds["swap"] = time.perf_counter() - start
+    finally:
+        for connection in (shadow, current):
+            if connection is not None:
+                connection.close()
+        for file in (staging_file, shadow_file):
+            if os.path.exists(file):
+                os.remove(file)
+    changes["seconds"] = seconds
+    return changes
+
+
+def main():
+    """Build the database with the options of the command line and print
+    the time of each table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=DATABASE_FILE)
+    parser.add_argument("--sql", default=SQL_FOLDER,
+                        help="Folder of the create_*.sql and insert_*.sql "
+                             "files.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--sync", action="store_true",
+                        help="Apply only the rows that changed to the "
+                             "database instead of rebuilding it.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.sync:
+        changes = sync(args.database, args.sql, args.workers)
+        seconds = changes.pop("seconds")
+        if not changes:
+            print("No changes")
+        else:
+            print(f"{'table':<16}{'deleted':>8}{'inserted':>9}")
+        for table, change in changes.items():
+            print(f"{table:<16}{change['deleted']:>8}"
+                  f"{change['inserted']:>9}")
+        print(", ".join(f"{step} {elapsed:.3f}s"
+                        for step, elapsed in seconds.items()))
+        print(f"Synced {args.database} in "
+              f"{time.perf_counter() - start:.2f}s")
+        return
+
+    timings = build(args.database, args.sql, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'table':<16}{'rows':>8}{'parse':>9}{'load':>9}")
+    for table, timing in timings.items():
+        print(f"{table:<16}{timing['rows']:>8}{timing['parse']:>8.3f}s"
+              f"{timing['load']:>8.3f}s")
+    print(f"Built {args.database} in {elapsed:.2f}s")
+
 
-connection.close()
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,144 @@
 """Create a database to emulate the original data. We do this here to show
-how the scrapping works, since the original data is from 2021."""
+how the scrapping works, since the original data is from 2021.
+
+The version of the schema is kept in the PRAGMA user_version of the
+database, like the app database in src.migrate, and the scrapper migrates
+the databases created by older versions when it connects to them.
+
+Usage:
+    python -m src.create_mock_db
+"""
 import sqlite3
 import os
+import src.migrate as migrate
+
+
+MATCH_STATS_COLUMNS = [
+    ("assists", "INTEGER"),
+    ("cleansheetsany", "INTEGER"),
+    ("cleansheetsdef", "INTEGER"),
+    ("cleansheetsgk", "INTEGER"),
+    ("goals", "INTEGER"),
+    ("goalsconceded", "INTEGER"),
+    ("losses", "INTEGER"),
+    ("mom", "INTEGER"),
+    ("namespace", "TEXT"),
+    ("passattempts", "INTEGER"),
+    ("passesmade", "INTEGER"),
+    ("pos", "TEXT"),
+    ("rating", "REAL"),
+    ("realtimegame", "INTEGER"),
+    ("realtimeidle", "INTEGER"),
+    ("redcards", "INTEGER"),
+    ("saves", "INTEGER"),
+    ("SCORE", "INTEGER"),
+    ("shots", "INTEGER"),
+    ("tackleattempts", "INTEGER"),
+    ("tacklesmade", "INTEGER"),
+    ("vproattr", "TEXT"),
+    ("vprohackreason", "TEXT"),
+    ("wins", "INTEGER"),
+]
+
+# Statements of each migration of the scrapper database. They are frozen:
+# a change to the tables of main is a new migration, never an edit of an
+# old one.
+MIGRATIONS = [
+    # 1: Numbers of the API stored as INTEGER and REAL instead of TEXT, as
+    # the scrapper converts them since then
+    migrate.rebuild_table("Players", [
+        ("name", "TEXT"),
+        ("gamesPlayed", "INTEGER"),
+        ("winRate", "INTEGER"),
+        ("goals", "INTEGER"),
+        ("assists", "INTEGER"),
+        ("cleanSheetsDef", "INTEGER"),
+        ("cleanSheetsGK", "INTEGER"),
+        ("shotSuccessRate", "INTEGER"),
+        ("passesMade", "INTEGER"),
+        ("passSuccessRate", "INTEGER"),
+        ("tacklesMade", "INTEGER"),
+        ("tackleSuccessRate", "INTEGER"),
+        ("proName", "TEXT"),
+        ("proPos", "INTEGER"),
+        ("proStyle", "INTEGER"),
+        ("proHeight", "INTEGER"),
+        ("proNationality", "INTEGER"),
+        ("proOverall", "INTEGER"),
+        ("manOfTheMatch", "INTEGER"),
+        ("redCards", "INTEGER"),
+        ("prevGoals", "INTEGER"),
+        ("favoritePosition", "TEXT"),
+        ("clubId", "TEXT"),
+    ], [
+        "PRIMARY KEY (name)",
+        "FOREIGN KEY (clubId) REFERENCES Clubs (clubId)",
+    ]) + migrate.rebuild_table("Matches", [
+        ("matchId", "TEXT"),
+        ("timestamp", "INTEGER"),
+    ], [
+        "PRIMARY KEY (matchId)",
+    ]) + migrate.rebuild_table("ClubsMatches", [
+        ("clubId", "TEXT"),
+        ("matchId", "TEXT"),
+        ("gameNumber", "INTEGER"),
+        ("goals", "INTEGER"),
+        ("goalsAgainst", "INTEGER"),
+        ("losses", "INTEGER"),
+        ("result", "INTEGER"),
+        ("score", "INTEGER"),
+        ("season_id", "INTEGER"),
+        ("TEAM", "INTEGER"),
+        ("ties", "INTEGER"),
+        ("winnerByDnf", "INTEGER"),
+        ("wins", "INTEGER"),
+    ], [
+        "PRIMARY KEY (clubId, matchId)",
+        "FOREIGN KEY (clubId) REFERENCES Clubs (clubId)",
+        "FOREIGN KEY (matchId) REFERENCES Matches (matchId)",
+    ]) + migrate.rebuild_table("PlayersMatches", [
+        ("playerId", "TEXT"),
+        *MATCH_STATS_COLUMNS,
+        ("playername", "TEXT"),
+        ("matchId", "TEXT"),
+        ("clubId", "TEXT"),
+    ], [
+        "PRIMARY KEY (playername, matchId, clubId)",
+        "FOREIGN KEY (playername) REFERENCES Players (name)",
+        "FOREIGN KEY (matchId) REFERENCES Matches (matchId)",
+        "FOREIGN KEY (clubId) REFERENCES Clubs (clubId)",
+    ]) + migrate.rebuild_table("ClubsMatchesAgg", [
+        ("clubId", "TEXT"),
+        ("matchId", "TEXT"),
+        *MATCH_STATS_COLUMNS,
+    ], [
+        "PRIMARY KEY (clubId, matchId)",
+        "FOREIGN KEY (clubId) REFERENCES Clubs (clubId)",
+        "FOREIGN KEY (matchId) REFERENCES Matches (matchId)",
+    ]),
+]
+
+
+def migrate_database(connection: sqlite3.Connection) -> int:
+    """Apply the migrations a scrapper database is missing.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
 
-def main():
+    Returns:
+        int: The number of migrations applied.
+    """
+    return migrate.migrate(connection, migrations=MIGRATIONS)
+
+
+def main(database_file: str = "data/raw/mock.db"):
     """Read the documentation to understand each table and its columns.
     The database is documented in a diagram, the API in a Swagger file and
-    the data in a Notion page."""
-    database_file = "data/raw/mock.db"
+    the data in a Notion page.
+
+    Args:
+        database_file (str): Path of the database to create.
+    """
     # Delete file if exists
     if os.path.exists(database_file):
         os.remove(database_file)
@@ -47,26 +178,26 @@ def main():
     create_players_query = """
         CREATE TABLE Players (
             name TEXT PRIMARY KEY,
-            gamesPlayed TEXT,
-            winRate TEXT,
-            goals TEXT,
-            assists TEXT,
-            cleanSheetsDef TEXT,
-            cleanSheetsGK TEXT,
-            shotSuccessRate TEXT,
-            passesMade TEXT,
-            passSuccessRate TEXT,
-            tacklesMade TEXT,
-            tackleSuccessRate TEXT,
+            gamesPlayed INTEGER,
+            winRate INTEGER,
+            goals INTEGER,
+            assists INTEGER,
+            cleanSheetsDef INTEGER,
+            cleanSheetsGK INTEGER,
+            shotSuccessRate INTEGER,
+            passesMade INTEGER,
+            passSuccessRate INTEGER,
+            tacklesMade INTEGER,
+            tackleSuccessRate INTEGER,
             proName TEXT,
-            proPos TEXT,
-            proStyle TEXT,
-            proHeight TEXT,
-            proNationality TEXT,
-            proOverall TEXT,
-            manOfTheMatch TEXT,
-            redCards TEXT,
-            prevGoals TEXT,
+            proPos INTEGER,
+            proStyle INTEGER,
+            proHeight INTEGER,
+            proNationality INTEGER,
+            proOverall INTEGER,
+            manOfTheMatch INTEGER,
+            redCards INTEGER,
+            prevGoals INTEGER,
             favoritePosition TEXT,
             clubId TEXT,
             FOREIGN KEY (clubId) REFERENCES Clubs (clubId)
@@ -79,7 +210,7 @@ def main():
     create_matches_query = """
         CREATE TABLE Matches (
             matchId TEXT PRIMARY KEY,
-            timestamp TEXT
+            timestamp INTEGER
         );
     """
     cursor.execute(create_matches_query)
@@ -90,17 +221,17 @@ def main():
         CREATE TABLE ClubsMatches (
             clubId TEXT,
             matchId TEXT,
-            gameNumber TEXT,
-            goals TEXT,
-            goalsAgainst TEXT,
-            losses TEXT,
-            result TEXT,
-            score TEXT,
-            season_id TEXT,
-            TEAM TEXT,
-            ties TEXT,
-            winnerByDnf TEXT,
-            wins TEXT,
+            gameNumber INTEGER,
+            goals INTEGER,
+            goalsAgainst INTEGER,
+            losses INTEGER,
+            result INTEGER,
+            score INTEGER,
+            season_id INTEGER,
+            TEAM INTEGER,
+            ties INTEGER,
+            winnerByDnf INTEGER,
+            wins INTEGER,
             PRIMARY KEY (clubId, matchId),
             FOREIGN KEY (clubId) REFERENCES Clubs (clubId),
             FOREIGN KEY (matchId) REFERENCES Matches (matchId)
@@ -113,30 +244,30 @@ def main():
     players_matches_query = """
         CREATE TABLE PlayersMatches (
             playerId TEXT,
-            assists TEXT,
-            cleansheetsany TEXT,
-            cleansheetsdef TEXT,
-            cleansheetsgk TEXT,
-            goals TEXT,
-            goalsconceded TEXT,
-            losses TEXT,
-            mom TEXT,
+            assists INTEGER,
+            cleansheetsany INTEGER,
+            cleansheetsdef INTEGER,
+            cleansheetsgk INTEGER,
+            goals INTEGER,
+            goalsconceded INTEGER,
+            losses INTEGER,
+            mom INTEGER,
             namespace TEXT,
-            passattempts TEXT,
-            passesmade TEXT,
+            passattempts INTEGER,
+            passesmade INTEGER,
             pos TEXT,
-            rating TEXT,
-            realtimegame TEXT,
-            realtimeidle TEXT,
-            redcards TEXT,
-            saves TEXT,
-            SCORE TEXT,
-            shots TEXT,
-            tackleattempts TEXT,
-            tacklesmade TEXT,
+            rating REAL,
+            realtimegame INTEGER,
+            realtimeidle INTEGER,
+            redcards INTEGER,
+            saves INTEGER,
+            SCORE INTEGER,
+            shots INTEGER,
+            tackleattempts INTEGER,
+            tacklesmade INTEGER,
             vproattr TEXT,
             vprohackreason TEXT,
-            wins TEXT,
+            wins INTEGER,
             playername TEXT,
             matchId TEXT,
             clubId TEXT,
@@ -154,30 +285,30 @@ def main():
         CREATE TABLE ClubsMatchesAgg (
             clubId TEXT,
             matchId TEXT,
-            assists TEXT,
-            cleansheetsany TEXT,
-            cleansheetsdef TEXT,
-            cleansheetsgk TEXT,
-            goals TEXT,
-            goalsconceded TEXT,
-            losses TEXT,
-            mom TEXT,
+            assists INTEGER,
+            cleansheetsany INTEGER,
+            cleansheetsdef INTEGER,
+            cleansheetsgk INTEGER,
+            goals INTEGER,
+            goalsconceded INTEGER,
+            losses INTEGER,
+            mom INTEGER,
             namespace TEXT,
-            passattempts TEXT,
-            passesmade TEXT,
+            passattempts INTEGER,
+            passesmade INTEGER,
             pos TEXT,
-            rating TEXT,
-            realtimegame TEXT,
-            realtimeidle TEXT,
-            redcards TEXT,
-            saves TEXT,
-            SCORE TEXT,
-            shots TEXT,
-            tackleattempts TEXT,
-            tacklesmade TEXT,
+            rating REAL,
+            realtimegame INTEGER,
+            realtimeidle INTEGER,
+            redcards INTEGER,
+            saves INTEGER,
+            SCORE INTEGER,
+            shots INTEGER,
+            tackleattempts INTEGER,
+            tacklesmade INTEGER,
             vproattr TEXT,
             vprohackreason TEXT,
-            wins TEXT,
+            wins INTEGER,
             PRIMARY KEY (clubId, matchId),
             FOREIGN KEY (clubId) REFERENCES Clubs (clubId),
             FOREIGN KEY (matchId) REFERENCES Matches (matchId)
@@ -299,6 +430,26 @@ def main():
     """
     cursor.execute(create_seasonals_query)
 
+    # SyncState table =========================================================
+    # Newest match stored for each club and match type (high-water mark)
+    create_sync_state_query = """
+        CREATE TABLE SyncState (
+            clubId TEXT,
+            matchType TEXT,
+            lastMatchId TEXT,
+            lastTimestamp INTEGER,
+            updatedAt INTEGER,
+            PRIMARY KEY (clubId, matchType)
+        );
+    """
+    cursor.execute(create_sync_state_query)
+
+    # The tables are created at the latest version of the schema
+    cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+    cursor.close()
+    connection.close()
+
 
 if __name__ == '__main__':
     main()
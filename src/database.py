@@ -0,0 +1,96 @@
+"""Connections to the SQLite databases, shared by the scrapper and the app.
+Writers put the database in WAL mode, so the pages of the app keep reading
+the last committed data while a scrape is writing, and a writer waits for
+the lock instead of failing with "database is locked". The app opens
+read-only connections that map the database file in memory.
+
+Usage:
+    python -m src.database --database data/raw/clubedorobson.db
+"""
+import argparse
+import sqlite3
+
+
+APP_DATABASE_FILE = "data/raw/clubedorobson.db"
+
+# Seconds a connection waits for a lock before failing
+BUSY_TIMEOUT = 30
+
+# Bytes of the database file read through memory mapping by readers
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Pages written to the WAL before a commit checkpoints it back into the
+# database (the SQLite default), and bytes the WAL file is truncated to
+# after a checkpoint, so a long scrape doesn't leave a huge file behind.
+WAL_AUTOCHECKPOINT = 1000
+JOURNAL_SIZE_LIMIT = 64 * 1024 * 1024
+
+
+def connect(database_file: str = APP_DATABASE_FILE, read_only: bool = False,
+            **kwargs) -> sqlite3.Connection:
+    """Open a connection to a database.
+
+    Writers switch the database to WAL mode, which is kept in the file, and
+    sync only at checkpoints: a crash can lose the last transactions, but
+    never corrupts the database. Readers can't change the journal mode, so
+    a database only gets WAL once a writer opens it.
+
+    Args:
+        database_file (str): Path to the database.
+        read_only (bool): Whether to open the database read-only, for the
+            app. The file must exist.
+        kwargs: Other arguments of sqlite3.connect, like
+            check_same_thread.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    if read_only:
+        connection = sqlite3.connect(f"file:{database_file}?mode=ro",
+                                     uri=True, timeout=BUSY_TIMEOUT,
+                                     **kwargs)
+        connection.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        return connection
+
+    connection = sqlite3.connect(database_file, timeout=BUSY_TIMEOUT,
+                                 **kwargs)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute(f"PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT}")
+    connection.execute(f"PRAGMA journal_size_limit = {JOURNAL_SIZE_LIMIT}")
+    return connection
+
+
+def checkpoint(connection: sqlite3.Connection, mode: str = "TRUNCATE"):
+    """Copy the WAL back into the database. The automatic checkpoints can't
+    finish while readers use the WAL, so long runs call this at the end.
+
+    Args:
+        connection (sqlite3.Connection): A connection that can write.
+        mode (str): PASSIVE doesn't wait for the readers, TRUNCATE waits for
+            them and empties the WAL file.
+
+    Returns:
+        tuple: Whether the checkpoint was blocked (1) or not (0), the pages
+            in the WAL and the pages copied to the database.
+    """
+    return connection.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+
+
+def main():
+    """Switch a database to WAL mode and checkpoint it."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=APP_DATABASE_FILE)
+    args = parser.parse_args()
+
+    connection = connect(args.database)
+    journal_mode = connection.execute("PRAGMA journal_mode").fetchone()[0]
+    busy, wal_pages, copied_pages = checkpoint(connection)
+    connection.close()
+    print(f"{args.database} is in {journal_mode} mode, {copied_pages} of "
+          f"{wal_pages} pages checkpointed"
+          f"{' (blocked by a reader)' if busy else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Export the tables of the database, and views derived from them, to Parquet
+files for analyses. Each table is a folder of Parquet files, split by season
+in the tables that have one, and is loaded back through Arrow with the files
+memory mapped, so the columns are decoded straight into Arrow buffers
+instead of a Python tuple per row.
+
+Usage:
+    python -m src.export_parquet --database data/raw/clubedorobson.db
+"""
+import argparse
+import os
+import shutil
+import time
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import src.database as database
+
+
+PARQUET_FOLDER = "data/parquet"
+
+# Rows read from SQLite and written at a time
+BATCH_ROWS = 64 * 1024
+
+# Stats of each player in each season, from the matches of the player
+VIEWS = {
+    "PlayerSeasonStats": """
+        SELECT ClubsMatches.seasonid, PlayersMatches.clubid,
+            PlayersMatches.name, COUNT(*) AS matches,
+            SUM(PlayersMatches.goals) AS goals,
+            SUM(PlayersMatches.assists) AS assists,
+            SUM(PlayersMatches.shots) AS shots,
+            SUM(PlayersMatches.passesmade) AS passesmade,
+            SUM(PlayersMatches.passattempts) AS passattempts,
+            SUM(PlayersMatches.tacklesmade) AS tacklesmade,
+            SUM(PlayersMatches.tackleattempts) AS tackleattempts,
+            SUM(PlayersMatches.mom) AS mom,
+            AVG(PlayersMatches.rating) AS rating
+        FROM PlayersMatches
+        JOIN ClubsMatches
+            ON ClubsMatches.matchId = PlayersMatches.matchId
+            AND ClubsMatches.clubId = PlayersMatches.clubid
+        GROUP BY ClubsMatches.seasonid, PlayersMatches.clubid,
+            PlayersMatches.name""",
+}
+
+# Integer column the files of a table are split by. Filters on it only read
+# the files of the matching values.
+PARTITIONS = {
+    "ClubsMatches": "seasonid",
+    "PlayerSeasonStats": "seasonid",
+}
+
+# Arrow type of each SQLite storage class
+STORAGE_TYPES = {
+    "integer": pa.int64(),
+    "real": pa.float64(),
+    "text": pa.string(),
+    "blob": pa.binary(),
+}
+
+
+def get_queries(connection) -> dict:
+    """The query of each table of the database and of each view of VIEWS."""
+    tables = connection.execute(
+        """SELECT name FROM sqlite_master
+        WHERE type = 'table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name""").fetchall()
+    queries = {table: f'SELECT * FROM "{table}"' for table, in tables}
+    queries.update(VIEWS)
+    return queries
+
+
+def get_schema(connection, query: str) -> pa.Schema:
+    """Arrow schema of the rows of a query. SQLite doesn't enforce the
+    declared types, so the type of each column comes from the storage
+    classes of its values: integers mixed with reals are reals, and any
+    other mix, or a column of NULLs only, is text.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        query (str): The query.
+
+    Returns:
+        pa.Schema: The schema.
+    """
+    cursor = connection.execute(f"SELECT * FROM ({query}) LIMIT 0")
+    columns = [description[0] for description in cursor.description]
+    storage_classes = ", ".join(
+        f'GROUP_CONCAT(DISTINCT TYPEOF("{column}"))' for column in columns)
+    row = connection.execute(
+        f"SELECT {storage_classes} FROM ({query})").fetchone()
+
+    fields = []
+    for column, classes in zip(columns, row):
+        classes = set((classes or "").split(",")) - {"null", ""}
+        if classes == {"integer", "real"}:
+            classes = {"real"}
+        arrow_type = (STORAGE_TYPES[classes.pop()] if len(classes) == 1
+                      else pa.string())
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def to_array(values: tuple, arrow_type: pa.DataType) -> pa.Array:
+    """Arrow array of the values of a column in a batch of rows."""
+    if arrow_type == pa.string():
+        values = [value if value is None or isinstance(value, str)
+                  else str(value) for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+def iter_batches(connection, query: str, schema: pa.Schema):
+    """Read the rows of a query in batches of BATCH_ROWS rows.
+
+    Yields:
+        pa.RecordBatch: Each batch, with the schema.
+    """
+    cursor = connection.execute(query)
+    while True:
+        rows = cursor.fetchmany(BATCH_ROWS)
+        if not rows:
+            return
+        arrays = [to_array(values, field.type)
+                  for values, field in zip(zip(*rows), schema)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def export(connection, name: str, query: str,
+           folder: str = PARQUET_FOLDER) -> int:
+    """Write the rows of a query to the folder {folder}/{name}, split in
+    folders by the column of PARTITIONS, if any. The files are written to a
+    temporary folder that takes the place of the old one when complete.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database. Arrow
+            reads the rows from its own thread, so it must be opened with
+            check_same_thread=False.
+        name (str): Name of the table or view.
+        query (str): The query of its rows.
+        folder (str): Folder of the exports.
+
+    Returns:
+        int: The number of rows written.
+    """
+    schema = get_schema(connection, query)
+    partitioning = None
+    if name in PARTITIONS:
+        partitioning = ds.partitioning(
+            pa.schema([schema.field(PARTITIONS[name])]), flavor="hive")
+
+    rows = 0
+
+    def count_rows(batches):
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    path = os.path.join(folder, name)
+    temporary_path = path + ".tmp"
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    ds.write_dataset(
+        count_rows(iter_batches(connection, query, schema)), temporary_path,
+        schema=schema, format="parquet", partitioning=partitioning,
+        basename_template="part-{i}.parquet")
+    # A query without rows writes no files, and readers need one with the
+    # schema, like DuckDB, which fails on an empty folder
+    if rows == 0:
+        os.makedirs(temporary_path, exist_ok=True)
+        pq.write_table(schema.empty_table(),
+                       os.path.join(temporary_path, "part-0.parquet"))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(temporary_path, path)
+    return rows
+
+
+def load(name: str, folder: str = PARQUET_FOLDER, columns: list = None,
+         filters=None) -> pa.Table:
+    """Load a table or view exported by export. The files are memory mapped
+    and only the columns asked for are read. Use to_pandas on the result to
+    get a DataFrame.
+
+    Args:
+        name (str): Name of the table or view.
+        folder (str): Folder of the exports.
+        columns (list): Names of the columns to read. Defaults to all.
+        filters: Filters on the rows, like [("seasonid", "=", 50)]. On the
+            column of PARTITIONS, only the files of the matching values are
+            read.
+
+    Returns:
+        pa.Table: The rows.
+    """
+    partitioning = None
+    if name in PARTITIONS:
+        # The values are in the names of the folders, not in the files
+        partitioning = ds.partitioning(
+            pa.schema([pa.field(PARTITIONS[name], pa.int64())]),
+            flavor="hive")
+    return pq.read_table(os.path.join(folder, name), columns=columns,
+                         filters=filters, memory_map=True,
+                         partitioning=partitioning)
+
+
+def main():
+    """Export the tables and views of the command line and print the rows
+    and time of each one."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=database.APP_DATABASE_FILE)
+    parser.add_argument("--folder", default=PARQUET_FOLDER)
+    parser.add_argument("--tables", nargs="+", default=None,
+                        help="Tables and views to export. Defaults to all.")
+    args = parser.parse_args()
+
+    connection = database.connect(args.database, read_only=True,
+                                  check_same_thread=False)
+    queries = get_queries(connection)
+    names = args.tables or list(queries)
+    os.makedirs(args.folder, exist_ok=True)
+    for name in names:
+        start = time.perf_counter()
+        rows = export(connection, name, queries[name], args.folder)
+        print(f"{name:<20}{rows:>9} rows {time.perf_counter() - start:.3f}s")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Import a Postgres dump, like data/raw/dump_original.sql, straight into the
+app database, without splitting it into the files of the sql folder first.
+
+The dump is read one line at a time, so its size doesn't matter: the rows of
+the INSERT statements, with one or many rows each, and of the COPY ... FROM
+stdin blocks are converted to the types of the columns of the SQLite tables
+and written in batches of BATCH_ROWS rows. The Postgres tables have
+Portuguese names, mapped by TABLES, and the tables of the dump that the app
+doesn't have are skipped.
+
+The database is created from the create_*.sql files and migrated before the
+rows are loaded, so they go straight into the typed tables, and it replaces
+the old database only when it's complete, like in src/create_db.py.
+
+Usage:
+    python -m src.import_pg_dump --dump data/raw/dump_original.sql
+"""
+import argparse
+import os
+import re
+import sqlite3
+import time
+import src.create_db as create_db
+import src.migrate as migrate
+import src.summaries as summaries
+
+
+DUMP_FILE = "data/raw/dump_original.sql"
+
+# Rows written at a time, and held in memory
+BATCH_ROWS = 10000
+
+# Table of the app database of each table of the dump
+TABLES = {
+    "Clubes": "Clubs",
+    "ClubesPartidas": "ClubsMatches",
+    "Estadios": "Stadiums",
+    "Membros": "Players",
+    "MembrosPartidas": "PlayersMatches",
+    "Partidas": "Matches",
+    "Robsoners": "Robsoners",
+    "Seasonals": "Seasonals",
+}
+
+# Escapes of the text format of COPY
+COPY_ESCAPE_PATTERN = re.compile(r"\\(.)")
+COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t",
+                "v": "\v"}
+
+# Values of the boolean columns, in INSERT statements and in COPY blocks
+BOOLEAN_VALUES = {"t": 1, "true": 1, "f": 0, "false": 0}
+
+# Start of a string, an escape string, a dollar-quoted body or a comment,
+# outside quotes, and the end of each kind of quote inside it
+OPEN_QUOTE_PATTERN = re.compile(
+    r"(?<![\w$])[eE]'|'|(?<![\w$])\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$|--")
+CLOSE_QUOTE_PATTERNS = {
+    "'": re.compile(r"''|'"),
+    "E'": re.compile(r"\\.|''|'", re.DOTALL),
+}
+
+
+def get_converter(declared_type: str):
+    """Function that converts the values of the dump to the type of a
+    column, following the affinity rules of SQLite. Empty strings become
+    NULL in the numeric columns, like in the migrations, and values that
+    can't be converted are kept as they are.
+
+    Args:
+        declared_type (str): The declared type of the column, like INTEGER.
+
+    Returns:
+        The function, from a value to the converted value.
+    """
+    declared_type = declared_type.upper()
+    if "BOOL" in declared_type:
+        def convert(value):
+            if isinstance(value, str):
+                return BOOLEAN_VALUES.get(value.lower(), value)
+            return value
+        return convert
+    if any(text in declared_type for text in ["CHAR", "CLOB", "TEXT"]):
+        def convert(value):
+            if value is None or isinstance(value, str):
+                return value
+            return str(value)
+        return convert
+
+    number_types = [int, float]
+    if "INT" in declared_type:
+        number_types = [int]
+    elif any(real in declared_type for real in ["REAL", "FLOA", "DOUB"]):
+        number_types = [float]
+
+    def convert(value):
+        if not isinstance(value, str):
+            return value
+        if value == "":
+            return None
+        for number_type in number_types:
+            try:
+                return number_type(value)
+            except ValueError:
+                pass
+        return value
+    return convert
+
+
+def get_columns(connection: sqlite3.Connection, table: str) -> dict:
+    """Converter of each column of a table, by its name in lower case."""
+    return {name.lower(): get_converter(declared_type)
+            for _, name, declared_type, *_ in connection.execute(
+                f'PRAGMA table_info("{table}")')}
+
+
+def parse_copy(line: str) -> tuple:
+    """Parse the header of a COPY block.
+
+    Args:
+        line (str): The line, like COPY public."Clubes" (a, b) FROM stdin;
+
+    Returns:
+        tuple: The table and the columns, None if not listed.
+    """
+    tokens = create_db.tokenize(line)
+    table = create_db.unquote(tokens[1][2])
+    i = 2
+    while tokens[i][3] == ".":
+        table = create_db.unquote(tokens[i + 1][2])
+        i += 2
+    columns = None
+    if tokens[i][3] == "(":
+        end = tokens.index(("", "", "", ")", ""), i)
+        columns = [create_db.unquote(token[2]) for token in tokens[i + 1:end]]
+    return table, columns
+
+
+def copy_value(field: str):
+    """Value of a field of a COPY block, with its escapes replaced."""
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    return COPY_ESCAPE_PATTERN.sub(
+        lambda match: COPY_ESCAPES.get(match.group(1), match.group(1)),
+        field)
+
+
+def open_quote(line: str, quote: str = None) -> str:
+    """The quote still open at the end of a line of a statement.
+
+    Args:
+        line (str): The line.
+        quote (str): The quote open at its start: ', E' for the strings
+            with backslash escapes, the tag of a dollar-quoted body like
+            $$ or $body$, or None.
+
+    Returns:
+        str: The quote open at its end, in the same form.
+    """
+    i = 0
+    while True:
+        if quote is None:
+            match = OPEN_QUOTE_PATTERN.search(line, i)
+            if match is None or match.group() == "--":
+                return None
+            quote = match.group()
+            if quote[0] in "eE":
+                quote = "E'"
+            i = match.end()
+        elif quote in CLOSE_QUOTE_PATTERNS:
+            for match in CLOSE_QUOTE_PATTERNS[quote].finditer(line, i):
+                if match.group() == "'":
+                    quote = None
+                    i = match.end()
+                    break
+            else:
+                return quote
+        else:
+            end = line.find(quote, i)
+            if end == -1:
+                return quote
+            i = end + len(quote)
+            quote = None
+
+
+def iter_rows(lines):
+    """Read the rows of the INSERT statements and COPY blocks of a dump.
+    Other statements are skipped, and only a statement or a line of a COPY
+    block is held at a time.
+
+    A statement ends with a line that ends with a semicolon outside quotes,
+    so the semicolons of strings, escape strings like E'\\'' and
+    dollar-quoted bodies of functions don't split it. The values of the
+    INSERT statements are parsed by src.create_db, which only knows plain
+    strings, like the ones pg_dump writes with standard_conforming_strings
+    on.
+
+    Args:
+        lines: Iterable of the lines of the dump, like an open file.
+
+    Yields:
+        tuple: The table of the dump, the columns (None if not listed) and
+            a row.
+    """
+    lines = iter(lines)
+    statement = []
+    quote = None
+    for line in lines:
+        if not statement:
+            if line.startswith("--") or not line.strip():
+                continue
+            if line.startswith("COPY "):
+                table, columns = parse_copy(line)
+                for row in lines:
+                    if row.startswith("\\."):
+                        break
+                    yield table, columns, tuple(
+                        copy_value(field)
+                        for field in row.rstrip("\n").split("\t"))
+                continue
+
+        statement.append(line)
+        quote = open_quote(line, quote)
+        if quote is not None or not line.rstrip().endswith(";"):
+            continue
+        sql = "".join(statement)
+        statement = []
+        if not sql.lstrip().upper().startswith("INSERT"):
+            continue
+        for table, columns, rows in create_db.parse_inserts(sql):
+            for row in rows:
+                yield table, columns, row
+
+
+def import_dump(dump_file: str = DUMP_FILE,
+                database_file: str = create_db.DATABASE_FILE,
+                folder: str = create_db.SQL_FOLDER,
+                batch_rows: int = BATCH_ROWS) -> dict:
+    """Create the app database from a Postgres dump.
+
+    Args:
+        dump_file (str): Path of the dump.
+        database_file (str): Path of the database. It's replaced only when
+            the new one is complete.
+        folder (str): Folder of the create_*.sql files.
+        batch_rows (int): Rows written at a time.
+
+    Returns:
+        dict: The rows written to each table, and the rows of the tables
+            skipped, in the key "skipped".
+    """
+    temporary_file = database_file + ".tmp"
+    if os.path.exists(temporary_file):
+        os.remove(temporary_file)
+    connection = sqlite3.connect(temporary_file)
+    for pragma in create_db.BUILD_PRAGMAS:
+        connection.execute(pragma)
+    with connection:
+        for file in sorted(os.listdir(folder)):
+            if file.endswith(".sql") and "create" in file.lower():
+                with open(os.path.join(folder, file), "r") as f:
+                    connection.executescript(f.read())
+    migrate.migrate(connection)
+
+    counts = {"skipped": 0}
+    # Table, columns and converters of each table, columns and length of
+    # the rows of the dump
+    targets = {}
+    batch = []
+    batch_target = None
+
+    def write_batch():
+        table, columns, _ = batch_target
+        with connection:
+            connection.executemany(
+                create_db.get_insert_query(
+                    table, tuple(f'"{column}"' for column in columns),
+                    len(columns)), batch)
+        counts[table] = counts.get(table, 0) + len(batch)
+        batch.clear()
+
+    with open(dump_file, "r", encoding="utf-8") as f:
+        for dump_table, dump_columns, row in iter_rows(f):
+            key = (dump_table, dump_columns and tuple(dump_columns),
+                   len(row))
+            if key not in targets:
+                table = TABLES.get(dump_table)
+                targets[key] = None
+                if table is not None:
+                    converters = get_columns(connection, table)
+                    # Without a list, the columns are the ones of the table
+                    columns = tuple(column.lower() for column in
+                                    dump_columns or converters)[:len(row)]
+                    targets[key] = (table, columns, tuple(
+                        converters[column] for column in columns))
+            target = targets[key]
+            if target is None:
+                counts["skipped"] += 1
+                continue
+            if target is not batch_target or len(batch) >= batch_rows:
+                if batch:
+                    write_batch()
+                batch_target = target
+            batch.append(tuple(convert(value)
+                               for convert, value in zip(target[2], row)))
+    if batch:
+        write_batch()
+
+    with connection:
+        summaries.rebuild(connection)
+    connection.close()
+    os.replace(temporary_file, database_file)
+    return counts
+
+
+def main():
+    """Import the dump of the command line and print the rows of each
+    table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dump", default=DUMP_FILE)
+    parser.add_argument("--database", default=create_db.DATABASE_FILE)
+    parser.add_argument("--sql", default=create_db.SQL_FOLDER,
+                        help="Folder of the create_*.sql files.")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = import_dump(args.dump, args.database, args.sql, args.batch_rows)
+    for table, rows in counts.items():
+        print(f"{table:<16}{rows:>8}")
+    print(f"Imported {args.dump} into {args.database} in "
+          f"{time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Crawler that builds a dataset of many clubs, not only the ones that played
+against us. It starts from the clubs of the leaderboards and expands through
+the opponents found in the matches of each crawled club, breadth first, until
+it reaches the maximum number of clubs or depth.
+
+The clubs to crawl are kept in the Frontier table of the database, so a club
+is never crawled twice, and the status of each club is committed after every
+round. If the crawl stops, running the same command again continues where it
+stopped.
+
+Usage:
+    python -m src.mass_crawler --max-clubs 5000 --max-depth 3
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+import src.client as client
+import src.crawler as crawler
+import src.database as database
+import src.scrapper as scrapper
+
+
+FRONTIER_QUERY = """
+    CREATE TABLE IF NOT EXISTS Frontier (
+        clubId TEXT PRIMARY KEY,
+        depth INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        discoveredAt INTEGER NOT NULL,
+        updatedAt INTEGER NOT NULL
+    )
+"""
+
+CRAWL_STATE_QUERY = """
+    CREATE TABLE IF NOT EXISTS CrawlState (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+"""
+
+# Status of a club in the frontier
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+FAILED = "failed"
+
+# Times a club is crawled before giving up on it
+MAX_ATTEMPTS = 3
+
+# Clubs crawled between two checkpoints
+ROUND_SIZE = 100
+
+
+def create_frontier(connection: sqlite3.Connection):
+    """Create the frontier tables if they don't exist. The clubs that were
+    being crawled when the last run stopped go back to pending.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+    """
+    with connection:
+        connection.execute(FRONTIER_QUERY)
+        connection.execute(CRAWL_STATE_QUERY)
+        connection.execute("UPDATE Frontier SET status = ? WHERE status = ?",
+                           (PENDING, IN_PROGRESS))
+
+
+def add_clubs(connection: sqlite3.Connection, club_ids: list, depth: int,
+              max_clubs: int) -> int:
+    """Add new clubs to the frontier, without going over max_clubs. The
+    clubs already in the frontier are ignored. It doesn't commit.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_ids (list): The IDs of the clubs.
+        depth (int): Number of hops from the leaderboards.
+        max_clubs (int): Maximum number of clubs in the frontier.
+
+    Returns:
+        int: Number of clubs added.
+    """
+    known = connection.execute("SELECT COUNT(*) FROM Frontier").fetchone()[0]
+    added = 0
+    now = int(time.time())
+    for club_id in dict.fromkeys(str(club_id) for club_id in club_ids):
+        if known + added >= max_clubs:
+            break
+        cursor = connection.execute(
+            """INSERT OR IGNORE INTO Frontier
+            (clubId, depth, status, discoveredAt, updatedAt)
+            VALUES (?, ?, ?, ?, ?)""", (club_id, depth, PENDING, now, now))
+        added += cursor.rowcount
+    return added
+
+
+def seed(connection: sqlite3.Connection, max_clubs: int,
+         api_client: client.APIClient = None) -> int:
+    """Add the clubs of the leaderboards to the frontier, only the first time
+    the crawl runs.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        max_clubs (int): Maximum number of clubs in the frontier.
+        api_client (client.APIClient): Client of the requests. Defaults to
+            scrapper.get_client().
+
+    Returns:
+        int: Number of clubs added.
+    """
+    seeded = connection.execute(
+        "SELECT value FROM CrawlState WHERE key = 'seeded'").fetchone()
+    if seeded is not None:
+        return 0
+
+    club_ids = [club["clubInfo"]["clubId"]
+                for leaderboard in scrapper.LEADERBOARDS
+                for club in scrapper.get_leaderboard(leaderboard,
+                                                     api_client)]
+    with connection:
+        added = add_clubs(connection, club_ids, 0, max_clubs)
+        connection.execute("INSERT INTO CrawlState VALUES ('seeded', ?)",
+                           (str(int(time.time())),))
+    return added
+
+
+def claim_clubs(connection: sqlite3.Connection, round_size: int) -> dict:
+    """Take the next pending clubs of the frontier, the closest to the
+    leaderboards first, and mark them as in progress.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        round_size (int): Maximum number of clubs to take.
+
+    Returns:
+        dict: The depth of each club taken.
+    """
+    with connection:
+        clubs = dict(connection.execute(
+            """SELECT clubId, depth FROM Frontier WHERE status = ?
+            ORDER BY depth, discoveredAt LIMIT ?""", (PENDING, round_size)))
+        connection.executemany(
+            "UPDATE Frontier SET status = ?, updatedAt = ? WHERE clubId = ?",
+            [(IN_PROGRESS, int(time.time()), club_id) for club_id in clubs])
+    return clubs
+
+
+def checkpoint(connection: sqlite3.Connection, clubs: dict,
+               failed_clubs: set, opponents: dict, max_depth: int,
+               max_clubs: int) -> int:
+    """Save the result of a round in a single transaction: the crawled clubs
+    are done, the failed ones go back to pending until they run out of
+    attempts, and the opponents of the crawled clubs join the frontier.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        clubs (dict): The depth of each club of the round.
+        failed_clubs (set): The IDs of the clubs with a failed request.
+        opponents (dict): The IDs of the opponents of each club.
+        max_depth (int): Maximum number of hops from the leaderboards.
+        max_clubs (int): Maximum number of clubs in the frontier.
+
+    Returns:
+        int: Number of clubs added to the frontier.
+    """
+    now = int(time.time())
+    added = 0
+    with connection:
+        for club_id, depth in clubs.items():
+            if club_id in failed_clubs:
+                connection.execute(
+                    """UPDATE Frontier
+                    SET attempts = attempts + 1,
+                        status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END,
+                        updatedAt = ?
+                    WHERE clubId = ?""",
+                    (MAX_ATTEMPTS, FAILED, PENDING, now, club_id))
+                continue
+
+            connection.execute(
+                """UPDATE Frontier
+                SET attempts = attempts + 1, status = ?, updatedAt = ?
+                WHERE clubId = ?""", (DONE, now, club_id))
+            if depth < max_depth:
+                added += add_clubs(connection, opponents.get(club_id, []),
+                                   depth + 1, max_clubs)
+    return added
+
+
+def frontier_stats(connection: sqlite3.Connection) -> dict:
+    """Number of clubs of the frontier in each status."""
+    stats = {status: 0 for status in [PENDING, IN_PROGRESS, DONE, FAILED]}
+    stats.update(connection.execute(
+        "SELECT status, COUNT(*) FROM Frontier GROUP BY status"))
+    return stats
+
+
+class MassCrawler:
+    """Crawl the frontier in rounds with src/crawler.py, collecting the
+    opponents found in the matches responses to expand it.
+
+    Attributes:
+        database_file: Path to the database with the frontier and the data.
+        max_clubs: Maximum number of clubs in the frontier.
+        max_depth: Maximum number of hops from the leaderboards.
+        round_size: Clubs crawled between two checkpoints.
+        crawler: The crawler of each round. Its client makes all the
+            requests, the leaderboards included.
+        opponents: The IDs of the opponents of each club of the round.
+    """
+    def __init__(self, database_file: str = scrapper.DATABASE_FILE,
+                 max_clubs: int = 1000, max_depth: int = 2,
+                 round_size: int = ROUND_SIZE, concurrency: int = 8,
+                 requests_per_second: float = 10,
+                 api_client: client.APIClient = None) -> None:
+        self.database_file = database_file
+        self.max_clubs = max_clubs
+        self.max_depth = max_depth
+        self.round_size = round_size
+        self.crawler = crawler.Crawler(database_file, concurrency,
+                                       requests_per_second,
+                                       api_client=api_client)
+        self.crawler.club_endpoints = [
+            (scrapper.get_players, scrapper.insert_players),
+            (scrapper.get_matches, self.insert_matches),
+        ]
+        self.opponents = {}
+
+    def insert_matches(self, connection: sqlite3.Connection, club_id: str,
+                       response: list) -> int:
+        """scrapper.insert_matches that also keeps the opponents of the
+        club. All the matches of the response count, even the ones already
+        stored."""
+        self.opponents[club_id] = {
+            other_id for match in response for other_id in match["clubs"]
+            if other_id != str(club_id)}
+        return scrapper.insert_matches(connection, club_id, response)
+
+    async def _run(self, connection: sqlite3.Connection, stats: dict,
+                   max_rounds: int):
+        """Crawl rounds of the frontier in the same event loop, which the
+        rate limiter of the crawler is bound to."""
+        while max_rounds is None or stats["rounds"] < max_rounds:
+            clubs = claim_clubs(connection, self.round_size)
+            if not clubs:
+                break
+
+            self.opponents = {}
+            round_stats = await self.crawler.crawl(list(clubs))
+            stats["discovered"] += checkpoint(
+                connection, clubs, self.crawler.failed_clubs, self.opponents,
+                self.max_depth, self.max_clubs)
+            stats["rounds"] += 1
+            stats["clubs"] += len(clubs)
+            stats["failed"] += round_stats["failed"]
+
+    def run(self, max_rounds: int = None) -> dict:
+        """Seed the frontier if needed and crawl it until there are no pending
+        clubs left.
+
+        Args:
+            max_rounds (int): Stop after this many rounds. None to crawl the
+                whole frontier.
+
+        Returns:
+            dict: Number of rounds, clubs crawled, clubs discovered, failed
+                requests and the elapsed time in seconds, and the number of
+                clubs of the frontier in each status.
+        """
+        stats = {"rounds": 0, "clubs": 0, "discovered": 0, "failed": 0}
+        start = time.perf_counter()
+        connection = scrapper.connect(self.database_file)
+        create_frontier(connection)
+        stats["discovered"] += seed(connection, self.max_clubs,
+                                    self.crawler.client)
+        asyncio.run(self._run(connection, stats, max_rounds))
+
+        stats["frontier"] = frontier_stats(connection)
+        database.checkpoint(connection)
+        connection.close()
+        stats["elapsed"] = time.perf_counter() - start
+        return stats
+
+
+def main():
+    """Crawl the frontier with the options of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=scrapper.DATABASE_FILE)
+    parser.add_argument("--max-clubs", type=int, default=1000,
+                        help="Maximum number of clubs in the frontier.")
+    parser.add_argument("--max-depth", type=int, default=2,
+                        help="Maximum number of hops from the leaderboards.")
+    parser.add_argument("--round-size", type=int, default=ROUND_SIZE)
+    parser.add_argument("--max-rounds", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10,
+                        help="Maximum requests per second to each host.")
+    args = parser.parse_args()
+
+    mass_crawler = MassCrawler(args.database, args.max_clubs, args.max_depth,
+                               args.round_size, args.concurrency, args.rate)
+    stats = mass_crawler.run(args.max_rounds)
+    print(f"{stats['clubs']} clubs crawled in {stats['rounds']} rounds and "
+          f"{stats['elapsed']:.1f}s, {stats['discovered']} discovered "
+          f"({stats['failed']} failed requests)")
+    print(", ".join(f"{count} {status}"
+                    for status, count in stats["frontier"].items()))
+    mass_crawler.crawler.client.print_latency_report()
+    scrapper.METRICS.export("mass_crawler")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Metrics of the scrapper runs. For each endpoint, histograms of the time
+spent in HTTP requests, reading streamed bodies, decoding JSON and writing to
+SQLite, and counters of the bytes received, the rows written and the failed
+attempts. At the end of a run they are written in the Prometheus text format
+(for the textfile collector of node_exporter) and as a JSON summary.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+METRICS_FOLDER = "data/metrics"
+
+# Upper bounds in seconds of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Time histograms, with their help text
+PHASES = {
+    "http": "Time until the API answers, per attempt.",
+    "stream": "Time reading the bodies of streamed responses.",
+    "decode": "Time decoding the JSON responses.",
+    "write": "Time writing the responses to SQLite.",
+}
+
+# Counters, with their help text
+COUNTERS = {
+    "bytes": "Bytes of the response bodies received.",
+    "rows": "Rows of the responses inserted or replaced in SQLite.",
+    "errors": "Failed attempts of HTTP requests.",
+}
+
+
+class Histogram:
+    """Cumulative histogram of durations, as Prometheus expects it.
+
+    Attributes:
+        buckets: Upper bounds of the buckets.
+        counts: Number of observations in each bucket, the last one being
+            +Inf.
+        total: Sum of the observations.
+        count: Number of observations.
+        max: Largest observation.
+    """
+    def __init__(self, buckets: tuple = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.count = 0
+        self.max = 0
+
+    def observe(self, value: float):
+        """Add an observation."""
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def cumulative_counts(self) -> list:
+        """Number of observations up to each bound, including +Inf."""
+        counts = []
+        total = 0
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class Metrics:
+    """Histograms and counters by endpoint, shared by many threads.
+
+    Attributes:
+        started_at: When the metrics started being collected.
+        histograms: Histogram of each phase and endpoint.
+        counters: Value of each counter and endpoint.
+    """
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self.histograms = {phase: {} for phase in PHASES}
+        self.counters = {counter: {} for counter in COUNTERS}
+        self._lock = threading.Lock()
+
+    def observe(self, phase: str, endpoint: str, seconds: float):
+        """Add a duration to the histogram of a phase.
+
+        Args:
+            phase (str): One of PHASES.
+            endpoint (str): Name of the endpoint, such as clubs/info.
+            seconds (float): The duration.
+        """
+        with self._lock:
+            histogram = self.histograms[phase].setdefault(endpoint,
+                                                          Histogram())
+            histogram.observe(seconds)
+
+    def count(self, counter: str, endpoint: str, value: int = 1):
+        """Increase a counter.
+
+        Args:
+            counter (str): One of COUNTERS.
+            endpoint (str): Name of the endpoint, such as clubs/info.
+            value (int): How much to add.
+        """
+        with self._lock:
+            counters = self.counters[counter]
+            counters[endpoint] = counters.get(endpoint, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, phase: str, endpoint: str):
+        """Observe the duration of the block in the histogram of a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, endpoint, time.perf_counter() - start)
+
+    def write(self, endpoint: str):
+        """Observe the duration of a write transaction in the block. The
+        rows it inserts are counted by the caller with count("rows", ...),
+        since the transaction also changes tables that aren't the data of
+        the response, like the summaries.
+
+        Args:
+            endpoint (str): Name of the endpoint of the response written.
+        """
+        return self.timer("write", endpoint)
+
+    def summary(self) -> dict:
+        """Summary of the metrics of each endpoint.
+
+        Returns:
+            dict: The start, end and duration of the run, and for each
+                endpoint the count, total, mean and maximum seconds of each
+                phase, the counters, and the bytes per second received and
+                rows per second written.
+        """
+        endpoints = {}
+        with self._lock:
+            for phase, histograms in self.histograms.items():
+                for endpoint, histogram in histograms.items():
+                    endpoints.setdefault(endpoint, {})[phase] = {
+                        "count": histogram.count,
+                        "seconds": histogram.total,
+                        "mean": histogram.total / histogram.count,
+                        "max": histogram.max
+                    }
+            for counter, values in self.counters.items():
+                for endpoint, value in values.items():
+                    endpoints.setdefault(endpoint, {})[counter] = value
+
+        for stats in endpoints.values():
+            http_seconds = sum(stats.get(phase, {}).get("seconds", 0)
+                               for phase in ["http", "stream"])
+            if "bytes" in stats and http_seconds:
+                stats["bytes_per_second"] = stats["bytes"] / http_seconds
+            if "rows" in stats and stats.get("write", {}).get("seconds"):
+                stats["rows_per_second"] = (stats["rows"] /
+                                            stats["write"]["seconds"])
+
+        finished_at = time.time()
+        return {
+            "started_at": self.started_at,
+            "finished_at": finished_at,
+            "elapsed": finished_at - self.started_at,
+            "endpoints": dict(sorted(endpoints.items()))
+        }
+
+    def prometheus(self, prefix: str = "scrapper") -> str:
+        """The metrics in the Prometheus text format.
+
+        Args:
+            prefix (str): Prefix of the names of the metrics.
+
+        Returns:
+            str: The text, one line per sample.
+        """
+        lines = []
+        with self._lock:
+            for phase, help_text in PHASES.items():
+                name = f"{prefix}_{phase}_seconds"
+                lines += [f"# HELP {name} {help_text}",
+                          f"# TYPE {name} histogram"]
+                for endpoint, histogram in sorted(
+                        self.histograms[phase].items()):
+                    labels = f'endpoint="{endpoint}"'
+                    bounds = [str(bound) for bound in histogram.buckets]
+                    for bound, count in zip(bounds + ["+Inf"],
+                                            histogram.cumulative_counts()):
+                        lines.append(
+                            f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+            for counter, help_text in COUNTERS.items():
+                name = f"{prefix}_{counter}_total"
+                lines += [f"# HELP {name} {help_text}",
+                          f"# TYPE {name} counter"]
+                for endpoint, value in sorted(self.counters[counter].items()):
+                    lines.append(f'{name}{{endpoint="{endpoint}"}} {value}')
+
+        name = f"{prefix}_run_started_seconds"
+        lines += [f"# HELP {name} When the run started, as a Unix time.",
+                  f"# TYPE {name} gauge", f"{name} {self.started_at}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, name: str = "scrapper", folder: str = METRICS_FOLDER,
+               summary: bool = True) -> list:
+        """Write the metrics to {folder}/{name}.prom, replaced in every run,
+        and the summary to {folder}/{name}-<time>.json, one per run. Files
+        are written to a temporary path and renamed, so a collector never
+        reads half a file.
+
+        Args:
+            name (str): Name of the files, and prefix of the metrics.
+            folder (str): Folder of the files.
+            summary (bool): Whether to write the summary too. Long-running
+                processes export only the Prometheus file while running.
+
+        Returns:
+            list: The paths of the files written.
+        """
+        os.makedirs(folder, exist_ok=True)
+        files = [(os.path.join(folder, f"{name}.prom"),
+                  self.prometheus(name))]
+        if summary:
+            timestamp = time.strftime("%Y%m%dT%H%M%S")
+            files.append((os.path.join(folder, f"{name}-{timestamp}.json"),
+                          json.dumps(self.summary(), indent=2)))
+
+        for path, content in files:
+            with open(path + ".tmp", "w") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+        return [path for path, _ in files]
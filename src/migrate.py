@@ -0,0 +1,256 @@
+"""Migrations of the app database. The version of a database is kept in its
+PRAGMA user_version, and the migrations after it are applied in order, each
+one in its own transaction, so a database is never left half migrated.
+
+Usage:
+    python -m src.migrate --database data/raw/clubedorobson.db
+"""
+import argparse
+import sqlite3
+
+
+DATABASE_FILE = "data/raw/clubedorobson.db"
+
+# Indexes of the lookups of the app. Clubs, matches and players are read by
+# their IDs and names, and the matches of a club by season.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ClubsClubId ON Clubs (clubId)",
+    "CREATE INDEX IF NOT EXISTS PlayersName ON Players (name)",
+    "CREATE INDEX IF NOT EXISTS PlayersClubId ON Players (clubid)",
+    """CREATE INDEX IF NOT EXISTS PlayersMatchesMatchId
+        ON PlayersMatches (matchId)""",
+    # The latest match of a player is read backwards from this index
+    """CREATE INDEX IF NOT EXISTS PlayersMatchesName
+        ON PlayersMatches (name, matchId)""",
+    "CREATE INDEX IF NOT EXISTS MatchesHomeClub ON Matches (homeClub)",
+    "CREATE INDEX IF NOT EXISTS MatchesAwayClub ON Matches (awayClub)",
+    # Covers the seasons of a club and the matches of a season
+    """CREATE INDEX IF NOT EXISTS ClubsMatchesClubSeason
+        ON ClubsMatches (clubId, seasonid, matchId)""",
+    """CREATE INDEX IF NOT EXISTS ClubsMatchesMatchId
+        ON ClubsMatches (matchId)""",
+]
+
+
+def rebuild_table(table: str, columns: list, constraints: list = ()) -> list:
+    """Statements that change the types of the columns of a table. SQLite
+    can't alter a column, so the rows are copied to a new table that takes
+    the place of the old one. Its indexes are dropped with it, so they have
+    to be created again.
+
+    Args:
+        table (str): The name of the table.
+        columns (list): The name and definition of each column of the new
+            table, in the order of the old one. The values of INTEGER and
+            REAL columns are converted, and empty strings become NULL.
+        constraints (list): The table constraints of the new table, like
+            its PRIMARY KEY.
+
+    Returns:
+        list: The statements.
+    """
+    definitions = ",\n    ".join(
+        [f"{name} {definition}" for name, definition in columns]
+        + list(constraints))
+    values = []
+    for name, definition in columns:
+        column_type = definition.split()[0]
+        if column_type in ("INTEGER", "REAL"):
+            values.append(f"CAST(NULLIF({name}, '') AS {column_type})")
+        else:
+            values.append(name)
+    return [
+        f"CREATE TABLE {table}New (\n    {definitions}\n)",
+        f"INSERT INTO {table}New SELECT {', '.join(values)} FROM {table}",
+        f"DROP TABLE {table}",
+        f"ALTER TABLE {table}New RENAME TO {table}",
+    ]
+
+
+# Statements of each migration. The version of a database is the number of
+# migrations applied to it, so migrations are only ever appended.
+MIGRATIONS = [
+    # 1: Indexes of the lookups of the app
+    INDEXES,
+    # 2: Numbers of the stats stored as INTEGER and REAL instead of TEXT. The
+    # attributes that some players don't have were empty strings, and are
+    # NULL now.
+    rebuild_table("Players", [
+        ("name", "TEXT NOT NULL"),
+        ("gamesPlayed", "INTEGER NOT NULL"),
+        ("winRate", "INTEGER NOT NULL"),
+        ("goals", "INTEGER NOT NULL"),
+        ("assists", "INTEGER NOT NULL"),
+        ("cleanSheetsDef", "INTEGER NOT NULL"),
+        ("cleanSheetsGK", "INTEGER NOT NULL"),
+        ("shotSuccessRate", "INTEGER NOT NULL"),
+        ("passesMade", "INTEGER NOT NULL"),
+        ("passSuccessRate", "INTEGER NOT NULL"),
+        ("tacklesMade", "INTEGER NOT NULL"),
+        ("tackleSuccessRate", "INTEGER NOT NULL"),
+        ("proName", "TEXT NOT NULL"),
+        ("proPos", "INTEGER"),
+        ("proStyle", "INTEGER"),
+        ("proHeight", "INTEGER"),
+        ("proNationality", "INTEGER"),
+        ("proOverall", "INTEGER NOT NULL"),
+        ("manOfTheMatch", "INTEGER NOT NULL"),
+        ("redCards", "INTEGER NOT NULL"),
+        ("favoritePosition", "TEXT NOT NULL"),
+        ("createdAt", "TEXT NOT NULL"),
+        ("updatedAt", "TEXT NOT NULL"),
+        ("clubid", "INTEGER"),
+    ]) + rebuild_table("PlayersMatches", [
+        ("memberMatchId", "TEXT NOT NULL"),
+        ("name", "TEXT NOT NULL"),
+        ("matchId", "TEXT NOT NULL"),
+        ("passattempts", "INTEGER NOT NULL"),
+        ("passesmade", "INTEGER NOT NULL"),
+        ("rating", "REAL NOT NULL"),
+        ("shots", "INTEGER NOT NULL"),
+        ("goals", "INTEGER NOT NULL"),
+        ("mom", "INTEGER NOT NULL"),
+        ("assists", "INTEGER NOT NULL"),
+        ("tackleattempts", "INTEGER NOT NULL"),
+        ("tacklesmade", "INTEGER NOT NULL"),
+        ("pos", "TEXT NOT NULL"),
+        ("vproattr", "TEXT NOT NULL"),
+        ("createdAt", "TEXT NOT NULL"),
+        ("updatedAt", "TEXT NOT NULL"),
+        ("clubid", "INTEGER"),
+    ]) + rebuild_table("ClubsMatches", [
+        ("clubMatchId", "TEXT NOT NULL"),
+        ("clubId", "INTEGER NOT NULL"),
+        ("matchId", "TEXT NOT NULL"),
+        ("passattempts", "INTEGER NOT NULL"),
+        ("passesmade", "INTEGER NOT NULL"),
+        ("rating", "REAL NOT NULL"),
+        ("shots", "INTEGER NOT NULL"),
+        ("goals", "INTEGER NOT NULL"),
+        ("goalsConceded", "INTEGER NOT NULL"),
+        ("assists", "INTEGER NOT NULL"),
+        ("tackleattempts", "INTEGER NOT NULL"),
+        ("tacklesmade", "INTEGER NOT NULL"),
+        ("createdAt", "TEXT NOT NULL"),
+        ("updatedAt", "TEXT NOT NULL"),
+        ("seasonid", "INTEGER"),
+    ]) + rebuild_table("Matches", [
+        ("matchId", "TEXT NOT NULL"),
+        ("timestamp", "INTEGER NOT NULL"),
+        ("homeClub", "INTEGER NOT NULL"),
+        ("awayClub", "INTEGER NOT NULL"),
+        ("homeGoals", "INTEGER NOT NULL"),
+        ("awayGoals", "INTEGER NOT NULL"),
+        ("createdAt", "TEXT NOT NULL"),
+        ("updatedAt", "TEXT NOT NULL"),
+    ]) + INDEXES,
+    # 3: Summaries of the clubs and players in each season, kept up to date
+    # by src.summaries when matches are written. The statements are a copy
+    # of the ones of src.summaries at the time, so a change of the summary
+    # tables there needs a new migration here.
+    [
+        """CREATE TABLE IF NOT EXISTS SeasonClubSummary (
+            seasonid INTEGER NOT NULL,
+            clubId INTEGER NOT NULL,
+            matches INTEGER NOT NULL,
+            wins INTEGER NOT NULL,
+            draws INTEGER NOT NULL,
+            losses INTEGER NOT NULL,
+            goals INTEGER NOT NULL,
+            goalsConceded INTEGER NOT NULL,
+            PRIMARY KEY (seasonid, clubId)
+        )""",
+        """CREATE INDEX IF NOT EXISTS SeasonClubSummaryClubId
+            ON SeasonClubSummary (clubId, seasonid)""",
+        """CREATE TABLE IF NOT EXISTS PlayerSeasonSummary (
+            seasonid INTEGER NOT NULL,
+            clubId INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            matches INTEGER NOT NULL,
+            goals INTEGER NOT NULL,
+            assists INTEGER NOT NULL,
+            mom INTEGER NOT NULL,
+            rating REAL,
+            PRIMARY KEY (seasonid, clubId, name)
+        )""",
+        """INSERT INTO SeasonClubSummary
+            SELECT ClubsMatches.seasonid, ClubsMatches.clubId, COUNT(*),
+                TOTAL(ClubsMatches.goals > ClubsMatches.goalsConceded),
+                TOTAL(ClubsMatches.goals = ClubsMatches.goalsConceded),
+                TOTAL(ClubsMatches.goals < ClubsMatches.goalsConceded),
+                TOTAL(ClubsMatches.goals), TOTAL(ClubsMatches.goalsConceded)
+            FROM ClubsMatches
+            WHERE ClubsMatches.seasonid IS NOT NULL
+            GROUP BY ClubsMatches.seasonid, ClubsMatches.clubId""",
+        """INSERT INTO PlayerSeasonSummary
+            SELECT ClubsMatches.seasonid, ClubsMatches.clubId,
+                PlayersMatches.name, COUNT(*),
+                TOTAL(PlayersMatches.goals), TOTAL(PlayersMatches.assists),
+                TOTAL(PlayersMatches.mom), AVG(PlayersMatches.rating)
+            FROM ClubsMatches
+            JOIN PlayersMatches
+                ON PlayersMatches.matchId = ClubsMatches.matchId
+                AND PlayersMatches.clubid = ClubsMatches.clubId
+            WHERE ClubsMatches.seasonid IS NOT NULL
+            GROUP BY ClubsMatches.seasonid, ClubsMatches.clubId,
+                PlayersMatches.name""",
+    ],
+]
+
+
+def get_version(connection: sqlite3.Connection) -> int:
+    """Number of migrations applied to a database."""
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection, version: int = None,
+            migrations: list = MIGRATIONS) -> int:
+    """Apply the migrations a database is missing.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        version (int): Version to migrate to. Defaults to the latest.
+        migrations (list): Statements of each migration. Defaults to the
+            ones of the app database.
+
+    Returns:
+        int: The number of migrations applied.
+    """
+    if version is None:
+        version = len(migrations)
+    applied = 0
+    for number in range(get_version(connection) + 1, version + 1):
+        # DDL doesn't open a transaction by itself. The write lock is taken
+        # first, so connections migrating at the same time apply each
+        # migration once.
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if get_version(connection) >= number:
+                connection.rollback()
+                continue
+            for statement in migrations[number - 1]:
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {number}")
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+        applied += 1
+    return applied
+
+
+def main():
+    """Migrate the database of the command line to the latest version."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=DATABASE_FILE)
+    args = parser.parse_args()
+
+    connection = sqlite3.connect(args.database)
+    applied = migrate(connection)
+    print(f"Applied {applied} migrations, {args.database} is at version "
+          f"{get_version(connection)}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""Local stand-in for the FIFA Pro Clubs API, used to benchmark the scrapper
+without making requests to EA. The payloads follow the schemas of
+swagger.yaml (restricted to the columns of the mock database) and are
+generated from the club ID, so the same request always gets the same answer.
+
+The number of members and matches of each club can be changed to test large
+payloads, and the server can be made slow or unreliable: every request waits
+a latency plus a random jitter, and a share of them fail with 500 Internal
+Server Error or 429 Too Many Requests.
+
+Usage:
+    python -m src.mock_api --port 8000 --latency 0.1 --error-rate 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+KIT_COLUMNS = [
+    "kitId", "isCustomTeam", "customKitId", "customAwayKitId",
+    "customKeeperKitId", "kitColor1", "kitColor2", "kitColor3", "kitColor4",
+    "kitAColor1", "kitAColor2", "kitAColor3", "kitAColor4", "dCustomKit",
+    "crestColor", "crestAssetId"
+]
+
+MEMBER_COLUMNS = [
+    "gamesPlayed", "winRate", "goals", "assists", "cleanSheetsDef",
+    "cleanSheetsGK", "shotSuccessRate", "passesMade", "passSuccessRate",
+    "tacklesMade", "tackleSuccessRate", "proPos", "proStyle", "proHeight",
+    "proNationality", "proOverall", "manOfTheMatch", "redCards", "prevGoals"
+]
+
+PLAYER_MATCH_COLUMNS = [
+    "assists", "cleansheetsany", "cleansheetsdef", "cleansheetsgk", "goals",
+    "goalsconceded", "losses", "mom", "namespace", "passattempts",
+    "passesmade", "pos", "rating", "realtimegame", "realtimeidle",
+    "redcards", "saves", "SCORE", "shots", "tackleattempts", "tacklesmade",
+    "vproattr", "vprohackreason", "wins"
+]
+
+SEASONAL_COLUMNS = [
+    "seasons", "titlesWon", "leaguesWon", "divsWon1", "divsWon2", "divsWon3",
+    "divsWon4"] + [f"cupsWon{i}" for i in range(7)] + [
+    f"cupsElim{i}{suffix}" for i in range(7)
+    for suffix in ["", "R1", "R2", "R3", "R4"]] + [
+    "promotions", "holds", "relegations", "rankingPoints", "prevDivision",
+    "maxDivision", "bestDivision", "bestPoints", "curSeasonMov"] + [
+    f"lastMatch{i}" for i in range(10)] + [
+    f"lastOpponent{i}" for i in range(10)] + [
+    "starLevel", "cupRankingPoints", "overallRankingPoints", "alltimeGoals",
+    "alltimeGoalsAgainst", "seasonWins", "seasonTies", "seasonLosses",
+    "gamesPlayed", "goals", "goalsAgainst", "points", "prevSeasonWins",
+    "prevSeasonTies", "prevSeasonLosses", "prevPoints", "prevProjectedPts",
+    "skill", "wins", "ties", "losses", "currentDivision", "projectedPoints",
+    "totalCupsWon", "totalGames"
+]
+
+POSITIONS = ["goalkeeper", "defender", "midfielder", "forward"]
+
+MEMBERS_PER_CLUB = 11
+
+MATCHES_PER_CLUB = 5
+
+
+def club_info_payload(club_id: int) -> dict:
+    """Response of /clubs/info for one club."""
+    rng = random.Random(club_id)
+    custom_kit = {column: str(rng.randint(0, 16777215))
+                  for column in KIT_COLUMNS}
+    custom_kit["stadName"] = f"Stadium {club_id}"
+    return {
+        "clubId": club_id,
+        "name": f"Club {club_id}",
+        "regionId": str(rng.randint(1000000, 9999999)),
+        "teamId": str(rng.randint(1, 120000)),
+        "customKit": custom_kit
+    }
+
+
+def seasonals_payload(club_id: int) -> dict:
+    """Response of /clubs/seasonalStats for one club."""
+    rng = random.Random(club_id)
+    seasonals = {column: str(rng.randint(0, 100))
+                 for column in SEASONAL_COLUMNS}
+    seasonals["clubId"] = club_id
+    seasonals["recentResults"] = [rng.choice(["wins", "losses", "ties"])
+                                  for _ in range(10)]
+    return seasonals
+
+
+def member_payload(club_id: int, index: int) -> dict:
+    """Stats of one member of a club, as in /members/stats."""
+    rng = random.Random(club_id * 100 + index)
+    member = {column: str(rng.randint(0, 100)) for column in MEMBER_COLUMNS}
+    member["name"] = f"player_{club_id}_{index}"
+    member["proName"] = f"Player {index}"
+    member["favoritePosition"] = rng.choice(POSITIONS)
+    return member
+
+
+def members_payload(club_id: int, n_members: int = MEMBERS_PER_CLUB) -> dict:
+    """Response of /members/stats."""
+    return {
+        "members": [member_payload(club_id, index)
+                    for index in range(n_members)],
+        "positionCount": {position: "0" for position in POSITIONS}
+    }
+
+
+def opponent_id(club_id: int, match_index: int) -> int:
+    """ID of the club that played the match_index-th match of club_id."""
+    return random.Random(club_id * 1000 + match_index).randint(1, 10000000)
+
+
+def match_payload(club_id: int, match_index: int,
+                  n_members: int = MEMBERS_PER_CLUB) -> dict:
+    """One element of the response of /clubs/matches."""
+    rng = random.Random(club_id * 1000 + match_index)
+    opponent = opponent_id(club_id, match_index)
+    # The same ID for both clubs, no matter who is asking for the match.
+    match_id = str(min(club_id, opponent) * 10000000 + max(club_id, opponent)
+                   + match_index)
+    goals = {club_id: rng.randint(0, 5), opponent: rng.randint(0, 5)}
+    match = {
+        "matchId": match_id,
+        "timestamp": str(1700000000 + match_index * 3600),
+        "timeAgo": {"number": str(match_index + 1), "unit": "hours"},
+        "clubs": {},
+        "players": {},
+        "aggregate": {}
+    }
+    for team, (club, against) in enumerate([(club_id, opponent),
+                                            (opponent, club_id)]):
+        scored, conceded = goals[club], goals[against]
+        match["clubs"][str(club)] = {
+            "gameNumber": str(match_index),
+            "goals": str(scored),
+            "goalsAgainst": str(conceded),
+            "losses": str(int(scored < conceded)),
+            "result": str(1 if scored > conceded else
+                          2 if scored < conceded else 4),
+            "score": str(scored),
+            "season_id": str(1 + match_index // 10),
+            "TEAM": str(team),
+            "ties": str(int(scored == conceded)),
+            "winnerByDnf": "0",
+            "wins": str(int(scored > conceded)),
+            "details": club_info_payload(club)
+        }
+        players = {}
+        for index in range(n_members):
+            player = {column: str(rng.randint(0, 10))
+                      for column in PLAYER_MATCH_COLUMNS}
+            player["playername"] = f"player_{club}_{index}"
+            players[str(club * 100 + index)] = player
+        match["players"][str(club)] = players
+        match["aggregate"][str(club)] = {column: str(rng.randint(0, 50))
+                                         for column in PLAYER_MATCH_COLUMNS}
+    return match
+
+
+def leaderboard_payload(leaderboard: str) -> list:
+    """Response of /seasonRankLeaderboard and /clubRankLeaderboard."""
+    rng = random.Random(leaderboard)
+    leaderboard_payload = []
+    for rank in range(1, 101):
+        club_id = rng.randint(1, 10000000)
+        leaderboard_payload.append({
+            "clubInfo": club_info_payload(club_id),
+            "rank": str(rank),
+            "clubName": f"Club {club_id}",
+            "clubId": str(club_id),
+            "platform": "ps5"
+        })
+    return leaderboard_payload
+
+
+def matches_payload(club_id: int, n_matches: int = MATCHES_PER_CLUB,
+                    n_members: int = MEMBERS_PER_CLUB) -> list:
+    """Response of /clubs/matches."""
+    return [match_payload(club_id, match_index, n_members)
+            for match_index in range(n_matches)]
+
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """Answer the requests to the endpoints used by the scrapper. The
+    options are class attributes, set by start_server in a subclass.
+
+    Attributes:
+        latency: Seconds to wait before answering each request.
+        jitter: Maximum random seconds added to the latency.
+        error_rate: Share of the requests answered with 500.
+        rate_limit_rate: Share of the requests answered with 429.
+        n_members: Members of each club, and players of each club in a
+            match.
+        n_matches: Matches of each club.
+        rng: Random generator of the jitter and the errors.
+    """
+    latency = 0
+    jitter = 0
+    error_rate = 0
+    rate_limit_rate = 0
+    n_members = MEMBERS_PER_CLUB
+    n_matches = MATCHES_PER_CLUB
+    rng = random.Random(0)
+
+    def do_GET(self):
+        """Route the request to the payload of the endpoint."""
+        time.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        draw = self.rng.random()
+        if draw < self.rate_limit_rate:
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if draw < self.rate_limit_rate + self.error_rate:
+            self.send_error(500)
+            return
+
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        club_ids = [int(club_id) for value in params.get("clubIds", [])
+                    for club_id in value.split(",")]
+        club_ids += [int(value) for value in params.get("clubId", [])]
+        endpoint = url.path.removeprefix("/api/fifa")
+
+        if endpoint == "/clubs/info":
+            payload = {str(club_id): club_info_payload(club_id)
+                       for club_id in club_ids}
+        elif endpoint == "/clubs/seasonalStats":
+            payload = [seasonals_payload(club_id) for club_id in club_ids]
+        elif endpoint == "/members/stats":
+            payload = members_payload(club_ids[0], self.n_members)
+        elif endpoint == "/clubs/matches":
+            payload = matches_payload(club_ids[0], self.n_matches,
+                                      self.n_members)
+        elif endpoint in ["/seasonRankLeaderboard", "/clubRankLeaderboard"]:
+            payload = leaderboard_payload(endpoint.strip("/"))
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log every request."""
+
+
+def start_server(port: int = 0, latency: float = 0, jitter: float = 0,
+                 error_rate: float = 0, rate_limit_rate: float = 0,
+                 n_members: int = MEMBERS_PER_CLUB,
+                 n_matches: int = MATCHES_PER_CLUB,
+                 seed: int = 0) -> ThreadingHTTPServer:
+    """Start the mock API in a background thread.
+
+    Args:
+        port (int): Port to listen on. 0 picks a free port.
+        latency (float): Seconds to wait before answering each request.
+        jitter (float): Maximum random seconds added to the latency.
+        error_rate (float): Share of the requests answered with 500.
+        rate_limit_rate (float): Share of the requests answered with 429.
+        n_members (int): Members of each club.
+        n_matches (int): Matches of each club.
+        seed (int): Seed of the jitter and the errors.
+
+    Returns:
+        ThreadingHTTPServer: The server. The API is at
+            http://127.0.0.1:{server.server_port}/api/fifa and it stops with
+            server.shutdown().
+    """
+    handler = type("Handler", (MockAPIHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "rate_limit_rate": rate_limit_rate,
+        "n_members": n_members,
+        "n_matches": n_matches,
+        "rng": random.Random(seed)
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """Serve the mock API until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--jitter", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="Share of the requests answered with 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0,
+                        help="Share of the requests answered with 429.")
+    parser.add_argument("--members", type=int, default=MEMBERS_PER_CLUB)
+    parser.add_argument("--matches", type=int, default=MATCHES_PER_CLUB)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.jitter,
+                          args.error_rate, args.rate_limit_rate,
+                          args.members, args.matches, args.seed)
+    print(f"Mock API at http://127.0.0.1:{server.server_port}/api/fifa")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
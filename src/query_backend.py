@@ -0,0 +1,259 @@
+"""Backends that run the analytical queries of the app: the season results of
+a club, the stats of its players by season and the tables of all the clubs.
+The same queries run in SQLite, or in DuckDB attached to the SQLite file or
+to the Parquet exports of src/export_parquet.py. DuckDB is optional and only
+imported by its backend (pip install duckdb).
+
+Usage:
+    python -m src.query_backend season_results --backend duckdb
+"""
+import argparse
+import os
+import src.database as database
+import src.export_parquet as export_parquet
+
+
+# Queries written in the SQL that both SQLite and DuckDB understand, with ?
+# placeholders. Comparisons are summed through CASE, since DuckDB can't sum
+# booleans.
+QUERIES = {
+    # Seasons our club played
+    "seasons": """
+        SELECT DISTINCT seasonid FROM ClubsMatches
+        WHERE clubId = ? AND seasonid IS NOT NULL
+        ORDER BY seasonid""",
+    # Matches, wins, draws, losses and goals of a club in each season
+    "season_results": """
+        SELECT seasonid, COUNT(*) AS matches,
+            SUM(CASE WHEN goals > goalsConceded THEN 1 ELSE 0 END) AS wins,
+            SUM(CASE WHEN goals = goalsConceded THEN 1 ELSE 0 END) AS draws,
+            SUM(CASE WHEN goals < goalsConceded THEN 1 ELSE 0 END) AS losses,
+            SUM(goals) AS goals, SUM(goalsConceded) AS goalsConceded
+        FROM ClubsMatches
+        WHERE clubId = ? AND seasonid IS NOT NULL
+        GROUP BY seasonid
+        ORDER BY seasonid""",
+    # Stats of the players of a club in each season
+    "player_season_stats": """
+        SELECT ClubsMatches.seasonid, PlayersMatches.name,
+            COUNT(*) AS matches, SUM(PlayersMatches.goals) AS goals,
+            SUM(PlayersMatches.assists) AS assists,
+            SUM(PlayersMatches.mom) AS mom,
+            AVG(PlayersMatches.rating) AS rating
+        FROM PlayersMatches
+        JOIN ClubsMatches
+            ON ClubsMatches.matchId = PlayersMatches.matchId
+            AND ClubsMatches.clubId = PlayersMatches.clubid
+        WHERE PlayersMatches.clubid = ? AND ClubsMatches.seasonid IS NOT NULL
+        GROUP BY ClubsMatches.seasonid, PlayersMatches.name
+        ORDER BY ClubsMatches.seasonid, goals DESC, PlayersMatches.name""",
+    # Points of every club in every season, the best first
+    "season_tables": """
+        SELECT seasonid, clubId, COUNT(*) AS matches,
+            SUM(CASE WHEN goals > goalsConceded THEN 3
+                WHEN goals = goalsConceded THEN 1 ELSE 0 END) AS points,
+            SUM(goals) - SUM(goalsConceded) AS goalDifference
+        FROM ClubsMatches
+        WHERE seasonid IS NOT NULL
+        GROUP BY seasonid, clubId
+        ORDER BY seasonid, points DESC, goalDifference DESC, clubId""",
+    # Best scorers of all the clubs
+    "top_scorers": """
+        SELECT name, COUNT(*) AS matches, SUM(goals) AS goals
+        FROM PlayersMatches
+        GROUP BY name
+        ORDER BY goals DESC, name
+        LIMIT 20""",
+}
+
+# Parameters of each query, for our club
+PARAMETERS = {
+    "seasons": (6703918,),
+    "season_results": (6703918,),
+    "player_season_stats": (6703918,),
+    "season_tables": (),
+    "top_scorers": (),
+}
+
+
+class SQLiteBackend:
+    """Run the queries in SQLite, on a read-only connection.
+
+    Attributes:
+        name: Name of the backend.
+        connection: The connection to the database.
+    """
+    name = "sqlite"
+
+    def __init__(self,
+                 database_file: str = database.APP_DATABASE_FILE) -> None:
+        self.connection = database.connect(database_file, read_only=True,
+                                           check_same_thread=False)
+
+    def execute(self, query: str, parameters: tuple = ()) -> tuple:
+        """Run a query.
+
+        Args:
+            query (str): The query.
+            parameters (tuple): Values of its placeholders.
+
+        Returns:
+            tuple: The names of the columns and the rows.
+        """
+        cursor = self.connection.execute(query, parameters)
+        columns = [description[0] for description in cursor.description]
+        return columns, cursor.fetchall()
+
+    def dataframe(self, query: str, parameters: tuple = ()):
+        """Run a query and return the rows as a DataFrame."""
+        import pandas as pd
+        columns, rows = self.execute(query, parameters)
+        return pd.DataFrame(rows, columns=columns)
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+
+class DuckDBBackend:
+    """Run the queries in DuckDB, an in-process columnar engine that
+    aggregates many rows much faster than SQLite. The tables are read from
+    the SQLite database, through the sqlite extension of DuckDB, or from the
+    Parquet exports of src/export_parquet.py.
+
+    Attributes:
+        name: Name of the backend.
+        connection: The DuckDB connection.
+    """
+    name = "duckdb"
+
+    def __init__(self, database_file: str = database.APP_DATABASE_FILE,
+                 parquet_folder: str = None) -> None:
+        """
+        Args:
+            database_file (str): Path of the SQLite database.
+            parquet_folder (str): Folder of the Parquet exports. If given,
+                the tables are read from it instead of the database.
+
+        Raises:
+            ImportError: If DuckDB isn't installed.
+        """
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The duckdb backend needs DuckDB: "
+                              "pip install duckdb") from e
+
+        self.connection = duckdb.connect()
+        if parquet_folder is None:
+            self.connection.execute("INSTALL sqlite")
+            self.connection.execute("LOAD sqlite")
+            # ATTACH doesn't take parameters
+            path = database_file.replace("'", "''")
+            self.connection.execute(
+                f"ATTACH '{path}' AS app (TYPE sqlite, READ_ONLY)")
+            self.connection.execute("USE app")
+            return
+
+        # A view for each export, split by partition folders or not
+        for name in sorted(os.listdir(parquet_folder)):
+            path = os.path.join(parquet_folder, name)
+            if not os.path.isdir(path) or name.endswith(".tmp"):
+                continue
+            files = os.path.join(path, "**", "*.parquet")
+            self.connection.execute(
+                f"""CREATE VIEW "{name}" AS SELECT * FROM read_parquet(
+                    '{files}', hive_partitioning = true)""")
+
+    def execute(self, query: str, parameters: tuple = ()) -> tuple:
+        """Run a query.
+
+        Args:
+            query (str): The query.
+            parameters (tuple): Values of its placeholders.
+
+        Returns:
+            tuple: The names of the columns and the rows.
+        """
+        result = self.connection.execute(query, list(parameters))
+        columns = [description[0] for description in result.description]
+        return columns, result.fetchall()
+
+    def dataframe(self, query: str, parameters: tuple = ()):
+        """Run a query and return the rows as a DataFrame, built from the
+        columns of DuckDB without going through Python rows."""
+        return self.connection.execute(query, list(parameters)).df()
+
+    def close(self):
+        """Close the connection."""
+        self.connection.close()
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "duckdb": DuckDBBackend,
+}
+
+
+def get_backend(name: str = "sqlite",
+                database_file: str = database.APP_DATABASE_FILE,
+                parquet_folder: str = None):
+    """Create a backend.
+
+    Args:
+        name (str): One of BACKENDS.
+        database_file (str): Path of the SQLite database.
+        parquet_folder (str): Folder of the Parquet exports, read instead of
+            the database. Only for the duckdb backend.
+
+    Returns:
+        The backend.
+    """
+    if name == "duckdb":
+        return DuckDBBackend(database_file, parquet_folder)
+    if parquet_folder is not None:
+        raise ValueError(f"The {name} backend can't read Parquet files")
+    return BACKENDS[name](database_file)
+
+
+def run_query(backend, name: str, parameters: tuple = None) -> tuple:
+    """Run one of QUERIES.
+
+    Args:
+        backend: The backend.
+        name (str): Name of the query.
+        parameters (tuple): Values of its placeholders. Defaults to the ones
+            of PARAMETERS.
+
+    Returns:
+        tuple: The names of the columns and the rows.
+    """
+    if parameters is None:
+        parameters = PARAMETERS[name]
+    return backend.execute(QUERIES[name], parameters)
+
+
+def main():
+    """Run a query with the backend of the command line and print its
+    rows."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("query", choices=list(QUERIES))
+    parser.add_argument("--backend", choices=list(BACKENDS),
+                        default="sqlite")
+    parser.add_argument("--database", default=database.APP_DATABASE_FILE)
+    parser.add_argument("--parquet", nargs="?", default=None,
+                        const=export_parquet.PARQUET_FOLDER,
+                        help="Read the Parquet exports instead of the "
+                             "database. Only with --backend duckdb.")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend, args.database, args.parquet)
+    columns, rows = run_query(backend, args.query)
+    backend.close()
+    print("\t".join(columns))
+    for row in rows:
+        print("\t".join(str(value) for value in row))
+
+
+if __name__ == "__main__":
+    main()
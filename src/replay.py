@@ -0,0 +1,114 @@
+"""Rebuild a database from the archive of raw API responses (src/archive.py),
+without making any request. Useful after changing the tables or the way the
+responses are inserted: the archive is replayed through the same insert_*
+functions of the scrapper, in the order the responses were received.
+
+The archive files of each day are decompressed and decoded in parallel, and
+a single connection writes them.
+
+Usage:
+    python -m src.replay --database data/raw/mock.db --create
+"""
+import argparse
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import src.archive as archive
+import src.create_mock_db as create_mock_db
+import src.scrapper as scrapper
+
+
+INSERT_FUNCTIONS = {
+    "clubs/info": scrapper.insert_club,
+    "clubs/seasonalStats": scrapper.insert_seasonals,
+    "members/stats": scrapper.insert_players,
+    "clubs/matches": scrapper.insert_matches,
+}
+
+
+def replay_record(connection: sqlite3.Connection, record: dict) -> bool:
+    """Insert the response of a record with the insert function of its
+    endpoint.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        record (dict): Record of the archive.
+
+    Returns:
+        bool: Whether the endpoint is known and the record was inserted.
+    """
+    insert_function = INSERT_FUNCTIONS.get(record["endpoint"])
+    if insert_function is None:
+        return False
+
+    params = record["params"]
+    club_id = params.get("clubIds", params.get("clubId"))
+    insert_function(connection, club_id, record["body"])
+    return True
+
+
+def replay(database_file: str, folder: str = archive.ARCHIVE_FOLDER,
+           workers: int = None) -> dict:
+    """Insert all the records of the archive into a database.
+
+    Args:
+        database_file (str): Path to the database.
+        folder (str): Root folder of the archive.
+        workers (int): Number of processes reading the archive. Defaults to
+            the number of CPUs.
+
+    Returns:
+        dict: Number of records replayed and skipped, and the elapsed time
+            in seconds.
+    """
+    stats = {"records": 0, "skipped": 0}
+    start = time.perf_counter()
+    connection = sqlite3.connect(database_file)
+    create_mock_db.migrate_database(connection)
+    # The archive is the source of truth, so a crash in the middle of a
+    # replay only means running it again.
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute("PRAGMA journal_mode = MEMORY")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # One day at a time, so only a day of records is in memory.
+        for day in archive.list_days(folder):
+            files = [os.path.join(day, file) for file in os.listdir(day)
+                     if file.endswith(".jsonl.gz")]
+            records = [record for file_records in
+                       executor.map(archive.read_records, files)
+                       for record in file_records]
+            records.sort(key=lambda record: record["fetched_at"])
+
+            for record in records:
+                if replay_record(connection, record):
+                    stats["records"] += 1
+                else:
+                    stats["skipped"] += 1
+
+    connection.close()
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    """Replay the archive with the options of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=scrapper.DATABASE_FILE)
+    parser.add_argument("--archive", default=archive.ARCHIVE_FOLDER)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--create", action="store_true",
+                        help="Delete the database and create empty tables "
+                             "before replaying.")
+    args = parser.parse_args()
+
+    if args.create:
+        create_mock_db.main(args.database)
+    stats = replay(args.database, args.archive, args.workers)
+    print(f"{stats['records']} responses replayed in {stats['elapsed']:.1f}s "
+          f"({stats['skipped']} skipped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""Long-running scheduler that keeps the database up to date. Our club is
+polled often while matches are being played and less and less often while no
+new match shows up. The clubs that played against us are refreshed when their
+data gets older than a budget that depends on how recently we played them,
+the most recent opponents first. All the requests run in a small pool of
+worker threads.
+
+Usage:
+    python -m src.scheduler --workers 4
+"""
+import argparse
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import src.database as database
+import src.scrapper as scrapper
+
+
+# Seconds between two polls of our club: the minimum right after a new
+# match, doubled after each poll without new matches up to the maximum.
+MIN_POLL_INTERVAL = 60
+MAX_POLL_INTERVAL = 30 * 60
+BACKOFF_FACTOR = 2
+
+# Seconds between two updates of the info of our club
+CLUB_INFO_INTERVAL = 24 * 60 * 60
+
+# Seconds between two looks for stale opponents
+SWEEP_INTERVAL = 5 * 60
+
+# Maximum age in seconds of the data of an opponent, by how many seconds ago
+# we played them. None matches all the older opponents.
+STALENESS_BUDGET = [
+    (24 * 60 * 60, 60 * 60),
+    (7 * 24 * 60 * 60, 6 * 60 * 60),
+    (None, 7 * 24 * 60 * 60),
+]
+
+# Maximum number of opponents refreshed in each sweep
+OPPONENTS_PER_SWEEP = 20
+
+# Seconds to wait before running again a job that failed
+RETRY_DELAY = 60
+
+# Seconds between two exports of the metrics
+METRICS_INTERVAL = 60
+
+
+def max_staleness(played_ago: float) -> float:
+    """Maximum age of the data of an opponent we played played_ago seconds
+    ago, from STALENESS_BUDGET."""
+    for played_within, staleness in STALENESS_BUDGET:
+        if played_within is None or played_ago <= played_within:
+            return staleness
+
+
+def get_opponents(connection: sqlite3.Connection, club_id: int,
+                  match_type: str = scrapper.MATCH_TYPE) -> list:
+    """Get the clubs that played against a club, with the last time they
+    played and the last time their matches were updated.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        match_type (str): The type of the matches of the high-water mark.
+
+    Returns:
+        list: Tuples of club ID, timestamp of the last match against the club
+            and timestamp of the last update (None if never updated), the
+            most recent opponents first.
+    """
+    return connection.execute(
+        """SELECT opponent.clubId, MAX(CAST(Matches.timestamp AS INTEGER)),
+            SyncState.updatedAt
+        FROM ClubsMatches AS club
+        JOIN ClubsMatches AS opponent
+            ON opponent.matchId = club.matchId
+            AND opponent.clubId != club.clubId
+        JOIN Matches ON Matches.matchId = club.matchId
+        LEFT JOIN SyncState
+            ON SyncState.clubId = opponent.clubId
+            AND SyncState.matchType = ?
+        WHERE club.clubId = ?
+        GROUP BY opponent.clubId
+        ORDER BY 2 DESC""", (match_type, str(club_id))).fetchall()
+
+
+class Scheduler:
+    """Run jobs at their due time in a pool of worker threads. A job is a
+    function that returns the seconds until its next run, or None to run it
+    only once.
+
+    Attributes:
+        executor: The pool of worker threads.
+    """
+    def __init__(self, workers: int = 4) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def schedule(self, name: str, job, delay: float = 0):
+        """Run a job after a delay.
+
+        Args:
+            name (str): Name of the job, for the logs.
+            job: Function without arguments that returns the seconds until
+                its next run, or None.
+            delay (float): Seconds from now.
+        """
+        with self._condition:
+            # The counter breaks the ties, so jobs are never compared.
+            heapq.heappush(self._queue, (time.monotonic() + delay,
+                                         next(self._counter), name, job))
+            self._condition.notify()
+
+    def _run_job(self, name: str, job):
+        """Run a job in a worker and schedule its next run."""
+        try:
+            delay = job()
+        except Exception as e:
+            print(f"Failed {name}: {e}")
+            delay = RETRY_DELAY
+        if delay is not None:
+            self.schedule(name, job, delay)
+
+    def run(self):
+        """Send the jobs to the workers when they are due, until stop is
+        called. The jobs already running are waited for."""
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    now = time.monotonic()
+                    if self._queue and self._queue[0][0] <= now:
+                        break
+                    timeout = self._queue[0][0] - now if self._queue else None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    break
+                _, _, name, job = heapq.heappop(self._queue)
+            self.executor.submit(self._run_job, name, job)
+        self.executor.shutdown(wait=True)
+
+    def stop(self):
+        """Stop sending jobs to the workers."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+
+class MatchPoller:
+    """Job that polls the matches of a club with an adaptive interval. When
+    there are new matches, the players and seasonal stats of the club are
+    updated too.
+
+    Attributes:
+        club_id: The ID of the club.
+        interval: Seconds until the next poll.
+    """
+    def __init__(self, club_id: int = scrapper.CLUB_ID) -> None:
+        self.club_id = club_id
+        self.interval = MIN_POLL_INTERVAL
+
+    def __call__(self) -> float:
+        if scrapper.update_matches(self.club_id) > 0:
+            scrapper.update_players(self.club_id)
+            scrapper.update_seasonals(self.club_id)
+            self.interval = MIN_POLL_INTERVAL
+        else:
+            self.interval = min(self.interval * BACKOFF_FACTOR,
+                                MAX_POLL_INTERVAL)
+        return self.interval
+
+
+class OpponentRefresher:
+    """Job that looks for opponents whose data is older than their staleness
+    budget and schedules their update, at most OPPONENTS_PER_SWEEP at a
+    time.
+
+    Attributes:
+        scheduler: The scheduler that runs the updates.
+        club_id: The ID of our club.
+        refreshed_at: When each opponent was last updated by this job. Clubs
+            without matches never get a high-water mark, so SyncState alone
+            would keep them stale forever.
+    """
+    def __init__(self, scheduler: Scheduler,
+                 club_id: int = scrapper.CLUB_ID) -> None:
+        self.scheduler = scheduler
+        self.club_id = club_id
+        self.refreshed_at = {}
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def stale_opponents(self) -> list:
+        """The IDs of the opponents to update now, the most recently played
+        first."""
+        connection = database.connect(scrapper.DATABASE_FILE,
+                                     read_only=True)
+        opponents = get_opponents(connection, self.club_id)
+        connection.close()
+
+        now = time.time()
+        stale = []
+        with self._lock:
+            for club_id, last_played, updated_at in opponents:
+                updated_at = max(updated_at or 0,
+                                 self.refreshed_at.get(club_id, 0))
+                if (club_id not in self._in_flight and now - updated_at >
+                        max_staleness(now - last_played)):
+                    stale.append(club_id)
+                if len(stale) == OPPONENTS_PER_SWEEP:
+                    break
+            self._in_flight.update(stale)
+        return stale
+
+    def refresh(self, club_ids: list):
+        """Update the data of some opponents."""
+        try:
+            scrapper.update_clubs(club_ids)
+            for club_id in club_ids:
+                scrapper.update_players(club_id)
+                scrapper.update_matches(club_id)
+                with self._lock:
+                    self.refreshed_at[club_id] = time.time()
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(club_ids)
+
+    def __call__(self) -> float:
+        stale = self.stale_opponents()
+        # One job per batch of clubs/info and seasonalStats, so the pool
+        # updates several batches at once.
+        for batch in scrapper.batches(stale, scrapper.CLUBS_PER_REQUEST):
+            self.scheduler.schedule(
+                f"refresh of {len(batch)} opponents",
+                lambda batch=batch: self.refresh(batch))
+        return SWEEP_INTERVAL
+
+
+def main():
+    """Run the scheduler until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--club", type=int, default=scrapper.CLUB_ID)
+    args = parser.parse_args()
+
+    def update_club_info():
+        scrapper.update_club(args.club)
+        return CLUB_INFO_INTERVAL
+
+    def export_metrics():
+        scrapper.METRICS.export("scheduler", summary=False)
+        return METRICS_INTERVAL
+
+    scheduler = Scheduler(args.workers)
+    scheduler.schedule("poll of matches", MatchPoller(args.club))
+    scheduler.schedule("update of club info", update_club_info)
+    scheduler.schedule("refresh of opponents",
+                       OpponentRefresher(scheduler, args.club))
+    scheduler.schedule("export of metrics", export_metrics, METRICS_INTERVAL)
+
+    # The scheduler loop runs in a thread so Ctrl+C reaches the main thread.
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(1)
+    except KeyboardInterrupt:
+        print("Stopping, waiting for the running jobs...")
+        scheduler.stop()
+        thread.join()
+        scrapper.METRICS.export("scheduler")
+
+
+if __name__ == "__main__":
+    main()
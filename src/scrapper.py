@@ -1,9 +1,28 @@
-"""Scrapping functions for the FIFA Pro Clubs API."""
-import requests
+"""Scrapping functions for the FIFA Pro Clubs API.
+
+Each endpoint has a get_* function that only makes the request and an
+insert_* function that only writes the response into the database, so the
+requests can be made concurrently by the crawler (src/crawler.py) while a
+single connection does the writing. The update_* functions just chain both.
+
+The get_* functions use the client of get_client, built on the first
+request, unless they are given one, like the crawlers do.
+"""
+import functools
+import itertools
 import sqlite3
 import json
+import threading
 import time
+from collections import defaultdict
 from tqdm import tqdm
+import src.archive as archive
+import src.cache as cache
+import src.client as client
+import src.create_mock_db as create_mock_db
+import src.database as database
+import src.metrics as metrics
+import src.summaries as summaries
 
 
 HEADERS = {
@@ -18,229 +37,909 @@ HEADERS = {
         "User-Agent": "Chrome/115.0.0.0 Safari/537.36"
     }
 
+API_URL = "https://proclubs.ea.com/api/fifa"
+
 DATABASE_FILE = "data/raw/mock.db"
 
+CLUB_ID = 2654598
+
+# Clubs asked in a single request to the endpoints that accept many IDs
+# (clubs/info and clubs/seasonalStats).
+CLUBS_PER_REQUEST = 10
+
+# Season leaderboard (best clubs in the current season) and clubs leaderboard
+# (best clubs of all time).
+LEADERBOARDS = ["seasonRankLeaderboard", "clubRankLeaderboard"]
+
+# League matches
+MATCH_TYPE = "gameType9"
+
+# Rows written in each transaction when a response is streamed
+MATCHES_PER_BATCH = 50
+PLAYERS_PER_BATCH = 500
+
+# Stats of a player or a club in a match, stored as numbers
+MATCH_STATS_TYPES = {
+    "assists": int, "cleansheetsany": int, "cleansheetsdef": int,
+    "cleansheetsgk": int, "goals": int, "goalsconceded": int, "losses": int,
+    "mom": int, "passattempts": int, "passesmade": int, "rating": float,
+    "realtimegame": int, "realtimeidle": int, "redcards": int, "saves": int,
+    "SCORE": int, "shots": int, "tackleattempts": int, "tacklesmade": int,
+    "wins": int
+}
+
+# Type of the columns stored as numbers, by table. The API sends every
+# number as a string, and they are converted before being written.
+COLUMN_TYPES = {
+    "Players": {
+        column: int for column in [
+            "gamesPlayed", "winRate", "goals", "assists", "cleanSheetsDef",
+            "cleanSheetsGK", "shotSuccessRate", "passesMade",
+            "passSuccessRate", "tacklesMade", "tackleSuccessRate", "proPos",
+            "proStyle", "proHeight", "proNationality", "proOverall",
+            "manOfTheMatch", "redCards", "prevGoals"]
+    },
+    "Matches": {"timestamp": int},
+    "ClubsMatches": {
+        column: int for column in [
+            "gameNumber", "goals", "goalsAgainst", "losses", "result",
+            "score", "season_id", "TEAM", "ties", "winnerByDnf", "wins"]
+    },
+    "PlayersMatches": MATCH_STATS_TYPES,
+    "ClubsMatchesAgg": MATCH_STATS_TYPES,
+}
+
+# Newest match stored for each club and match type, so that matches already
+# in the database aren't written again.
+SYNC_STATE_QUERY = """
+    CREATE TABLE IF NOT EXISTS SyncState (
+        clubId TEXT,
+        matchType TEXT,
+        lastMatchId TEXT,
+        lastTimestamp INTEGER,
+        updatedAt INTEGER,
+        PRIMARY KEY (clubId, matchType)
+    );
+"""
+
+# Timings, bytes and rows of the run, by endpoint
+METRICS = metrics.Metrics()
+
+# Shared by all the requests, so the connections to the API are reused, the
+# responses that rarely change are cached and every response is archived.
+# It's built by get_client on the first request, so importing the module
+# doesn't create the folders of the cache and the archive.
+_client = None
+_client_lock = threading.Lock()
+
+
+def make_client(requests_per_second: float = 10, burst: int = 10,
+                **kwargs) -> client.APIClient:
+    """Create a client with the headers, cache, archive and metrics of the
+    scrapper.
+
+    Args:
+        requests_per_second (float): Rate of the token bucket of the client,
+            None for a client that doesn't throttle, because its caller
+            does.
+        burst (int): Capacity of the token bucket.
+        kwargs: Other arguments of client.APIClient. The cache and the
+            archive can be None, to disable them.
+
+    Returns:
+        client.APIClient: The client.
+    """
+    if "cache" not in kwargs:
+        kwargs["cache"] = cache.ResponseCache()
+    if "archive" not in kwargs:
+        kwargs["archive"] = archive.ResponseArchive()
+    kwargs.setdefault("metrics", METRICS)
+    return client.APIClient(HEADERS, requests_per_second, burst, **kwargs)
+
+
+def get_client() -> client.APIClient:
+    """Get the client of the get_* functions, creating it with make_client
+    the first time."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = make_client()
+        return _client
+
+
+def set_client(api_client: client.APIClient):
+    """Replace the client of the get_* functions, like a benchmark or a
+    worker process does to use one of its own."""
+    global _client
+    with _client_lock:
+        _client = api_client
+
+
+def connect(database_file: str = None, **kwargs) -> sqlite3.Connection:
+    """Open a writer connection to the scrapper database and apply the
+    migrations its schema is missing, so an old database never gets the
+    numbers of the API written into TEXT columns.
+
+    Args:
+        database_file (str): Path to the database. Defaults to
+            DATABASE_FILE.
+        kwargs: Other arguments of database.connect.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    connection = database.connect(database_file or DATABASE_FILE, **kwargs)
+    create_mock_db.migrate_database(connection)
+    return connection
+
+
+@functools.lru_cache(maxsize=None)
+def get_insert_query(table: str, columns: tuple) -> str:
+    """Build the INSERT OR REPLACE statement of a table for a set of columns.
+    It's built once for each set of columns, and the same string lets
+    sqlite3 reuse the prepared statement from its cache.
+
+    Args:
+        table (str): The name of the table.
+        columns (tuple): The names of the columns.
+
+    Returns:
+        str: The SQL statement.
+    """
+    placeholders = ", ".join(["?" for _ in columns])
+    return f"""INSERT OR REPLACE INTO {table} ({", ".join(columns)})
+            VALUES ({placeholders})"""
+
+
+def to_number(value, number_type):
+    """Convert a value of the API to a number. Empty strings, sent for the
+    attributes a player doesn't have, become None, and values that aren't
+    numbers are kept as they are.
+
+    Args:
+        value: The value.
+        number_type: int or float.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        return number_type(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def insert_rows(cursor: sqlite3.Cursor, table: str, rows: list):
+    """Insert rows into a table with one executemany for each set of
+    columns. The API doesn't always return the same keys, so rows are grouped
+    by their columns. The numbers of COLUMN_TYPES are converted. It doesn't
+    commit.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of the connection to the database.
+        table (str): The name of the table.
+        rows (list): The rows, as dictionaries of column to value.
+
+    Returns:
+        int: The number of rows inserted or replaced.
+    """
+    column_types = COLUMN_TYPES.get(table, {})
+    rows_by_columns = defaultdict(list)
+    for row in rows:
+        rows_by_columns[tuple(row.keys())].append(tuple(
+            to_number(value, column_types[column])
+            if column in column_types else value
+            for column, value in row.items()))
+
+    written = 0
+    for columns, values in rows_by_columns.items():
+        cursor.executemany(get_insert_query(table, columns), values)
+        written += cursor.rowcount
+    return written
+
+
+def get_clubs(club_ids: list, api_client: client.APIClient = None) -> dict:
+    """Get the data of many clubs from the API in a single request.
+
+    Args:
+        club_ids (list): The IDs of the clubs.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        dict: The response, keyed by the club ID.
+    """
+    params = {
+        "clubIds": ",".join(str(club_id) for club_id in club_ids),
+        "platform": "ps5"
+    }
+
+    url_club = f"{API_URL}/clubs/info"
+    return (api_client or get_client()).get_json(url_club, params)
+
+
+def get_club(club_id: int, api_client: client.APIClient = None) -> dict:
+    """Get the club data from the API.
+
+    Args:
+        club_id (int): The ID of the club.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        dict: The response, keyed by the club ID.
+    """
+    return get_clubs([club_id], api_client)
+
+
+def insert_club(connection: sqlite3.Connection, club_id,
+                response: dict):
+    """Insert the data of the clubs of the response into the database. The
+    key customKit is a dictionary, so it needs to be handled separately.
+    Each key of it is inserted as a column in the Clubs table together with
+    the other columns in the response.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id: The ID of the club, or the IDs of the clubs of get_clubs.
+            The clubs written are the ones in the response.
+        response (dict): The response of get_club or get_clubs.
+    """
+    rows = club_rows(response)
+
+    # Insert clubs data into database
+    with METRICS.write("clubs/info"), connection:
+        cursor = connection.cursor()
+        written = insert_rows(cursor, "Clubs", rows)
+        cursor.close()
+    METRICS.count("rows", "clubs/info", written)
+
+
+def club_rows(response: dict) -> list:
+    """Rows of the Clubs table of a response of get_club or get_clubs.
+
+    Args:
+        response (dict): The response.
+
+    Returns:
+        list: The rows, as dictionaries of column to value.
+    """
+    rows = []
+    for club_data in response.values():
+        custom_kit = club_data["customKit"]
+        insert_data = {}
+        for key in club_data.keys():
+            if key == "customKit":
+                for kit_key in custom_kit.keys():
+                    insert_data[kit_key] = custom_kit[kit_key]
+            else:
+                insert_data[key] = club_data[key]
+        rows.append(insert_data)
+    return rows
+
 
 def update_club(club_id: int):
-    """Get the club data from the API and insert it into the database. The key
-    customKit is a dictionary, so it needs to be handled separately. Each key
-    of it is inserted as a column in the Clubs table together with the other
-    columns in the response.
+    """Get the club data from the API and insert it into the database.
 
     Args:
         club_id (int): The ID of the club.
     """
+    response = get_club(club_id)
+    connection = connect()
+    insert_club(connection, club_id, response)
+    connection.close()
+
+
+def get_players(club_id: int, api_client: client.APIClient = None) -> dict:
+    """Get the players data from the API.
+
+    Args:
+        club_id (int): The ID of the club.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        dict: The response, with the players in the key members.
+    """
     params = {
-        "clubIds": club_id,
+        "clubId": club_id,
         "platform": "ps5"
     }
 
-    url_club = "https://proclubs.ea.com/api/fifa/clubs/info"
-    response = requests.get(url_club, headers=HEADERS, params=params).json()
+    url_players = f"{API_URL}/members/stats"
+    return (api_client or get_client()).get_json(url_players, params)
 
-    club_data = response[f"{club_id}"]
-    custom_kit = club_data["customKit"]
 
-    # Insert club data into database
-    insert_data = {}
-    for key in club_data.keys():
-        if key == "customKit":
-            for kit_key in custom_kit.keys():
-                insert_data[kit_key] = custom_kit[kit_key]
-        else:
-            insert_data[key] = club_data[key]
+def insert_players(connection: sqlite3.Connection, club_id: int,
+                   response: dict):
+    """Insert the players data into the database. Each key of the dictionary
+    is inserted as a column in the Players table.
 
-    connection = sqlite3.connect(DATABASE_FILE)
-    cursor = connection.cursor()
-    columns = ", ".join(insert_data.keys())
-    placeholders = ', '.join(['?' for _ in insert_data.keys()])
-    sql_query = f"""INSERT OR REPLACE INTO Clubs ({columns})
-                VALUES ({placeholders})"""
-    cursor.execute(sql_query, tuple(insert_data.values()))
-    connection.commit()
-    cursor.close()
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        response (dict): The response of get_players.
+    """
+    rows = players_rows(club_id, response)
+    if len(rows) == 0:
+        return
+
+    # Insert players data into database
+    with METRICS.write("members/stats"), connection:
+        cursor = connection.cursor()
+        written = insert_rows(cursor, "Players", rows)
+        cursor.close()
+    METRICS.count("rows", "members/stats", written)
 
 
-def update_players(club_id: int):
-    """Get the players data from the API and insert it into the database.
-    Each key of the dictionary is inserted as a column in the Players table.
+def players_rows(club_id: int, response: dict) -> list:
+    """Rows of the Players table of a response of get_players.
+
+    Args:
+        club_id (int): The ID of the club.
+        response (dict): The response.
+
+    Returns:
+        list: The rows, as dictionaries of column to value.
+    """
+    return [dict(player, clubId=club_id) for player in response["members"]]
+
+
+def stream_players(club_id: int, api_client: client.APIClient = None):
+    """Get the players data from the API, decoding one player at a time.
 
     Args:
         club_id (int): The ID of the club.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Yields:
+        dict: The data of each player.
     """
     params = {
         "clubId": club_id,
         "platform": "ps5"
     }
 
-    url_players = "https://proclubs.ea.com/api/fifa/members/stats"
+    url_players = f"{API_URL}/members/stats"
+    yield from (api_client or get_client()).iter_json(url_players, params,
+                                                      key="members")
 
-    response = requests.get(url_players, headers=HEADERS, params=params).json()
 
-    players_data = response["members"]
+def insert_players_stream(connection: sqlite3.Connection, club_id: int,
+                          players, batch_size: int = PLAYERS_PER_BATCH) -> int:
+    """Insert the players data into the database as it is decoded,
+    batch_size players per transaction.
 
-    for player in players_data:
-        player["clubId"] = club_id
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        players: Iterable of the players, like stream_players.
+        batch_size (int): Players written in each transaction.
 
-    # Insert players data into database
-    connection = sqlite3.connect(DATABASE_FILE)
-    cursor = connection.cursor()
-    columns = ", ".join(players_data[0].keys())
-    placeholders = ', '.join(['?' for _ in players_data[0].keys()])
-    sql_query = f"""INSERT OR REPLACE INTO Players ({columns})
-                 VALUES ({placeholders})"""
-    cursor.executemany(sql_query, [tuple(player.values())
-                                   for player in players_data])
-    connection.commit()
-    cursor.close()
+    Returns:
+        int: The number of players written.
+    """
+    written = 0
+    for batch in batches(players, batch_size):
+        for player in batch:
+            player["clubId"] = club_id
+        with METRICS.write("members/stats"), connection:
+            cursor = connection.cursor()
+            METRICS.count("rows", "members/stats",
+                          insert_rows(cursor, "Players", batch))
+            cursor.close()
+        written += len(batch)
 
+    return written
 
-def update_matches(club_id: int):
-    """Get the matches data from the API and insert it into the database.
-    Each match element has a dictionary of clubs, a dictionary of players and
-    a dictionary of aggregate stats for each club.
 
-    Each of these dictionaries has two keys: the home club and the away club.
-    The value of each key is a dictionary with the data of the club. Inside of
-    each player dictionary, the key is the player ID and the value is a
-    dictionary with the data of the player.
+def update_players(club_id: int):
+    """Get the players data from the API and insert it into the database,
+    streaming the response.
+
+    Args:
+        club_id (int): The ID of the club.
+    """
+    connection = connect()
+    insert_players_stream(connection, club_id, stream_players(club_id))
+    connection.close()
+
+
+def get_matches(club_id: int, match_type: str = MATCH_TYPE,
+                api_client: client.APIClient = None) -> list:
+    """Get the matches data from the API.
 
     Args:
         club_id (int): The ID of the club.
+        match_type (str): The type of the matches. Defaults to league
+            matches.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        list: The last matches of the club.
     """
     params = {
         "clubIds": club_id,
-        "matchType": "gameType9",
+        "matchType": match_type,
         "platform": "ps5"
     }
-    url_matches = "https://proclubs.ea.com/api/fifa/clubs/matches"
+    url_matches = f"{API_URL}/clubs/matches"
+    return (api_client or get_client()).get_json(url_matches, params)
+
 
-    response = requests.get(url_matches, headers=HEADERS, params=params).json()
-    # Insert matches data into database
-    connection = sqlite3.connect(DATABASE_FILE)
+def stream_matches(club_id: int, match_type: str = MATCH_TYPE,
+                   api_client: client.APIClient = None):
+    """Get the matches data from the API, decoding one match at a time.
 
-    for match in response:
-        match_dict = {
-            "matchId": match["matchId"],
-            "timestamp": match["timestamp"]
-        }
+    Args:
+        club_id (int): The ID of the club.
+        match_type (str): The type of the matches. Defaults to league
+            matches.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Yields:
+        dict: The data of each match.
+    """
+    params = {
+        "clubIds": club_id,
+        "matchType": match_type,
+        "platform": "ps5"
+    }
+    url_matches = f"{API_URL}/clubs/matches"
+    yield from (api_client or get_client()).iter_json(url_matches, params)
+
+
+def get_sync_state(connection: sqlite3.Connection, club_id: int,
+                   match_type: str = MATCH_TYPE) -> tuple:
+    """Get the newest match already stored for a club and match type.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        match_type (str): The type of the matches.
+
+    Returns:
+        tuple: The matchId and timestamp of the newest match, or
+            (None, None) if no match of the club was stored yet.
+    """
+    # Databases created before the SyncState table existed
+    connection.execute(SYNC_STATE_QUERY)
+    state = connection.execute(
+        """SELECT lastMatchId, lastTimestamp FROM SyncState
+        WHERE clubId = ? AND matchType = ?""",
+        (str(club_id), match_type)).fetchone()
+
+    return state if state is not None else (None, None)
+
+
+def get_new_matches(connection: sqlite3.Connection, club_id: int,
+                    response: list, match_type: str = MATCH_TYPE) -> list:
+    """Keep only the matches of the response that aren't in the database.
+    The matches are walked from the newest to the oldest, stopping at the
+    first one that isn't newer than the last match stored for the club.
+    Matches stored while updating the opponent are skipped too.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        response (list): The response of get_matches.
+        match_type (str): The type of the matches.
+
+    Returns:
+        list: The new matches, from the newest to the oldest.
+    """
+    last_match_id, last_timestamp = get_sync_state(connection, club_id,
+                                                   match_type)
+    new_matches = []
+    for match in sorted(response, key=lambda match: int(match["timestamp"]),
+                        reverse=True):
+        if last_timestamp is not None and (
+                int(match["timestamp"]) < last_timestamp or
+                match["matchId"] == last_match_id):
+            break
+        new_matches.append(match)
+
+    match_ids = [match["matchId"] for match in new_matches]
+    placeholders = ", ".join(["?" for _ in match_ids])
+    stored_ids = {row[0] for row in connection.execute(
+        f"SELECT matchId FROM Matches WHERE matchId IN ({placeholders})",
+        match_ids)}
+
+    return [match for match in new_matches
+            if match["matchId"] not in stored_ids]
+
+
+def update_sync_state(cursor: sqlite3.Cursor, club_id: int, response: list,
+                      match_type: str = MATCH_TYPE):
+    """Save the newest match of the response as the high-water mark of the
+    club. It doesn't commit.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of the connection to the database.
+        club_id (int): The ID of the club.
+        response (list): The response of get_matches.
+        match_type (str): The type of the matches.
+    """
+    if len(response) == 0:
+        return
+
+    newest = max(response, key=lambda match: int(match["timestamp"]))
+    cursor.execute(
+        """INSERT INTO SyncState (clubId, matchType, lastMatchId,
+        lastTimestamp, updatedAt) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (clubId, matchType) DO UPDATE SET
+            lastMatchId = excluded.lastMatchId,
+            lastTimestamp = excluded.lastTimestamp,
+            updatedAt = excluded.updatedAt
+        WHERE excluded.lastTimestamp >= SyncState.lastTimestamp""",
+        (str(club_id), match_type, newest["matchId"],
+         int(newest["timestamp"]), int(time.time())))
+
+
+def add_match_rows(rows: dict, match: dict):
+    """Add the rows of a match to the rows of each table.
+
+    Args:
+        rows (dict): The rows of the Matches, ClubsMatches, PlayersMatches
+            and ClubsMatchesAgg tables, as lists of dictionaries.
+        match (dict): One match of the response of get_matches.
+    """
+    rows["Matches"].append({
+        "matchId": match["matchId"],
+        "timestamp": match["timestamp"]
+    })
+
+    # Clubs data in match. Remove key details because we already have
+    # the data in the Clubs table.
+    for key, value in match["clubs"].items():
+        club_dict = {column: club_value
+                     for column, club_value in value.items()
+                     if column != "details"}
+        club_dict["matchId"] = match["matchId"]
+        club_dict["clubId"] = key
+        rows["ClubsMatches"].append(club_dict)
+
+    # Players data in match. This first dict contains the clubs
+    for club_key, club_value in match["players"].items():
+        # This second dict contains the players
+        for player_key, player_value in club_value.items():
+            player_dict = dict(player_value)
+            player_dict["matchId"] = match["matchId"]
+            player_dict["clubId"] = club_key
+            player_dict["playerId"] = player_key
+            rows["PlayersMatches"].append(player_dict)
+
+    # Club aggregate data in match
+    for key, value in match["aggregate"].items():
+        aggregate_dict = dict(value)
+        aggregate_dict["matchId"] = match["matchId"]
+        aggregate_dict["clubId"] = key
+        rows["ClubsMatchesAgg"].append(aggregate_dict)
+
+
+def insert_matches(connection: sqlite3.Connection, club_id: int,
+                   response: list, match_type: str = MATCH_TYPE) -> int:
+    """Insert the matches data into the database. Each match element has a
+    dictionary of clubs, a dictionary of players and a dictionary of
+    aggregate stats for each club.
+
+    Each of these dictionaries has two keys: the home club and the away club.
+    The value of each key is a dictionary with the data of the club. Inside of
+    each player dictionary, the key is the player ID and the value is a
+    dictionary with the data of the player.
+
+    Only the matches that aren't in the database are written (see
+    get_new_matches), all of them in a single transaction together with the
+    new high-water mark of the club and the summaries of their seasons (see
+    src/summaries.py).
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        response (list): The response of get_matches.
+        match_type (str): The type of the matches.
+
+    Returns:
+        int: The number of new matches.
+    """
+    new_matches = get_new_matches(connection, club_id, response, match_type)
+
+    rows = {"Matches": [], "ClubsMatches": [], "PlayersMatches": [],
+            "ClubsMatchesAgg": []}
+    for match in new_matches:
+        add_match_rows(rows, match)
+
+    # The whole response is written in a single transaction, together with
+    # the summaries of the seasons of the new matches
+    written = 0
+    with METRICS.write("clubs/matches"), connection:
         cursor = connection.cursor()
-        columns = ", ".join(match_dict.keys())
-        placeholders = ', '.join(['?' for _ in match_dict.keys()])
-        sql_query = f"""INSERT OR REPLACE INTO Matches
-                     ({columns}) VALUES ({placeholders})"""
-        cursor.execute(sql_query, tuple(match_dict.values()))
-        connection.commit()
+        for table, table_rows in rows.items():
+            written += insert_rows(cursor, table, table_rows)
+        summaries.update(connection, [row["matchId"]
+                                      for row in rows["Matches"]],
+                         summaries.SCRAPPER_COLUMNS)
+        update_sync_state(cursor, club_id, response, match_type)
         cursor.close()
+    METRICS.count("rows", "clubs/matches", written)
+
+    return len(new_matches)
+
+
+def insert_matches_stream(connection: sqlite3.Connection, club_id: int,
+                          matches, match_type: str = MATCH_TYPE,
+                          batch_size: int = MATCHES_PER_BATCH) -> int:
+    """Insert the matches data into the database as it is decoded,
+    batch_size matches per transaction. The matches are filtered like in
+    get_new_matches, except that they can't be sorted first, so the matches
+    that aren't newer than the high-water mark are skipped instead of
+    stopping there. The high-water mark is saved after the last batch: if the
+    stream is interrupted, the next update asks for the matches again and
+    skips the ones already written.
 
-        # Insert clubs data in match into database
-        for key, value in match["clubs"].items():
-            club_dict = value
-            club_dict["matchId"] = match["matchId"]
-            club_dict["clubId"] = key
-            # Remove key details because we already have the data in the
-            # Clubs table.
-            club_dict.pop("details")
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id (int): The ID of the club.
+        matches: Iterable of the matches, like stream_matches.
+        match_type (str): The type of the matches.
+        batch_size (int): Matches written in each transaction.
+
+    Returns:
+        int: The number of new matches.
+    """
+    last_match_id, last_timestamp = get_sync_state(connection, club_id,
+                                                   match_type)
+    newest = None
+    new_matches = 0
+    for batch in batches(matches, batch_size):
+        for match in batch:
+            if newest is None or (int(match["timestamp"]) >
+                                  int(newest["timestamp"])):
+                newest = {"matchId": match["matchId"],
+                          "timestamp": match["timestamp"]}
+        batch = [match for match in batch
+                 if last_timestamp is None or (
+                     int(match["timestamp"]) >= last_timestamp and
+                     match["matchId"] != last_match_id)]
+
+        match_ids = [match["matchId"] for match in batch]
+        placeholders = ", ".join(["?" for _ in match_ids])
+        stored_ids = {row[0] for row in connection.execute(
+            f"SELECT matchId FROM Matches WHERE matchId IN ({placeholders})",
+            match_ids)}
+
+        rows = {"Matches": [], "ClubsMatches": [], "PlayersMatches": [],
+                "ClubsMatchesAgg": []}
+        for match in batch:
+            if match["matchId"] not in stored_ids:
+                add_match_rows(rows, match)
+        written = 0
+        with METRICS.write("clubs/matches"), connection:
             cursor = connection.cursor()
-            columns = ", ".join(club_dict.keys())
-            placeholders = ', '.join(['?' for _ in club_dict.keys()])
-            sql_query = f"""INSERT OR REPLACE INTO ClubsMatches
-                         ({columns}) VALUES ({placeholders})"""
-            cursor.execute(sql_query, tuple(club_dict.values()))
-            connection.commit()
+            for table, table_rows in rows.items():
+                written += insert_rows(cursor, table, table_rows)
+            summaries.update(connection, [row["matchId"]
+                                          for row in rows["Matches"]],
+                             summaries.SCRAPPER_COLUMNS)
             cursor.close()
+        METRICS.count("rows", "clubs/matches", written)
+        new_matches += len(rows["Matches"])
 
-        # Insert players data in match into database
-        # This first dict contains the clubs
-        for club_key, club_value in match["players"].items():
-            # This second dict contains the players
-            for player_key, player_value in club_value.items():
-                player_dict = player_value
-                player_dict["matchId"] = match["matchId"]
-                player_dict["clubId"] = club_key
-                player_dict["playerId"] = player_key
-                cursor = connection.cursor()
-                columns = ", ".join(player_dict.keys())
-                placeholders = ', '.join(['?' for _ in player_dict.keys()])
-                sql_query = f"""INSERT OR REPLACE INTO PlayersMatches
-                             ({columns}) VALUES ({placeholders})"""
-                cursor.execute(sql_query, tuple(player_dict.values()))
-                connection.commit()
-                cursor.close()
-
-        # Insert club aggregate data in match into database
-        for key, value in match["aggregate"].items():
-            aggregate_dict = value
-            aggregate_dict["matchId"] = match["matchId"]
-            aggregate_dict["clubId"] = key
+    if newest is not None:
+        with METRICS.write("clubs/matches"), connection:
             cursor = connection.cursor()
-            columns = ", ".join(aggregate_dict.keys())
-            placeholders = ', '.join(['?' for _ in aggregate_dict.keys()])
-            sql_query = f"""INSERT OR REPLACE INTO ClubsMatchesAgg
-                         ({columns}) VALUES ({placeholders})"""
-            cursor.execute(sql_query, tuple(aggregate_dict.values()))
-            connection.commit()
+            update_sync_state(cursor, club_id, [newest], match_type)
             cursor.close()
 
+    return new_matches
+
+
+def update_matches(club_id: int) -> int:
+    """Get the matches data from the API and insert it into the database,
+    streaming the response.
+
+    Args:
+        club_id (int): The ID of the club.
+
+    Returns:
+        int: The number of new matches.
+    """
+    connection = connect()
+    new_matches = insert_matches_stream(connection, club_id,
+                                        stream_matches(club_id))
+    connection.close()
+
+    return new_matches
+
+
+def get_clubs_seasonals(club_ids: list,
+                        api_client: client.APIClient = None) -> list:
+    """Get the seasonal data of many clubs from the API in a single request.
+    The seasonal data contains aggregate stats for each club from all
+    seasons.
+
+    Args:
+        club_ids (list): The IDs of the clubs.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        list: The seasonal stats, one element for each club requested.
+    """
+    params = {
+        "clubIds": ",".join(str(club_id) for club_id in club_ids),
+        "platform": "ps5"
+    }
+    seasonals_url = f"{API_URL}/clubs/seasonalStats"
+    return (api_client or get_client()).get_json(seasonals_url, params)
+
+
+def get_seasonals(club_id: int, api_client: client.APIClient = None) -> list:
+    """Get the seasonal data from the API.
+
+    Args:
+        club_id (int): The ID of the club.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        list: The seasonal stats of the club, in a list of one element.
+    """
+    return get_clubs_seasonals([club_id], api_client)
+
+
+def insert_seasonals(connection: sqlite3.Connection, club_id,
+                     response: list):
+    """Insert the seasonal data of the clubs of the response into the
+    database.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        club_id: The ID of the club, or the IDs of the clubs of
+            get_clubs_seasonals. The clubs written are the ones in the
+            response.
+        response (list): The response of get_seasonals or
+            get_clubs_seasonals.
+    """
+    rows = seasonals_rows(response)
+
+    # Insert seasonal data into database
+    with METRICS.write("clubs/seasonalStats"), connection:
+        cursor = connection.cursor()
+        written = insert_rows(cursor, "Seasonals", rows)
+        cursor.close()
+    METRICS.count("rows", "clubs/seasonalStats", written)
+
+
+def seasonals_rows(response: list) -> list:
+    """Rows of the Seasonals table of a response of get_seasonals or
+    get_clubs_seasonals. The list recentResults is stored as JSON.
+
+    Args:
+        response (list): The response.
+
+    Returns:
+        list: The rows, as dictionaries of column to value.
+    """
+    rows = []
+    for seasonals in response:
+        seasonals = dict(seasonals)
+        seasonals["recentResults"] = json.dumps(seasonals["recentResults"])
+        rows.append(seasonals)
+    return rows
+
 
 def update_seasonals(club_id: int):
     """Get the seasonal data from the API and insert it into the database.
-    The seasonal data contains aggregate stats for each club from all seasons.
 
     Args:
         club_id (int): The ID of the club.
     """
+    response = get_seasonals(club_id)
+    connection = connect()
+    insert_seasonals(connection, club_id, response)
+    connection.close()
+
+
+def get_leaderboard(leaderboard: str,
+                    api_client: client.APIClient = None) -> list:
+    """Get the best 100 clubs of a leaderboard from the API.
+
+    Args:
+        leaderboard (str): One of LEADERBOARDS.
+        api_client (client.APIClient): Client of the request. Defaults
+            to get_client().
+
+    Returns:
+        list: The clubs in the leaderboard, each one with its clubInfo and
+            its stats.
+    """
     params = {
-        "clubIds": club_id,
         "platform": "ps5"
     }
-    seasonals_url = "https://proclubs.ea.com/api/fifa/clubs/seasonalStats"
+    leaderboard_url = f"{API_URL}/{leaderboard}"
+    return (api_client or get_client()).get_json(leaderboard_url, params)
 
-    response = requests.get(seasonals_url, headers=HEADERS,
-                            params=params).json()[0]
-    response["recentResults"] = json.dumps(response["recentResults"])
 
-    # Insert seasonal data into database
-    connection = sqlite3.connect(DATABASE_FILE)
+def get_other_clubs(connection: sqlite3.Connection) -> list:
+    """Get the IDs of the clubs that played against us. We get the IDs from
+    the ClubsMatches table.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+
+    Returns:
+        list: The IDs of the other clubs.
+    """
     cursor = connection.cursor()
-    columns = ", ".join(response.keys())
-    placeholders = ', '.join(['?' for _ in response.keys()])
-    sql_query = f"""INSERT OR REPLACE INTO Seasonals
-                 ({columns}) VALUES ({placeholders})"""
-    cursor.execute(sql_query, tuple(response.values()))
-    connection.commit()
+    cursor.execute("""SELECT DISTINCT clubId FROM ClubsMatches
+                   WHERE clubId != ?""", (CLUB_ID,))
+    other_clubs = [club[0] for club in cursor.fetchall()]
     cursor.close()
 
+    return other_clubs
+
+
+def batches(club_ids, batch_size: int = CLUBS_PER_REQUEST):
+    """Split the club IDs in batches for the endpoints that accept many. It
+    also splits streamed responses in batches of rows.
+
+    Args:
+        club_ids: Iterable of the IDs of the clubs, or of any other items.
+        batch_size (int): Maximum number of IDs in a batch.
+
+    Yields:
+        list: The batches, lists of IDs.
+    """
+    iterator = iter(club_ids)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+def update_clubs(club_ids: list, batch_size: int = CLUBS_PER_REQUEST):
+    """Get the club data and the seasonal data of many clubs from the API,
+    batch_size clubs per request, and insert them into the database.
+
+    Args:
+        club_ids (list): The IDs of the clubs.
+        batch_size (int): Maximum number of clubs in a request.
+    """
+    connection = connect()
+    for batch in batches(club_ids, batch_size):
+        insert_club(connection, batch, get_clubs(batch))
+        insert_seasonals(connection, batch, get_clubs_seasonals(batch))
+    connection.close()
+
 
 def update_other_clubs():
     """Get the data of other clubs that played against us from the API and
-    insert it into the database. We get the IDs from the ClubsMatches table.
+    insert it into the database. The club and seasonal data are requested in
+    batches, the players and matches one club at a time. For many clubs, use
+    the concurrent crawler in src/crawler.py instead.
     """
-    connection = sqlite3.connect(DATABASE_FILE)
-    cursor = connection.cursor()
-    cursor.execute("""SELECT DISTINCT clubId FROM ClubsMatches
-                   WHERE clubId != 2654598""")
-    other_clubs = cursor.fetchall()
-    cursor.close()
+    connection = connect()
+    other_clubs = get_other_clubs(connection)
+    connection.close()
 
-    for club in tqdm(other_clubs):
-        # time.sleep(0.2)
-        update_club(club[0])
-        # time.sleep(0.2)
-        update_seasonals(club[0])
-        # time.sleep(0.2)
-        update_players(club[0])
-        # time.sleep(0.2)
-        update_matches(club[0])
+    update_clubs(other_clubs)
+    for club_id in tqdm(other_clubs):
+        update_players(club_id)
+        update_matches(club_id)
 
 
 def main():
     """Update the database with the data of our club from the API."""
-    update_club(2654598)
-    update_players(2654598)
-    update_matches(2654598)
-    update_seasonals(2654598)
+    update_club(CLUB_ID)
+    update_players(CLUB_ID)
+    update_matches(CLUB_ID)
+    update_seasonals(CLUB_ID)
     # update_other_clubs()
+    connection = connect()
+    database.checkpoint(connection)
+    connection.close()
+    METRICS.export()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+"""Incremental parser of the JSON arrays returned by the API. The body is read
+in chunks and each element of the array is decoded as soon as it is complete,
+so only one element and one chunk are in memory at a time, no matter how long
+the array is.
+"""
+import codecs
+import json
+
+
+# Bytes read from the response at a time
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+
+# Characters that can follow the digits of a number that isn't complete
+NUMBER_CONTINUATIONS = ".eE"
+
+_decoder = json.JSONDecoder()
+
+
+class JSONStreamReader:
+    """Read JSON values from an iterable of byte chunks.
+
+    Attributes:
+        buffer: Decoded text not consumed yet, from position pos.
+        pos: Position of the next character to read in the buffer.
+        exhausted: Whether all the chunks were read.
+    """
+    def __init__(self, chunks) -> None:
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self) -> bool:
+        """Read one more chunk, dropping the consumed part of the buffer.
+
+        Returns:
+            bool: False if there were no chunks left.
+        """
+        if self.exhausted:
+            return False
+        try:
+            text = self._text_decoder.decode(next(self._chunks))
+        except StopIteration:
+            self.exhausted = True
+            text = self._text_decoder.decode(b"", final=True)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return not self.exhausted or text != ""
+
+    def peek(self) -> str:
+        """Skip the whitespace and return the next character without
+        consuming it, or an empty string at the end of the body."""
+        while True:
+            while (self.pos < len(self.buffer) and
+                   self.buffer[self.pos] in WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        """Consume the next character, which must be one of characters.
+
+        Raises:
+            ValueError: If the next character is another one.
+        """
+        character = self.peek()
+        if character == "" or character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at "
+                             f"{self.buffer[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+        return character
+
+    def value(self):
+        """Decode the next JSON value.
+
+        Raises:
+            json.JSONDecodeError: If the body ends or isn't valid JSON.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer, or followed by the start of
+            # a fraction or exponent, may go on in the next chunk.
+            if not self.exhausted and (
+                    end == len(self.buffer) or
+                    self.buffer[end] in NUMBER_CONTINUATIONS):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array(chunks, key: str = None):
+    """Decode the elements of a JSON array one at a time.
+
+    Args:
+        chunks: Iterable of the bytes of the body.
+        key (str): If given, the body is an object and the array is the
+            value of this key, like members in the response of
+            /members/stats. The keys before it are decoded and dropped.
+
+    Yields:
+        The elements of the array. Nothing if the key isn't in the object.
+
+    Raises:
+        ValueError: If the body isn't an array or an object with the key.
+    """
+    reader = JSONStreamReader(chunks)
+    if key is not None:
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                return
+            name = reader.value()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.value()
+            if reader.expect(",}") == "}":
+                return
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(",]") == "]":
+            return
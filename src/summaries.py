@@ -0,0 +1,259 @@
+"""Summary tables of the matches, so the pages read the record of a club in a
+season and the totals of its players without aggregating every match.
+
+SeasonClubSummary has the matches, wins, draws, losses and goals of each
+club in each season, and PlayerSeasonSummary the matches, goals, assists,
+man of the match awards and average rating of each player of each club in
+each season. They aren't rebuilt when matches are written: only the rows of
+the seasons and clubs of the new matches are computed again, in the same
+transaction, so the cost of an update depends on those seasons and not on
+the whole history.
+
+The app database and the database of the scrapper name some columns
+differently, so the queries are built for the names of each one.
+
+Usage:
+    python -m src.summaries --database data/raw/clubedorobson.db
+"""
+import argparse
+import sqlite3
+import time
+import src.database as database
+
+
+# Names of the columns of the match tables in each database
+APP_COLUMNS = {
+    "season": "seasonid",
+    "goals_conceded": "goalsConceded",
+    "player": "name",
+    "player_club": "clubid",
+}
+SCRAPPER_COLUMNS = {
+    "season": "season_id",
+    "goals_conceded": "goalsAgainst",
+    "player": "playername",
+    "player_club": "clubId",
+}
+
+# The seasons of a club are read by its ID, and the players of a club in a
+# season by the primary key. Migration 3 of src.migrate creates these tables
+# in the app database from a frozen copy of the statements, so changing them
+# takes a new migration there too.
+CREATE_QUERIES = [
+    """CREATE TABLE IF NOT EXISTS SeasonClubSummary (
+        seasonid INTEGER NOT NULL,
+        clubId INTEGER NOT NULL,
+        matches INTEGER NOT NULL,
+        wins INTEGER NOT NULL,
+        draws INTEGER NOT NULL,
+        losses INTEGER NOT NULL,
+        goals INTEGER NOT NULL,
+        goalsConceded INTEGER NOT NULL,
+        PRIMARY KEY (seasonid, clubId)
+    )""",
+    """CREATE INDEX IF NOT EXISTS SeasonClubSummaryClubId
+        ON SeasonClubSummary (clubId, seasonid)""",
+    """CREATE TABLE IF NOT EXISTS PlayerSeasonSummary (
+        seasonid INTEGER NOT NULL,
+        clubId INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        matches INTEGER NOT NULL,
+        goals INTEGER NOT NULL,
+        assists INTEGER NOT NULL,
+        mom INTEGER NOT NULL,
+        rating REAL,
+        PRIMARY KEY (seasonid, clubId, name)
+    )""",
+]
+
+# Tables derived from the matches, never written directly
+TABLES = ["SeasonClubSummary", "PlayerSeasonSummary"]
+
+# Seasons and clubs whose rows are computed again, filled by refresh
+KEYS_QUERY = """
+    CREATE TEMP TABLE IF NOT EXISTS SummaryKeys (
+        seasonid, clubId, PRIMARY KEY (seasonid, clubId)
+    )"""
+
+# Match IDs in a single IN of get_keys, below the limit of SQLite
+MATCHES_PER_QUERY = 500
+
+
+def get_summary_queries(columns: dict = APP_COLUMNS,
+                        keyed: bool = True) -> list:
+    """Statements that compute the rows of the summary tables.
+
+    Args:
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+        keyed (bool): Whether to compute only the seasons and clubs in the
+            temporary table SummaryKeys, or all of them.
+
+    Returns:
+        list: The INSERT statements.
+    """
+    season = columns["season"]
+    conceded = columns["goals_conceded"]
+    player = columns["player"]
+    player_club = columns["player_club"]
+    source = "ClubsMatches"
+    if keyed:
+        source = f"""SummaryKeys JOIN ClubsMatches
+            ON ClubsMatches.{season} = SummaryKeys.seasonid
+            AND ClubsMatches.clubId = SummaryKeys.clubId"""
+    # TOTAL is 0 and not NULL when all the values are NULL, and the REAL it
+    # returns is stored as an INTEGER by the columns
+    return [
+        f"""INSERT INTO SeasonClubSummary
+        SELECT ClubsMatches.{season}, ClubsMatches.clubId, COUNT(*),
+            TOTAL(ClubsMatches.goals > ClubsMatches.{conceded}),
+            TOTAL(ClubsMatches.goals = ClubsMatches.{conceded}),
+            TOTAL(ClubsMatches.goals < ClubsMatches.{conceded}),
+            TOTAL(ClubsMatches.goals), TOTAL(ClubsMatches.{conceded})
+        FROM {source}
+        WHERE ClubsMatches.{season} IS NOT NULL
+        GROUP BY ClubsMatches.{season}, ClubsMatches.clubId""",
+        f"""INSERT INTO PlayerSeasonSummary
+        SELECT ClubsMatches.{season}, ClubsMatches.clubId,
+            PlayersMatches.{player}, COUNT(*),
+            TOTAL(PlayersMatches.goals), TOTAL(PlayersMatches.assists),
+            TOTAL(PlayersMatches.mom), AVG(PlayersMatches.rating)
+        FROM {source}
+        JOIN PlayersMatches
+            ON PlayersMatches.matchId = ClubsMatches.matchId
+            AND PlayersMatches.{player_club} = ClubsMatches.clubId
+        WHERE ClubsMatches.{season} IS NOT NULL
+        GROUP BY ClubsMatches.{season}, ClubsMatches.clubId,
+            PlayersMatches.{player}""",
+    ]
+
+
+def create(connection: sqlite3.Connection, columns: dict = APP_COLUMNS):
+    """Create the summary tables, if they don't exist, and the indexes of the
+    match tables that update reads them through. The indexes are the ones of
+    src.migrate in the app database. It doesn't commit.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+    """
+    for query in CREATE_QUERIES:
+        connection.execute(query)
+    connection.execute(
+        f"""CREATE INDEX IF NOT EXISTS ClubsMatchesClubSeason
+        ON ClubsMatches (clubId, {columns["season"]}, matchId)""")
+    connection.execute(
+        """CREATE INDEX IF NOT EXISTS PlayersMatchesMatchId
+        ON PlayersMatches (matchId)""")
+
+
+def get_keys(connection: sqlite3.Connection, match_ids: list,
+             columns: dict = APP_COLUMNS) -> set:
+    """Seasons and clubs of some matches.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        match_ids (list): The IDs of the matches.
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+
+    Returns:
+        set: The (season, club ID) of each club in each match.
+    """
+    season = columns["season"]
+    keys = set()
+    match_ids = list(match_ids)
+    for start in range(0, len(match_ids), MATCHES_PER_QUERY):
+        batch = match_ids[start:start + MATCHES_PER_QUERY]
+        placeholders = ", ".join(["?" for _ in batch])
+        keys.update(connection.execute(
+            f"""SELECT DISTINCT {season}, clubId FROM ClubsMatches
+            WHERE {season} IS NOT NULL AND matchId IN ({placeholders})""",
+            batch))
+    return keys
+
+
+def refresh(connection: sqlite3.Connection, keys: set,
+            columns: dict = APP_COLUMNS):
+    """Compute again the summary rows of some seasons and clubs, from the
+    matches in the database. Keys without matches anymore lose their rows.
+    It doesn't commit.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        keys (set): The (season, club ID) to compute, like get_keys.
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+    """
+    if len(keys) == 0:
+        return
+    connection.execute(KEYS_QUERY)
+    connection.execute("DELETE FROM SummaryKeys")
+    connection.executemany("INSERT INTO SummaryKeys VALUES (?, ?)", keys)
+    for table in TABLES:
+        connection.execute(
+            f"""DELETE FROM {table} WHERE (seasonid, clubId) IN (
+                SELECT seasonid, clubId FROM SummaryKeys)""")
+    for query in get_summary_queries(columns):
+        connection.execute(query)
+    connection.execute("DELETE FROM SummaryKeys")
+
+
+def update(connection: sqlite3.Connection, match_ids: list,
+           columns: dict = APP_COLUMNS):
+    """Update the summaries with some new or changed matches, already
+    written. It doesn't commit, so it runs in the transaction of the
+    matches.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        match_ids (list): The IDs of the matches.
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+    """
+    create(connection, columns)
+    refresh(connection, get_keys(connection, match_ids, columns), columns)
+
+
+def rebuild(connection: sqlite3.Connection, columns: dict = APP_COLUMNS):
+    """Compute all the summary rows again, from all the matches. It doesn't
+    commit.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database.
+        columns (dict): Names of the columns, APP_COLUMNS or
+            SCRAPPER_COLUMNS.
+    """
+    create(connection, columns)
+    for table in TABLES:
+        connection.execute(f"DELETE FROM {table}")
+    for query in get_summary_queries(columns, keyed=False):
+        connection.execute(query)
+
+
+def main():
+    """Rebuild the summaries of the database of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default=database.APP_DATABASE_FILE)
+    parser.add_argument("--scrapper", action="store_true",
+                        help="The database is the one of the scrapper.")
+    args = parser.parse_args()
+
+    columns = SCRAPPER_COLUMNS if args.scrapper else APP_COLUMNS
+    connection = database.connect(args.database)
+    start = time.perf_counter()
+    with connection:
+        rebuild(connection, columns)
+    clubs, = connection.execute(
+        "SELECT COUNT(*) FROM SeasonClubSummary").fetchone()
+    players, = connection.execute(
+        "SELECT COUNT(*) FROM PlayerSeasonSummary").fetchone()
+    database.checkpoint(connection)
+    connection.close()
+    print(f"{clubs} club and {players} player summaries in "
+          f"{time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,80 @@
 """Functions and class to get club information from database."""
+import bisect
+import json
 import pandas as pd
-import sqlite3
+import src.utils.repository as repository
 import numpy as np
 
 
+class StadiumIndex:
+    """The stadiums of the database in memory, to find the stadium of a
+    club without a query.
+
+    Attributes:
+        version: The version of the database the stadiums were read from,
+            from repository.get_version
+        stadiums: The stadiums, as dictionaries of column to value, in the
+            order of the table
+        by_name: The first stadium with each normalised name
+        ids: The sorted stadium IDs
+        by_id: The stadium of each ID
+    """
+    def __init__(self, stadiums: pd.DataFrame, version: tuple = None) -> None:
+        self.version = version
+        self.stadiums = stadiums.to_dict("records")
+        self.by_name = {}
+        self.by_id = {}
+        for stadium in self.stadiums:
+            self.by_name.setdefault(normalise_name(stadium["name"]), stadium)
+            self.by_id.setdefault(stadium["stadium_id"], stadium)
+        self.ids = sorted(self.by_id)
+
+    def find_by_name(self, name) -> dict:
+        """Get the stadium with a name, or else the first one whose name
+        contains it, like the LIKE '%name%' query it replaces. None if no
+        stadium matches."""
+        name = normalise_name(name)
+        stadium = self.by_name.get(name)
+        if stadium is not None:
+            return stadium
+        for stadium_name, stadium in self.by_name.items():
+            if name in stadium_name:
+                return stadium
+        return None
+
+    def find_nearest_id(self, stadium_id: int) -> dict:
+        """Get the stadium with the ID closest to stadium_id, the highest
+        one on a tie, like the argsort it replaces picked for the stadiums of
+        the database. None if there are no stadiums."""
+        if not self.ids:
+            return None
+        i = bisect.bisect_left(self.ids, stadium_id)
+        candidates = self.ids[max(i - 1, 0):i + 1]
+        closest = min(candidates,
+                      key=lambda id_: (abs(id_ - stadium_id), -id_))
+        return self.by_id[closest]
+
+
+# Index of the stadiums of the app database, read again when it changes
+_stadium_index = None
+
+
+def normalise_name(name) -> str:
+    """Name in lower case, with single spaces, to compare stadium names."""
+    return " ".join(str(name).casefold().split())
+
+
+def get_stadium_index() -> StadiumIndex:
+    """Get the index of the stadiums, reading the Stadiums table only when
+    the database changed since it was last read."""
+    global _stadium_index
+    version = repository.get_version()
+    if _stadium_index is None or _stadium_index.version != version:
+        _stadium_index = StadiumIndex(
+            repository.fetch_dataframe(repository.ALL_STADIUMS), version)
+    return _stadium_index
+
+
 class Club:
     """Class containing the club information. This includes the club name,
     crest, stadium name, stadium capacity, home and away kits, and the
@@ -25,7 +96,7 @@ class Club:
     """
     def __init__(self, club_id, club_name, is_custom_team,
                  crest_id, stad_name, standard_crest_id,
-                 kit_colors) -> None:
+                 kit_colors, stadium_index: StadiumIndex = None) -> None:
         self.club_id = club_id
         self.club_name = club_name
         self.is_custom_team = is_custom_team
@@ -36,7 +107,7 @@ class Club:
 
         self.__get_kits_urls()
         self.__get_crest_url()
-        self.__get_stadium()
+        self.__get_stadium(stadium_index)
         self.__get_stadium_url()
 
     def __get_crest_url(self):
@@ -75,41 +146,24 @@ class Club:
 
         # https://www.ea.com/ea-sports-fc/ultimate-team/web-app/content/24B23FDE-7835-41C2-87A2-F453DFDB2E82/2024/fut/items/images/mobile/vanity/stadium/14.png
 
-    def __get_stadium(self):
+    def __get_stadium(self, stadium_index: StadiumIndex = None):
         """Get the stadium name and capacity from the club's stadium name. The
         stadium name is used to get the stadium name and capacity from the
-        FIFA 21 database."""
-        database_file = "data/raw/clubedorobson.db"
-        connection = sqlite3.connect(database_file)
-        cursor = connection.cursor()
+        FIFA 21 database. Clubs created together share the same
+        stadium_index, otherwise it's the one of get_stadium_index."""
         # Check it the stadium name is in the database. There are some
         # stadiums that can have custom names by game design. If the stadium
         # name is not in the database, it's created by the club id so
         # that every club has a stadium image.
-        stadium = cursor.execute(
-            f"SELECT * FROM Stadiums WHERE name like '%{self.stadium_name}%'")
-        stadium = stadium.fetchall()
-
-        if len(stadium) != 0:
-            columns = [description[0] for description in cursor.description]
-            stadium = pd.DataFrame(stadium, columns=columns)
-            stadium = stadium.iloc[0]
-        else:
-            candidate_stadiums = cursor.execute("SELECT * FROM Stadiums")
-            candidate_stadiums = candidate_stadiums.fetchall()
-            columns = [description[0] for description in cursor.description]
-            candidate_stadiums = pd.DataFrame(candidate_stadiums,
-                                              columns=columns)
-            # Get the last 3 digits of the club id
-            club_id = self.club_id
-            final_club_id = int(str(club_id)[-3:])
-            # Select a stadium with a id most close to the final_club_id
-            stadium = candidate_stadiums.iloc[
-                (candidate_stadiums["stadium_id"] -
-                final_club_id).abs().argsort()[:1]]
-            stadium = stadium.iloc[0]
-
-        stadium = stadium.to_dict()
+        if stadium_index is None:
+            stadium_index = get_stadium_index()
+        stadium = stadium_index.find_by_name(self.stadium_name)
+        if stadium is None:
+            # Select a stadium with a id most close to the last 3 digits of
+            # the club id
+            final_club_id = int(str(self.club_id)[-3:])
+            stadium = stadium_index.find_nearest_id(final_club_id)
+
         self.stadium_id = stadium["stadium_id"]
         self.stadium_capacity = stadium["capacity"]
 
@@ -123,58 +177,53 @@ def get_club_info(club_id: int = 6703918):
     Args:
         club_id (int): The club's ID. Defaults to 6703918.
     """
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    club = cursor.execute(
-        f"SELECT * FROM Clubs WHERE clubId = {club_id}")
-    club = club.fetchall()
-    columns = [description[0] for description in cursor.description]
-    cursor.close()
-    connection.close()
-    club = pd.DataFrame(club, columns=columns)
-    club_name = club["name"].values[0]
-    is_custom_team = club["iscustomteam"].sum()
-    # If the team is a custom team, the crest ID is in the column
-    # customcrestid. If not, the crest ID is in the column standardcrestid.
-    if is_custom_team == 1:
-        crest_id = club["customcrestid"].sum()
-    else:
-        crest_id = club["standardcrestid"].sum()
-    # The stadium name is in the column stadname.
-    stad_name = club["stadname"].values[0]
-
-    standard_crest_id = club["standardcrestid"].sum()
-
-    kit_color_1 = club["kitcolor1"].sum()
-    kit_color_2 = club["kitcolor2"].sum()
-    kit_color_3 = club["kitcolor3"].sum()
-
-    kit_colors = {
-        "kit_color_1": kit_color_1,
-        "kit_color_2": kit_color_2,
-        "kit_color_3": kit_color_3
-    }
+    return get_clubs_info([club_id])[int(club_id)]
+
 
-    club = Club(club_id, club_name, is_custom_team, crest_id, stad_name,
-                standard_crest_id, kit_colors)
+def get_clubs_info(club_ids) -> dict:
+    """Get the information of many clubs from the FIFA 21 database with a
+    single query, like get_club_info does for one club.
 
-    return club
+    Args:
+        club_ids: The clubs' IDs. Repeated IDs are read once.
+
+    Returns:
+        dict: The Club of each ID. IDs without a club are left out.
+    """
+    club_ids = sorted({int(club_id) for club_id in club_ids})
+    clubs = repository.fetch_record_list(repository.CLUBS,
+                                         (json.dumps(club_ids),))
+    stadium_index = get_stadium_index()
+
+    clubs_info = {}
+    for club in clubs:
+        is_custom_team = club["iscustomteam"]
+        # If the team is a custom team, the crest ID is in the column
+        # customcrestid. If not, the crest ID is in the column
+        # standardcrestid.
+        if is_custom_team == 1:
+            crest_id = club["customcrestid"]
+        else:
+            crest_id = club["standardcrestid"]
+
+        kit_colors = {
+            "kit_color_1": club["kitcolor1"],
+            "kit_color_2": club["kitcolor2"],
+            "kit_color_3": club["kitcolor3"]
+        }
+
+        clubs_info[club["clubId"]] = Club(
+            club["clubId"], club["name"], is_custom_team, crest_id,
+            club["stadname"], club["standardcrestid"], kit_colors,
+            stadium_index)
+
+    return clubs_info
 
 
 def get_seasons_info() -> dict:
     """Get the club's seasons information from the FIFA 21 database."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    seasons = cursor.execute("SELECT * FROM Seasonals")
-    seasons = seasons.fetchall()[0]
-    columns = [description[0] for description in cursor.description]
-    cursor.close()
-    connection.close()
-
-    seasons = pd.DataFrame(seasons).T
-    seasons.columns = columns
+    seasons = pd.DataFrame([repository.fetch_record(repository.SEASONALS)],
+                           dtype=object)
 
     wins = seasons["wins"].sum()
     draws = seasons["ties"].sum()
@@ -212,18 +261,7 @@ def get_seasons_info() -> dict:
 
 def get_all_clubs() -> pd.DataFrame:
     """Get all clubs from the database."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    club = cursor.execute("SELECT * FROM Clubs")
-    club = club.fetchall()
-    columns = [description[0] for description in cursor.description]
-    clubs = pd.DataFrame(club, columns=columns)
-
-    cursor.close()
-    connection.close()
-
-    return clubs
+    return repository.fetch_dataframe(repository.ALL_CLUBS)
 
 
 def get_club_last_matches(club_id: int) -> pd.DataFrame:
@@ -232,21 +270,8 @@ def get_club_last_matches(club_id: int) -> pd.DataFrame:
     Args:
         club_id (int): The club's ID.
     """
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    matches = cursor.execute(
-        f"""SELECT * FROM Matches WHERE homeClub = {club_id}
-        OR awayClub = {club_id}
-        ORDER BY matchId DESC
-        LIMIT 10;""")
-    matches = matches.fetchall()
-    columns = [description[0] for description in cursor.description]
-
-    cursor.close()
-    connection.close()
-
-    matches = pd.DataFrame(matches, columns=columns)
+    matches = repository.fetch_dataframe(repository.CLUB_LAST_MATCHES,
+                                         (club_id, club_id))
 
     # The column result is related to our club.
     matches["result"] = 0
@@ -1,5 +1,5 @@
 """Functions to get match info from database."""
-import sqlite3
+import src.utils.repository as repository
 import pandas as pd
 import src.utils.club_info as utils_club
 import numpy as np
@@ -8,77 +8,36 @@ from typing import Tuple
 
 def get_seasons_list():
     """Get all seasons values of our team from database."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    # Get all matches from database
-    matches = cursor.execute("SELECT * FROM Matches")
-    matches = matches.fetchall()
-    columns = [description[0] for description in cursor.description]
-    matches = pd.DataFrame(matches, columns=columns)
-
-    matches.sort_values(by=["matchId"], inplace=True)
-
-    # Get all matches that our team played
-    matches_clubs = cursor.execute("SELECT * FROM ClubsMatches")
-    matches_clubs = matches_clubs.fetchall()
-    columns = [description[0] for description in cursor.description]
-    matches_clubs = pd.DataFrame(matches_clubs, columns=columns)
-
-    cursor.close()
-    connection.close()
-
     our_club = 6703918
-    matches_clubs.dropna(inplace=True)
     # Get all seasons that our team played
-    our_seasons = matches_clubs[matches_clubs["clubId"] == our_club]
+    return repository.fetch_column(repository.SEASONS, (our_club,))
 
-    # Convert to list
-    seasons = our_seasons["seasonid"].unique().astype(int).tolist()
-    seasons.sort()
 
-    return seasons
+def get_season_summary(season: int, club_id: int = 6703918) -> dict:
+    """Get the matches, wins, draws, losses and goals of a club in a season,
+    from the summary table. The club didn't play the season if it's None."""
+    return repository.fetch_record(repository.SEASON_SUMMARY,
+                                   (season, club_id))
 
 
-def get_matches():
-    """Get all matches from database."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    matches = cursor.execute("SELECT * FROM Matches")
-    matches = matches.fetchall()
-    columns = [description[0] for description in cursor.description]
-    matches = pd.DataFrame(matches, columns=columns)
+def get_season_players(season: int, club_id: int = 6703918) -> pd.DataFrame:
+    """Get the matches, goals, assists, man of the match awards and average
+    rating of the players of a club in a season, from the summary table."""
+    return repository.fetch_dataframe(repository.SEASON_PLAYERS,
+                                      (season, club_id))
 
-    matches.sort_values(by=["matchId"], inplace=True)
-    cursor.close()
-    connection.close()
 
-    return matches
+def get_matches():
+    """Get all matches from database."""
+    return repository.fetch_dataframe(repository.ALL_MATCHES)
 
 
 def get_matches_season(season: int):
     """Get all matches from selected season."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    matches = cursor.execute("SELECT * FROM Matches")
-    matches = matches.fetchall()
-    columns = [description[0] for description in cursor.description]
-    matches = pd.DataFrame(matches, columns=columns)
-
-    matches.sort_values(by=["matchId"], inplace=True)
-
-    matches_clubs = cursor.execute("SELECT * FROM ClubsMatches")
-    matches_clubs = matches_clubs.fetchall()
-    columns = [description[0] for description in cursor.description]
-    matches_clubs = pd.DataFrame(matches_clubs, columns=columns)
-
-    cursor.close()
-    connection.close()
-
     our_club = 6703918
-    matches_clubs.dropna(inplace=True)
+    # Rows of both clubs of the matches that our team played in the season
+    matches_clubs = repository.fetch_dataframe(
+        repository.SEASON_CLUBS_MATCHES, (our_club, season))
 
     matches_ids_selected_season = matches_clubs[
         (matches_clubs["seasonid"] == season) &
@@ -97,6 +56,12 @@ def get_season_matches_df(matches_ids_selected_season: list):
     # Get all matches from all seasons
     matches = get_matches()
     matches_df = pd.DataFrame()
+    # Get the clubs of all the matches at once
+    selected_matches = matches[
+        matches["matchId"].isin(matches_ids_selected_season)]
+    clubs = utils_club.get_clubs_info(
+        pd.concat([selected_matches["homeClub"],
+                   selected_matches["awayClub"]]))
     # For each match, get the match info and append to matches_df
     for match_id in matches_ids_selected_season:
         home_club = matches[
@@ -115,8 +80,8 @@ def get_season_matches_df(matches_ids_selected_season: list):
         timestamp = pd.to_datetime(timestamp, unit="s")
         # Format timestamp to stop showing seconds
         timestamp = timestamp.strftime("%d/%m/%Y %H:%M")
-        home_club = utils_club.get_club_info(home_club)
-        away_club = utils_club.get_club_info(away_club)
+        home_club = clubs[home_club]
+        away_club = clubs[away_club]
         match_df["Timestamp"] = [timestamp]
         match_df["Stadium"] = home_club.stadium_path
         match_df["stadium_name"] = [home_club.stadium_name]
@@ -145,17 +110,8 @@ def get_players_in_match(match_id: int,
                                                      pd.DataFrame]:
     """Get all players that played in a match and separate them by home and
     away club."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    players_match = cursor.execute(f"""SELECT * FROM PlayersMatches
-                                   WHERE matchId = {match_id}""")
-    players_match = players_match.fetchall()
-    columns = [description[0] for description in cursor.description]
-    players_match = pd.DataFrame(players_match, columns=columns)
-
-    cursor.close()
-    connection.close()
+    players_match = repository.fetch_dataframe(repository.PLAYERS_IN_MATCH,
+                                               (match_id,))
 
     our_players = players_match[
         players_match["clubid"] == 6703918]
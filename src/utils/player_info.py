@@ -1,5 +1,5 @@
 """Functions to get player info from database."""
-import sqlite3
+import src.utils.repository as repository
 import pandas as pd
 import numpy as np
 import streamlit as st
@@ -13,63 +13,26 @@ POSITIONS = ['GK', 'SW', 'RWB', 'RB', 'RCB', 'CB', 'LCB', 'LB', 'LWB', 'RDM',
 
 def get_players_by_club(club_id: int):
     """Get all players from a club."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    players = cursor.execute(
-        f"SELECT * FROM Players WHERE clubId = {club_id}")
-    players = players.fetchall()
-    columns = [description[0] for description in cursor.description]
-    players = pd.DataFrame(players, columns=columns)
-    cursor.close()
-    connection.close()
-    return players
+    return repository.fetch_dataframe(repository.CLUB_PLAYERS, (club_id,))
 
 
 def get_robsoners():
     """Get all players from CdR."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    players = cursor.execute("SELECT * FROM Robsoners")
-    players = players.fetchall()
-    columns = [description[0] for description in cursor.description]
-    players = pd.DataFrame(players, columns=columns)
-    cursor.close()
-    connection.close()
-    return players
+    return repository.fetch_dataframe(repository.ROBSONERS)
 
 
 def get_player_vproattr(player_name: str):
     """Get player latest vproattr. We need this for real players."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    players = cursor.execute(
-        f"""SELECT * FROM PlayersMatches WHERE name = '{player_name}'
-        ORDER BY matchId DESC LIMIT 1""")
-    players = players.fetchall()
-    columns = [description[0] for description in cursor.description]
-    players = pd.DataFrame(players, columns=columns)
-    cursor.close()
-    connection.close()
-    if players.empty:
+    player_match = repository.fetch_record(repository.PLAYER_LAST_MATCH,
+                                           (player_name,))
+    if player_match is None:
         return None
-    return players.iloc[0]["vproattr"]
+    return player_match["vproattr"]
 
 
 def get_player_by_online_id(online_id: str) -> pd.DataFrame:
     """Get player by online id. We need to get opponent players attributes."""
-    database_file = "data/raw/clubedorobson.db"
-    connection = sqlite3.connect(database_file)
-    cursor = connection.cursor()
-    players = cursor.execute(
-        f"""SELECT * FROM Players WHERE name = '{online_id}'""")
-    players = players.fetchall()
-    columns = [description[0] for description in cursor.description]
-    players = pd.DataFrame(players, columns=columns)
-    cursor.close()
-    connection.close()
+    players = repository.fetch_dataframe(repository.PLAYER, (online_id,))
     return players.iloc[0]
 
 
@@ -124,10 +87,9 @@ def get_players_df(selected_club: int):
         for index, row in players_df.iterrows():
             if row["proName"] is None or row["proName"] == "":
                 players_df.at[index, "proName"] = row["name"]
-        players_df["gamesPlayed"] = players_df["gamesPlayed"].apply(
-            lambda x: int(x))
+        # The players without attributes have NULL nationalities
         players_df = players_df[(players_df["gamesPlayed"] > 0) &
-                                (players_df["proNationality"] != "")]
+                                (players_df["proNationality"].notna())]
         players_df.drop(columns=["createdAt", "updatedAt"], inplace=True)
 
     # Set the name of the player position
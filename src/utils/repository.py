@@ -0,0 +1,208 @@
+"""Queries of the app and the connections they run on.
+
+Every thread reuses a read-only connection to the app database instead of
+opening one in each call, and the queries are constants with ? placeholders,
+so sqlite3 prepares each one once and finds it in the statement cache of
+the connection afterwards, and values with quotes, like some player names,
+can't break them. A connection is opened again when the database file is
+replaced, by src/create_db.py for example.
+
+Usage:
+    import src.utils.repository as repository
+    club = repository.fetch_record(repository.CLUB, (6703918,))
+"""
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+import src.database as database
+
+
+# Statements kept prepared by each connection, more than the queries below
+STATEMENT_CACHE_SIZE = 256
+
+# Clubs
+CLUB = "SELECT * FROM Clubs WHERE clubId = ?"
+# The IDs are a JSON array, so any number of them is one prepared statement
+CLUBS = """
+    SELECT * FROM Clubs
+    WHERE clubId IN (SELECT value FROM json_each(?))"""
+ALL_CLUBS = "SELECT * FROM Clubs"
+SEASONALS = "SELECT * FROM Seasonals"
+CLUB_LAST_MATCHES = """
+    SELECT * FROM Matches WHERE homeClub = ? OR awayClub = ?
+    ORDER BY matchId DESC LIMIT 10"""
+ALL_STADIUMS = "SELECT * FROM Stadiums"
+
+# Matches
+SEASONS = """
+    SELECT seasonid FROM SeasonClubSummary WHERE clubId = ?
+    ORDER BY seasonid"""
+SEASON_SUMMARY = """
+    SELECT matches, wins, draws, losses, goals, goalsConceded
+    FROM SeasonClubSummary WHERE seasonid = ? AND clubId = ?"""
+SEASON_PLAYERS = """
+    SELECT name, matches, goals, assists, mom, rating
+    FROM PlayerSeasonSummary WHERE seasonid = ? AND clubId = ?
+    ORDER BY goals DESC, assists DESC, name"""
+ALL_MATCHES = "SELECT * FROM Matches ORDER BY matchId"
+# Rows of both clubs of the matches that a club played in a season
+SEASON_CLUBS_MATCHES = """
+    SELECT * FROM ClubsMatches
+    WHERE seasonid IS NOT NULL AND matchId IN (
+        SELECT matchId FROM ClubsMatches
+        WHERE clubId = ? AND seasonid = ?)"""
+PLAYERS_IN_MATCH = "SELECT * FROM PlayersMatches WHERE matchId = ?"
+
+# Players
+CLUB_PLAYERS = "SELECT * FROM Players WHERE clubId = ?"
+ROBSONERS = "SELECT * FROM Robsoners"
+PLAYER_LAST_MATCH = """
+    SELECT * FROM PlayersMatches WHERE name = ?
+    ORDER BY matchId DESC LIMIT 1"""
+PLAYER = "SELECT * FROM Players WHERE name = ?"
+
+# Types of the columns of the DataFrames of some queries. The results of
+# SQLite have no column types, so pandas reads the integers of a column with
+# NULLs as floats, and a column of NULLs as objects. Int64 keeps them
+# integers, with <NA> for the NULLs.
+PLAYER_DTYPES = {
+    "proPos": "Int64",
+    "proStyle": "Int64",
+    "proHeight": "Int64",
+    "proNationality": "Int64",
+    "clubid": "Int64",
+}
+DTYPES = {
+    SEASON_PLAYERS: {"rating": "float64"},
+    SEASON_CLUBS_MATCHES: {"seasonid": "Int64"},
+    PLAYERS_IN_MATCH: {"rating": "float64", "clubid": "Int64"},
+    CLUB_PLAYERS: PLAYER_DTYPES,
+    PLAYER: PLAYER_DTYPES,
+}
+
+# Connections of each thread, by database file
+_local = threading.local()
+
+
+def get_connection(
+        database_file: str = database.APP_DATABASE_FILE
+        ) -> sqlite3.Connection:
+    """Get the read-only connection of the current thread to a database,
+    opening it on the first call, or when the file was replaced since it
+    was opened.
+
+    Args:
+        database_file (str): Path to the database.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    # A replaced file is a new inode, that an open connection doesn't see
+    file_id = os.stat(database_file).st_ino
+    connection, connection_file_id = connections.get(database_file,
+                                                     (None, None))
+    if connection is not None and connection_file_id != file_id:
+        connection.close()
+        connection = None
+    if connection is None:
+        connection = database.connect(
+            database_file, read_only=True,
+            cached_statements=STATEMENT_CACHE_SIZE)
+        connections[database_file] = (connection, file_id)
+    return connection
+
+
+def get_version(database_file: str = database.APP_DATABASE_FILE) -> tuple:
+    """Get a value that changes whenever a database is written or replaced,
+    without querying it. Writers in WAL mode change the -wal file, and the
+    checkpoints and src/create_db.py change the database file.
+
+    Args:
+        database_file (str): Path to the database.
+
+    Returns:
+        tuple: The inode, modification time and size of the database file
+            and of its WAL file, if any.
+    """
+    version = ()
+    for file in [database_file, database_file + "-wal"]:
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            version += (None,)
+            continue
+        version += ((stat.st_ino, stat.st_mtime_ns, stat.st_size),)
+    return version
+
+
+def close_connections():
+    """Close the connections of the current thread."""
+    for connection, _ in getattr(_local, "connections", {}).values():
+        connection.close()
+    _local.connections = {}
+
+
+def to_parameters(parameters) -> tuple:
+    """Parameters of a query as values that sqlite3 can bind. The values
+    taken from DataFrames are NumPy scalars, like numpy.int64."""
+    return tuple(value.item() if isinstance(value, np.generic) else value
+                 for value in parameters)
+
+
+def execute(query: str, parameters=(),
+            database_file: str = database.APP_DATABASE_FILE) -> tuple:
+    """Run a query on the connection of the current thread.
+
+    Args:
+        query (str): One of the queries of this module.
+        parameters: Values of its placeholders.
+        database_file (str): Path to the database.
+
+    Returns:
+        tuple: The names of the columns and the rows.
+    """
+    cursor = get_connection(database_file).execute(
+        query, to_parameters(parameters))
+    columns = [description[0] for description in cursor.description]
+    rows = cursor.fetchall()
+    cursor.close()
+    return columns, rows
+
+
+def fetch_dataframe(query: str, parameters=(),
+                    database_file: str = database.APP_DATABASE_FILE
+                    ) -> pd.DataFrame:
+    """Rows of a query as a DataFrame, with a column for each column of the
+    query even without rows, and the types of DTYPES."""
+    columns, rows = execute(query, parameters, database_file)
+    return pd.DataFrame(rows, columns=columns).astype(DTYPES.get(query, {}))
+
+
+def fetch_record(query: str, parameters=(),
+                 database_file: str = database.APP_DATABASE_FILE) -> dict:
+    """First row of a query as a dictionary of column to value, or None
+    without rows."""
+    columns, rows = execute(query, parameters, database_file)
+    if len(rows) == 0:
+        return None
+    return dict(zip(columns, rows[0]))
+
+
+def fetch_record_list(query: str, parameters=(),
+                      database_file: str = database.APP_DATABASE_FILE
+                      ) -> list:
+    """Rows of a query as dictionaries of column to value."""
+    columns, rows = execute(query, parameters, database_file)
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def fetch_column(query: str, parameters=(),
+                 database_file: str = database.APP_DATABASE_FILE) -> list:
+    """Values of the first column of the rows of a query."""
+    _, rows = execute(query, parameters, database_file)
+    return [row[0] for row in rows]
@@ -0,0 +1,495 @@
+"""Scrape many clubs with many processes, or many machines, sharing a queue
+of jobs in a SQLite database. Each job is a club and an endpoint. A worker
+process leases some jobs, makes the request, decodes it and prepares the
+rows, and hands the rows to the writer process, the only one writing to the
+data database, which marks the jobs as done. A job whose lease expires,
+because its worker died or hung, is leased again by another worker, up to
+MAX_ATTEMPTS times.
+
+The machines share the jobs database through a network filesystem whose file
+locks work, like NFS with locking, and their clocks must agree for the
+leases to expire on time. The jobs database uses the rollback journal: WAL
+keeps its index in shared memory, which only the processes of one machine
+see. Each machine writes the rows to its own data database.
+
+Usage:
+    python -m src.work_queue enqueue
+    python -m src.work_queue work --workers 4
+    python -m src.work_queue status
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+import src.archive as archive
+import src.database as database
+import src.scrapper as scrapper
+import src.summaries as summaries
+
+
+JOBS_DATABASE_FILE = "data/raw/jobs.db"
+
+JOBS_QUERY = """
+    CREATE TABLE IF NOT EXISTS Jobs (
+        clubId TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        status TEXT NOT NULL,
+        leaseOwner TEXT,
+        leaseExpiry REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        updatedAt REAL NOT NULL,
+        PRIMARY KEY (clubId, endpoint)
+    )
+"""
+
+# Status of a job
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+# Get function of each endpoint and function that prepares the rows of its
+# response. The rows are a dictionary of table to list of rows.
+ENDPOINTS = {
+    "clubs/info": (
+        scrapper.get_clubs,
+        lambda club_ids, response: {"Clubs": scrapper.club_rows(response)}),
+    "clubs/seasonalStats": (
+        scrapper.get_clubs_seasonals,
+        lambda club_ids, response: {
+            "Seasonals": scrapper.seasonals_rows(response)}),
+    "members/stats": (
+        scrapper.get_players,
+        lambda club_id, response: {
+            "Players": scrapper.players_rows(club_id, response)}),
+    "clubs/matches": (
+        scrapper.get_matches,
+        lambda club_id, response: matches_rows(response)),
+}
+
+# Endpoints that accept many clubs in a request, whose jobs are leased in
+# batches of scrapper.CLUBS_PER_REQUEST.
+BATCH_ENDPOINTS = {"clubs/info", "clubs/seasonalStats"}
+
+# Tables of the matches endpoint, whose rows are skipped if the match is
+# already stored.
+MATCH_TABLES = ["Matches", "ClubsMatches", "PlayersMatches",
+                "ClubsMatchesAgg"]
+
+# Seconds a worker owns the jobs it leased
+LEASE_SECONDS = 120
+
+# Times a job is leased before giving up on it
+MAX_ATTEMPTS = 3
+
+# Seconds a worker waits when there are no jobs to lease but other workers
+# still have some leased
+IDLE_SECONDS = 1
+
+# Seconds between two checks of the processes of run
+WATCH_SECONDS = 1
+
+
+def connect(jobs_database_file: str) -> sqlite3.Connection:
+    """Connect to the jobs database, creating the table if needed. The
+    connection is in autocommit mode, so every lease can begin its own
+    immediate transaction.
+
+    Args:
+        jobs_database_file (str): Path to the jobs database.
+
+    Returns:
+        sqlite3.Connection: The connection.
+    """
+    connection = sqlite3.connect(jobs_database_file, timeout=60,
+                                 isolation_level=None)
+    # Not WAL, whose shared memory index doesn't work across machines. The
+    # transactions are small leases, so the writers locking out the readers
+    # for a moment doesn't matter.
+    connection.execute("PRAGMA journal_mode = DELETE")
+    connection.execute(JOBS_QUERY)
+    return connection
+
+
+def enqueue(connection: sqlite3.Connection, club_ids: list,
+            endpoints: list = None) -> int:
+    """Add a job for each club and endpoint. Jobs already done or failed are
+    queued again, jobs pending or leased are left as they are.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the jobs database.
+        club_ids (list): The IDs of the clubs.
+        endpoints (list): The endpoints. Defaults to all of ENDPOINTS.
+
+    Returns:
+        int: Number of jobs queued.
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    cursor = connection.executemany(
+        """INSERT INTO Jobs (clubId, endpoint, status, updatedAt)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (clubId, endpoint) DO UPDATE SET
+            status = excluded.status,
+            leaseOwner = NULL,
+            leaseExpiry = NULL,
+            attempts = 0,
+            updatedAt = excluded.updatedAt
+        WHERE Jobs.status IN (?, ?)""",
+        [(str(club_id), endpoint, PENDING, now, DONE, FAILED)
+         for club_id in club_ids for endpoint in endpoints])
+    connection.execute("COMMIT")
+    return cursor.rowcount
+
+
+def lease(connection: sqlite3.Connection, owner: str,
+          lease_seconds: float = LEASE_SECONDS) -> tuple:
+    """Lease the next pending jobs, or jobs whose lease expired, of a single
+    endpoint: a batch of clubs for the batch endpoints, one club for the
+    others. The transaction is immediate, so two workers never lease the
+    same job.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the jobs database.
+        owner (str): ID of the worker.
+        lease_seconds (float): Seconds until the lease expires.
+
+    Returns:
+        tuple: The endpoint and the list of club IDs leased, or
+            (None, []) if there are no jobs to lease.
+    """
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Expired leases that ran out of attempts won't be leased again
+        connection.execute(
+            """UPDATE Jobs SET status = ?, leaseOwner = NULL, updatedAt = ?
+            WHERE status = ? AND leaseExpiry < ? AND attempts >= ?""",
+            (FAILED, now, LEASED, now, MAX_ATTEMPTS))
+
+        available = """(status = ? OR (status = ? AND leaseExpiry < ?))"""
+        first = connection.execute(
+            f"""SELECT endpoint FROM Jobs WHERE {available}
+            ORDER BY updatedAt LIMIT 1""", (PENDING, LEASED, now)).fetchone()
+        if first is None:
+            connection.execute("COMMIT")
+            return None, []
+
+        endpoint = first[0]
+        limit = (scrapper.CLUBS_PER_REQUEST if endpoint in BATCH_ENDPOINTS
+                 else 1)
+        club_ids = [row[0] for row in connection.execute(
+            f"""SELECT clubId FROM Jobs WHERE endpoint = ? AND {available}
+            ORDER BY updatedAt LIMIT ?""",
+            (endpoint, PENDING, LEASED, now, limit))]
+        connection.executemany(
+            """UPDATE Jobs SET status = ?, leaseOwner = ?, leaseExpiry = ?,
+                attempts = attempts + 1, updatedAt = ?
+            WHERE clubId = ? AND endpoint = ?""",
+            [(LEASED, owner, now + lease_seconds, now, club_id, endpoint)
+             for club_id in club_ids])
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return endpoint, club_ids
+
+
+def finish(connection: sqlite3.Connection, owner: str, endpoint: str,
+           club_ids: list, succeeded: bool):
+    """End the lease of some jobs. Successful jobs are done, failed ones go
+    back to pending until they run out of attempts. Only the jobs still
+    leased by the owner are changed: if the lease expired and another worker
+    took them, they are left to it.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the jobs database.
+        owner (str): ID of the worker that leased the jobs.
+        endpoint (str): The endpoint of the jobs.
+        club_ids (list): The IDs of the clubs of the jobs.
+        succeeded (bool): Whether the jobs succeeded.
+    """
+    now = time.time()
+    if succeeded:
+        status = f"'{DONE}'"
+    else:
+        status = (f"CASE WHEN attempts >= {MAX_ATTEMPTS} THEN '{FAILED}' "
+                  f"ELSE '{PENDING}' END")
+    connection.execute("BEGIN IMMEDIATE")
+    connection.executemany(
+        f"""UPDATE Jobs SET status = {status}, leaseOwner = NULL,
+            leaseExpiry = NULL, updatedAt = ?
+        WHERE clubId = ? AND endpoint = ? AND leaseOwner = ?""",
+        [(now, club_id, endpoint, owner) for club_id in club_ids])
+    connection.execute("COMMIT")
+
+
+def release(connection: sqlite3.Connection, owners: list) -> int:
+    """End the leases of the jobs of workers that stopped without finishing
+    them, like when their lease expires: they go back to pending until they
+    run out of attempts.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the jobs database.
+        owners (list): IDs of the workers.
+
+    Returns:
+        int: Number of jobs released.
+    """
+    placeholders = ", ".join(["?" for _ in owners])
+    connection.execute("BEGIN IMMEDIATE")
+    cursor = connection.execute(
+        f"""UPDATE Jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ?
+                END, leaseOwner = NULL, leaseExpiry = NULL, updatedAt = ?
+        WHERE status = ? AND leaseOwner IN ({placeholders})""",
+        [MAX_ATTEMPTS, FAILED, PENDING, time.time(), LEASED] + owners)
+    connection.execute("COMMIT")
+    return cursor.rowcount
+
+
+def count_jobs(connection: sqlite3.Connection) -> dict:
+    """Number of jobs in each status."""
+    stats = {status: 0 for status in [PENDING, LEASED, DONE, FAILED]}
+    stats.update(connection.execute(
+        "SELECT status, COUNT(*) FROM Jobs GROUP BY status"))
+    return stats
+
+
+def matches_rows(response: list) -> dict:
+    """Rows of the matches tables of a response of get_matches, and the
+    newest match, for the high-water mark.
+
+    Args:
+        response (list): The response.
+
+    Returns:
+        dict: The rows of each table. The key SyncState has the newest
+            match, if any.
+    """
+    rows = {table: [] for table in MATCH_TABLES}
+    for match in response:
+        scrapper.add_match_rows(rows, match)
+    if len(response) > 0:
+        newest = max(response, key=lambda match: int(match["timestamp"]))
+        rows["SyncState"] = [{"matchId": newest["matchId"],
+                              "timestamp": newest["timestamp"]}]
+    return rows
+
+
+def write_rows(connection: sqlite3.Connection, endpoint: str, club_id,
+               rows: dict):
+    """Write the rows of a response in a single transaction. The rows of the
+    matches already stored are skipped, and the summaries of the seasons of
+    the new ones are updated.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the data database.
+        endpoint (str): The endpoint of the response.
+        club_id: The ID of the club, or the IDs of the clubs of a batch.
+        rows (dict): The rows of each table.
+    """
+    sync_state = rows.pop("SyncState", [])
+    match_ids = {row["matchId"] for row in rows.get("Matches", [])}
+    if match_ids:
+        placeholders = ", ".join(["?" for _ in match_ids])
+        stored_ids = {row[0] for row in connection.execute(
+            f"SELECT matchId FROM Matches WHERE matchId IN ({placeholders})",
+            list(match_ids))}
+        for table in MATCH_TABLES:
+            rows[table] = [row for row in rows[table]
+                           if row["matchId"] not in stored_ids]
+
+    written = 0
+    with scrapper.METRICS.write(endpoint), connection:
+        cursor = connection.cursor()
+        for table, table_rows in rows.items():
+            written += scrapper.insert_rows(cursor, table, table_rows)
+        if "Matches" in rows:
+            summaries.update(connection, [row["matchId"]
+                                          for row in rows["Matches"]],
+                             summaries.SCRAPPER_COLUMNS)
+        if sync_state:
+            scrapper.update_sync_state(cursor, club_id, sync_state)
+        cursor.close()
+    scrapper.METRICS.count("rows", endpoint, written)
+
+
+def work(owner: str, jobs_database_file: str, queue: multiprocessing.Queue,
+         requests_per_second: float):
+    """Worker process: lease jobs, make the requests and send the rows to
+    the writer, until there are no jobs left.
+
+    Args:
+        owner (str): ID of the worker.
+        jobs_database_file (str): Path to the jobs database.
+        queue (multiprocessing.Queue): Queue of the writer.
+        requests_per_second (float): Maximum requests per second of this
+            worker.
+    """
+    # A client of its own, not the one inherited from the parent process
+    api_client = scrapper.make_client(
+        requests_per_second, burst=max(1, requests_per_second),
+        archive=archive.ResponseArchive(writer_id=owner.replace(":", "-")))
+    connection = connect(jobs_database_file)
+
+    while True:
+        endpoint, club_ids = lease(connection, owner)
+        if not club_ids:
+            if count_jobs(connection)[LEASED] == 0:
+                break
+            # Other workers may still fail and release jobs
+            time.sleep(IDLE_SECONDS)
+            continue
+
+        get_function, prepare_rows = ENDPOINTS[endpoint]
+        key = club_ids if endpoint in BATCH_ENDPOINTS else club_ids[0]
+        try:
+            rows = prepare_rows(key, get_function(key,
+                                                  api_client=api_client))
+        except Exception as e:
+            print(f"{owner} failed {endpoint} {club_ids}: {e}")
+            finish(connection, owner, endpoint, club_ids, False)
+            continue
+        queue.put((owner, endpoint, club_ids, key, rows))
+
+    connection.close()
+    queue.put(None)
+
+
+def write(database_file: str, jobs_database_file: str,
+          queue: multiprocessing.Queue, n_workers: int):
+    """Writer process: write the rows sent by the workers and mark their jobs
+    as done, until all the workers finished.
+
+    Args:
+        database_file (str): Path to the data database.
+        jobs_database_file (str): Path to the jobs database.
+        queue (multiprocessing.Queue): Queue of the writer.
+        n_workers (int): Number of workers sending rows.
+    """
+    connection = scrapper.connect(database_file)
+    jobs_connection = connect(jobs_database_file)
+    finished = 0
+    while finished < n_workers:
+        item = queue.get()
+        if item is None:
+            finished += 1
+            continue
+
+        owner, endpoint, club_ids, key, rows = item
+        try:
+            write_rows(connection, endpoint, key, rows)
+        except Exception as e:
+            print(f"Writer failed {endpoint} {club_ids}: {e}")
+            finish(jobs_connection, owner, endpoint, club_ids, False)
+            continue
+        finish(jobs_connection, owner, endpoint, club_ids, True)
+
+    jobs_connection.close()
+    database.checkpoint(connection)
+    connection.close()
+    scrapper.METRICS.export("work_queue")
+
+
+def run(database_file: str = scrapper.DATABASE_FILE,
+        jobs_database_file: str = JOBS_DATABASE_FILE, n_workers: int = 4,
+        requests_per_second: float = 10) -> dict:
+    """Run worker processes and a writer process on this machine until there
+    are no jobs left.
+
+    Args:
+        database_file (str): Path to the data database.
+        jobs_database_file (str): Path to the jobs database.
+        n_workers (int): Number of worker processes.
+        requests_per_second (float): Maximum requests per second of all the
+            workers of this machine.
+
+    Returns:
+        dict: Number of jobs in each status at the end, number of jobs
+            released because their process died, and the elapsed time in
+            seconds.
+    """
+    start = time.perf_counter()
+    # The rows waiting for the writer are bounded, so slow writes slow down
+    # the workers instead of filling the memory.
+    queue = multiprocessing.Queue(maxsize=4 * n_workers)
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    writer = multiprocessing.Process(
+        target=write, args=(database_file, jobs_database_file, queue,
+                            n_workers))
+    owners = {multiprocessing.Process(
+        target=work, args=(f"{host}:{i}", jobs_database_file, queue,
+                           requests_per_second / n_workers)): f"{host}:{i}"
+        for i in range(n_workers)}
+    for process in [writer] + list(owners):
+        process.start()
+
+    # The processes are watched instead of joined: a worker waits forever
+    # for room in the queue if the writer dies, and the writer waits forever
+    # for a worker that dies before saying it finished. The jobs leased by
+    # a process that died are released, instead of waiting for their leases
+    # to expire.
+    connection = connect(jobs_database_file)
+    released = 0
+    running = list(owners)
+    while writer.is_alive():
+        writer.join(WATCH_SECONDS)
+        for worker in [worker for worker in running
+                       if worker.exitcode is not None]:
+            running.remove(worker)
+            if worker.exitcode != 0:
+                print(f"Worker {owners[worker]} died ({worker.exitcode})")
+                released += release(connection, [owners[worker]])
+                queue.put(None)
+    if writer.exitcode != 0:
+        print(f"Writer died ({writer.exitcode}), stopping the workers")
+        for worker in running:
+            worker.terminate()
+    for worker in running:
+        worker.join()
+    # The rows sent to a writer that died were never written
+    released += release(connection, list(owners.values()))
+
+    stats = count_jobs(connection)
+    connection.close()
+    stats["released"] = released
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    """Enqueue jobs, work on them or show their status, with the options of
+    the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["enqueue", "work", "status"])
+    parser.add_argument("--database", default=scrapper.DATABASE_FILE)
+    parser.add_argument("--jobs", default=JOBS_DATABASE_FILE,
+                        help="Path to the jobs database, shared by all the "
+                             "machines.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=10,
+                        help="Maximum requests per second of this machine.")
+    args = parser.parse_args()
+
+    if args.command == "enqueue":
+        data_connection = scrapper.connect(args.database)
+        club_ids = scrapper.get_other_clubs(data_connection)
+        data_connection.close()
+        connection = connect(args.jobs)
+        print(f"{enqueue(connection, club_ids)} jobs queued for "
+              f"{len(club_ids)} clubs")
+        connection.close()
+    elif args.command == "work":
+        stats = run(args.database, args.jobs, args.workers, args.rate)
+        print(f"Finished in {stats.pop('elapsed'):.1f}s: {stats}")
+    else:
+        connection = connect(args.jobs)
+        print(count_jobs(connection))
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
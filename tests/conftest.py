@@ -0,0 +1,100 @@
+"""Fixtures shared by the tests.
+
+Usage:
+    python -m pytest -q
+"""
+import glob
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import src.migrate as migrate
+import src.mock_api as mock_api
+import src.scrapper as scrapper
+
+
+SQL_FOLDER = os.path.join(os.path.dirname(__file__), os.pardir, "sql")
+
+
+def create_app_tables(connection: sqlite3.Connection):
+    """Create the tables of the app database from the create_*.sql files,
+    like src.create_db does, and migrate them to the latest version."""
+    for file in sorted(glob.glob(os.path.join(SQL_FOLDER, "create_*.sql"))):
+        with open(file, "r") as f:
+            connection.executescript(f.read())
+    migrate.migrate(connection)
+
+
+@pytest.fixture
+def app_connection():
+    """Connection to an empty app database in memory."""
+    connection = sqlite3.connect(":memory:")
+    create_app_tables(connection)
+    yield connection
+    connection.close()
+
+
+def insert_row(connection: sqlite3.Connection, table: str, **values):
+    """Insert a row with the given values, and zeros or empty strings in the
+    other NOT NULL columns of the table."""
+    row = {}
+    for _, name, column_type, not_null, _, _ in connection.execute(
+            f"PRAGMA table_info({table})"):
+        if not_null:
+            row[name] = 0 if column_type in ("INTEGER", "REAL") else ""
+    row.update(values)
+    placeholders = ", ".join(["?" for _ in row])
+    connection.execute(
+        f"INSERT INTO {table} ({', '.join(row)}) VALUES ({placeholders})",
+        list(row.values()))
+
+
+@pytest.fixture
+def api_url(tmp_path, monkeypatch):
+    """URL of a local mock API, used by the scrapper during the test. The
+    test runs in tmp_path, so the cache, the archive and the metrics of the
+    scrapper are written there."""
+    server = mock_api.start_server(n_members=3, n_matches=3)
+    url = f"http://127.0.0.1:{server.server_port}/api/fifa"
+    monkeypatch.setattr(scrapper, "API_URL", url)
+    monkeypatch.setattr(scrapper, "_client", None)
+    monkeypatch.chdir(tmp_path)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answer each request with the next response of the script of the
+    server, or with an empty array once it runs out."""
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        status, headers, body = (self.server.responses.pop(0)
+                                 if self.server.responses
+                                 else (200, {}, b"[]"))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log every request."""
+
+
+@pytest.fixture
+def scripted_server():
+    """Local HTTP server that answers with the (status, headers, body)
+    appended to its responses list, and keeps the path and the headers of
+    each request in its requests list. Its address is in url."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    server.daemon_threads = True
+    server.responses = []
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
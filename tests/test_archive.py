@@ -0,0 +1,23 @@
+import gzip
+import os
+import src.archive as archive
+
+
+def test_read_records_skips_damaged_members(tmp_path):
+    response_archive = archive.ResponseArchive(str(tmp_path))
+    url = "https://proclubs.ea.com/api/fifa/clubs/matches"
+    for i in range(2):
+        response_archive.append(url, {"i": i}, b'{"i": %d}' % i)
+    path, = [os.path.join(folder, file)
+             for folder, _, files in os.walk(tmp_path) for file in files]
+    # A member cut in half by a crash, and two complete members after it
+    with open(path, "ab") as f:
+        f.write(gzip.compress(b'{"body": "torn"}\n')[:-12])
+        f.write(gzip.compress(b"not json\n"))
+        f.write(gzip.compress(b'{"body": {"i": 3}}\n'))
+
+    records = archive.read_records(path)
+    assert [record["body"] for record in records] == [
+        {"i": 0}, {"i": 1}, {"i": 3}]
+    assert records[0]["endpoint"] == "clubs/matches"
+    assert records[1]["params"] == {"i": 1}
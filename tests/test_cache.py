@@ -0,0 +1,95 @@
+import json
+import os
+from src.cache import ResponseCache
+from src.client import APIClient
+
+
+URL = "https://proclubs.ea.com/api/fifa/clubs/info"
+
+
+def test_put_get(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(URL, {"clubIds": 1, "platform": "ps5"}, b'{"a": 1}', '"v1"',
+              "Mon, 01 Jan 2024 00:00:00 GMT")
+    # The order and the types of the parameters don't matter
+    entry = cache.get(URL, {"platform": "ps5", "clubIds": "1"})
+    assert entry.body == b'{"a": 1}'
+    assert cache.is_fresh(URL, entry)
+    assert entry.validation_headers() == {
+        "If-None-Match": '"v1"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert cache.get(URL, {"clubIds": 2}) is None
+    assert cache.ttl("https://proclubs.ea.com/api/fifa/clubs/matches") == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=10 ** 6)
+    bodies = {club_id: os.urandom(1000) for club_id in range(3)}
+    for club_id, body in bodies.items():
+        cache.put(URL, {"clubIds": club_id}, body)
+        path = cache._path(URL, {"clubIds": club_id}) + ".gz"
+        os.utime(path, (club_id, club_id))
+    # Reading an entry makes it the most recently used
+    cache.get(URL, {"clubIds": 0})
+    cache.max_bytes = 2500
+    cache.evict()
+    assert cache.get(URL, {"clubIds": 1}) is None
+    assert cache.get(URL, {"clubIds": 0}).body == bodies[0]
+    assert cache.get(URL, {"clubIds": 2}).body == bodies[2]
+
+
+def test_aborted_writer_keeps_the_old_entry(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(URL, {}, b"old")
+    writer = cache.writer(URL, {})
+    writer.write(b"half of the n")
+    writer.abort()
+    assert cache.get(URL, {}).body == b"old"
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(cache._path(URL, {})) + extension
+        for extension in (".gz", ".json"))
+
+
+def test_client_revalidates_stale_entries(tmp_path, scripted_server):
+    cache = ResponseCache(str(tmp_path), ttls={"clubs/info": 60})
+    client = APIClient(requests_per_second=0, cache=cache)
+    url = scripted_server.url + "/api/fifa/clubs/info"
+    scripted_server.responses += [
+        (200, {"ETag": '"v1"'}, b'{"name": "Robson"}'),
+        (304, {}, b""),
+        (200, {"ETag": '"v2"'}, b'{"name": "Robson FC"}')]
+
+    assert client.get_json(url, {"clubIds": 1}) == {"name": "Robson"}
+    # Fresh, so the API isn't asked
+    assert client.get_json(url, {"clubIds": 1}) == {"name": "Robson"}
+    assert len(scripted_server.requests) == 1
+
+    def expire():
+        path = cache._path(url, {"clubIds": 1}) + ".json"
+        with open(path) as f:
+            meta = json.load(f)
+        meta["stored_at"] = 0
+        with open(path, "w") as f:
+            json.dump(meta, f)
+
+    expire()
+    assert client.get_json(url, {"clubIds": 1}) == {"name": "Robson"}
+    assert scripted_server.requests[1][1]["If-None-Match"] == '"v1"'
+    assert cache.is_fresh(url, cache.get(url, {"clubIds": 1}))
+
+    expire()
+    assert client.get_json(url, {"clubIds": 1}) == {"name": "Robson FC"}
+    assert cache.get(url, {"clubIds": 1}).etag == '"v2"'
+    assert len(scripted_server.requests) == 3
+
+
+def test_client_streams_into_the_cache(tmp_path, scripted_server):
+    cache = ResponseCache(str(tmp_path), ttls={"members/stats": 60})
+    client = APIClient(requests_per_second=0, cache=cache)
+    url = scripted_server.url + "/api/fifa/members/stats"
+    scripted_server.responses.append(
+        (200, {}, b'{"members": [{"name": "a"}, {"name": "b"}]}'))
+    for _ in range(2):
+        assert list(client.iter_json(url, {"clubId": 1}, "members")) == [
+            {"name": "a"}, {"name": "b"}]
+    assert len(scripted_server.requests) == 1
@@ -0,0 +1,70 @@
+import socket
+import time
+import pytest
+import requests
+from src.client import APIClient, TokenBucket
+
+
+def make_client(**kwargs) -> APIClient:
+    """Client without throttling or waits between the attempts."""
+    return APIClient(**{"requests_per_second": 0, "backoff": 0, **kwargs})
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=100, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(10):
+        bucket.acquire()
+    assert 0.09 <= time.monotonic() - start < 1
+
+
+def test_get_retries_server_errors(scripted_server):
+    scripted_server.responses += [
+        (503, {}, b""), (429, {"Retry-After": "0"}, b""),
+        (200, {}, b'{"ok": true}')]
+    client = make_client()
+    response = client.get(scripted_server.url + "/api/fifa/clubs/info",
+                          {"clubIds": 1})
+    assert response.json() == {"ok": True}
+    assert len(scripted_server.requests) == 3
+    report = client.latency_report()["/api/fifa/clubs/info"]
+    assert (report["requests"], report["errors"]) == (3, 2)
+
+
+def test_get_gives_up_after_the_retries(scripted_server):
+    scripted_server.responses += [(500, {}, b"")] * 3
+    with pytest.raises(requests.HTTPError):
+        make_client(max_retries=2).get(scripted_server.url + "/clubs/info")
+    assert len(scripted_server.requests) == 3
+
+
+def test_get_doesnt_retry_client_errors(scripted_server):
+    scripted_server.responses.append((404, {}, b""))
+    with pytest.raises(requests.HTTPError):
+        make_client().get(scripted_server.url + "/clubs/info")
+    assert len(scripted_server.requests) == 1
+
+
+def test_get_retries_connection_errors():
+    # A port that nothing listens on
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = make_client(max_retries=1)
+    with pytest.raises(requests.ConnectionError):
+        client.get(f"http://127.0.0.1:{port}/clubs/info")
+    assert client.latency_report()["/clubs/info"]["errors"] == 2
+
+
+def test_wait_time_respects_retry_after():
+    client = APIClient(backoff=1, max_backoff=5)
+    response = requests.Response()
+    response.headers["Retry-After"] = "3"
+    assert client._wait_time(0, response) == 3
+    response.headers["Retry-After"] = "60"
+    assert client._wait_time(0, response) == 5
+    assert all(0 <= client._wait_time(2) <= 4 for _ in range(20))
+    assert all(client._wait_time(10) <= 5 for _ in range(20))
@@ -0,0 +1,36 @@
+import pandas as pd
+import src.utils.club_info as club_info
+
+
+STADIUMS = pd.DataFrame({
+    "stadium_id": [409, 407, 500, 10],
+    "name": ["Arena  Robson", "Pavilhão 9", "Arena Robson", "Naranegra"],
+    "capacity": [41158, 37336, 1000, 2000],
+})
+
+
+def test_nearest_id_tie_goes_to_highest():
+    index = club_info.StadiumIndex(STADIUMS)
+    assert index.find_nearest_id(408)["stadium_id"] == 409
+
+
+def test_nearest_id():
+    index = club_info.StadiumIndex(STADIUMS)
+    assert index.find_nearest_id(407)["stadium_id"] == 407
+    assert index.find_nearest_id(0)["stadium_id"] == 10
+    assert index.find_nearest_id(10 ** 6)["stadium_id"] == 500
+    assert index.find_nearest_id(454)["stadium_id"] == 409
+    assert index.find_nearest_id(455)["stadium_id"] == 500
+
+
+def test_nearest_id_without_stadiums():
+    index = club_info.StadiumIndex(STADIUMS.iloc[0:0])
+    assert index.find_nearest_id(408) is None
+
+
+def test_find_by_name():
+    index = club_info.StadiumIndex(STADIUMS)
+    # The first stadium of the table with the normalised name
+    assert index.find_by_name("arena robson")["stadium_id"] == 409
+    assert index.find_by_name("PAVILHÃO")["stadium_id"] == 407
+    assert index.find_by_name("Maracanã") is None
@@ -0,0 +1,77 @@
+import asyncio
+import sqlite3
+import time
+import src.benchmark_scrapper as benchmark_scrapper
+import src.crawler as crawler
+import src.scrapper as scrapper
+
+
+def test_host_rate_limiter_spaces_requests_per_host():
+    limiter = crawler.HostRateLimiter(requests_per_second=50)
+
+    async def wait_all() -> dict:
+        start = time.monotonic()
+        waited = {}
+        for host in ["a", "a", "a", "b"]:
+            await limiter.wait(host)
+            waited[host] = time.monotonic() - start
+        return waited
+
+    waited = asyncio.run(wait_all())
+    assert 0.035 <= waited["a"] < 0.5
+    # The first request to another host doesn't wait
+    assert waited["b"] - waited["a"] < 0.01
+
+
+def crawl(database_file: str, **kwargs) -> crawler.Crawler:
+    connection = scrapper.connect(database_file)
+    club_ids = scrapper.get_other_clubs(connection)
+    connection.close()
+    club_crawler = crawler.Crawler(database_file, concurrency=4,
+                                   requests_per_second=0, **kwargs)
+    asyncio.run(club_crawler.crawl(club_ids))
+    return club_crawler
+
+
+def test_crawl_batches_club_endpoints(api_url, tmp_path):
+    database_file = str(tmp_path / "mock.db")
+    benchmark_scrapper.create_benchmark_database(database_file, 6)
+    club_crawler = crawl(database_file, batch_size=4)
+    # 2 batches of clubs/info and seasonalStats, and the members and
+    # matches of each club
+    assert club_crawler.stats["requests"] == 2 * 2 + 6 * 2
+    assert club_crawler.stats["responses"] == 16
+    assert club_crawler.stats["failed"] == 0
+
+    connection = sqlite3.connect(database_file)
+    assert connection.execute(
+        "SELECT COUNT(DISTINCT clubId) FROM Clubs").fetchone() == (6,)
+    assert connection.execute(
+        "SELECT COUNT(*) FROM Seasonals").fetchone() == (6,)
+    assert connection.execute(
+        "SELECT COUNT(*) FROM Players").fetchone()[0] >= 6 * 3
+    connection.close()
+
+
+def test_crawl_counts_failed_clubs(api_url, tmp_path):
+    database_file = str(tmp_path / "mock.db")
+    benchmark_scrapper.create_benchmark_database(database_file, 3)
+
+    def get_players(club_id, api_client=None):
+        if str(club_id) == "2":
+            raise ValueError("Unavailable")
+        return scrapper.get_players(club_id, api_client)
+
+    def insert_matches(connection, club_id, response):
+        if str(club_id) == "3":
+            raise sqlite3.IntegrityError("Broken")
+        scrapper.insert_matches(connection, club_id, response)
+
+    club_crawler = crawler.Crawler(database_file, requests_per_second=0)
+    club_crawler.club_endpoints = [(get_players, scrapper.insert_players),
+                                   (scrapper.get_matches, insert_matches)]
+    stats = asyncio.run(club_crawler.crawl(["1", "2", "3"]))
+    assert stats["failed"] == 2
+    assert (stats["requests"], stats["responses"]) == (2 + 3 * 2, 6)
+    assert {str(club_id) for club_id in club_crawler.failed_clubs} == {
+        "2", "3"}
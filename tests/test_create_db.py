@@ -0,0 +1,152 @@
+import os
+import shutil
+import sqlite3
+import pytest
+import src.create_db as create_db
+import tests.conftest as conftest
+
+
+def test_tokenize_skips_whitespace_commas_and_comments():
+    tokens = create_db.tokenize("-- dump\nVALUES (1, 'a'),\n(2.5, NULL);")
+    texts = ["".join(token) for token in tokens]
+    assert texts == ["VALUES", "(", "1", "'a'", ")", "(", "2.5", "NULL",
+                     ")", ";"]
+
+
+def test_parse_inserts_values():
+    sql = """
+        CREATE TABLE Clubs (clubId INTEGER, name TEXT);
+        INSERT INTO public."Clubs" (clubId, "name") VALUES
+            (1, 'Clube; do Robson'), (-2, 'O''Neil'), (3, NULL);
+        INSERT INTO Matches VALUES (1.5e2, TRUE, FALSE);
+    """
+    statements = list(create_db.parse_inserts(sql))
+    assert statements == [
+        ("Clubs", ["clubId", "name"],
+         [(1, "Clube; do Robson"), (-2, "O'Neil"), (3, None)]),
+        ("Matches", None, [(150.0, 1, 0)]),
+    ]
+
+
+def test_parse_inserts_malformed():
+    with pytest.raises(ValueError):
+        list(create_db.parse_inserts("INSERT INTO Clubs SELECT 1;"))
+
+
+def test_build_removes_temporary_file_on_error(tmp_path):
+    folder = tmp_path / "sql"
+    folder.mkdir()
+    (folder / "create_Clubs.sql").write_text(
+        "CREATE TABLE Clubs (clubId INTEGER);")
+    (folder / "insert_Missing.sql").write_text(
+        "INSERT INTO Missing VALUES (1);")
+    database_file = str(tmp_path / "app.db")
+    with pytest.raises(sqlite3.OperationalError):
+        create_db.build(database_file, str(folder), workers=1)
+    assert os.listdir(tmp_path) == ["sql"]
+
+
+@pytest.fixture
+def staged_connection():
+    """Database with a table T and a staging database attached with
+    another version of it."""
+    connection = sqlite3.connect(":memory:")
+    connection.execute("ATTACH DATABASE ':memory:' AS staging")
+    for schema in ("main", "staging"):
+        connection.execute(f"CREATE TABLE {schema}.T (a, b)")
+    yield connection
+    connection.close()
+
+
+def test_diff_table(staged_connection):
+    staged_connection.executemany(
+        "INSERT INTO main.T VALUES (?, ?)",
+        [(1, "x"), (2, None), (2, None), (3, "y")])
+    staged_connection.executemany(
+        "INSERT INTO staging.T VALUES (?, ?)",
+        [(1, "x"), (2, None), (3, "z"), (4, None), (4, None)])
+    deleted, inserted, columns = create_db.diff_table(staged_connection,
+                                                      "T")
+    deleted_rows = sorted(staged_connection.execute(
+        f"""SELECT a, b FROM main.T
+        WHERE rowid IN ({', '.join(map(str, deleted))})""").fetchall())
+    assert columns == ["a", "b"]
+    # One of the two equal rows is kept, and NULLs are equal
+    assert deleted_rows == [(2, None), (3, "y")]
+    assert sorted(inserted) == [(3, "z"), (4, None), (4, None)]
+
+
+def test_diff_table_without_changes(staged_connection):
+    for schema in ("main", "staging"):
+        staged_connection.executemany(
+            f"INSERT INTO {schema}.T VALUES (?, ?)", [(1, 1.5), (1, 1.5)])
+    assert create_db.diff_table(staged_connection, "T") == ([], [],
+                                                            ["a", "b"])
+
+
+@pytest.fixture
+def synced_file(tmp_path):
+    """Database built from a copy of the repository's dumps, which the test
+    can change before syncing."""
+    folder = tmp_path / "sql"
+    shutil.copytree(conftest.SQL_FOLDER, folder,
+                    ignore=shutil.ignore_patterns("mock"))
+    database_file = str(tmp_path / "app.db")
+    create_db.build(database_file, str(folder), workers=1)
+    return database_file
+
+
+def test_sync_without_changes_writes_nothing(synced_file, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("The database was copied")
+
+    monkeypatch.setattr(create_db, "lock", fail)
+    inode = os.stat(synced_file).st_ino
+    changes = create_db.sync(synced_file, os.path.join(
+        os.path.dirname(synced_file), "sql"), workers=1)
+    assert list(changes) == ["seconds"]
+    assert os.stat(synced_file).st_ino == inode
+    assert sorted(os.listdir(os.path.dirname(synced_file))) == [
+        "app.db", "sql"]
+
+
+@pytest.mark.parametrize("journal_mode", ["DELETE", "WAL"])
+def test_sync_locks_out_writers(synced_file, monkeypatch, journal_mode):
+    folder = os.path.join(os.path.dirname(synced_file), "sql")
+    with open(os.path.join(folder, "insert_Stadiums.sql"), "a") as f:
+        f.write("INSERT INTO Stadiums VALUES "
+                "(100000, 'Arena Robson', 1, 10, NULL, NULL);\n")
+    writer = sqlite3.connect(synced_file, timeout=0.1)
+    writer.execute(f"PRAGMA journal_mode = {journal_mode}")
+    insert = "INSERT INTO Stadiums (stadium_id) VALUES (100001)"
+    apply_changes = create_db.apply_changes
+    errors = []
+
+    def apply_while_writing(connection, staging_file):
+        try:
+            with writer:
+                writer.execute(insert)
+        except sqlite3.OperationalError as error:
+            errors.append(str(error))
+        return apply_changes(connection, staging_file)
+
+    monkeypatch.setattr(create_db, "apply_changes", apply_while_writing)
+    changes = create_db.sync(synced_file, folder, workers=1)
+    assert changes["Stadiums"] == {"deleted": 0, "inserted": 1}
+    assert errors == ["database is locked"]
+
+    # The writer still has the replaced file open
+    with pytest.raises(sqlite3.IntegrityError,
+                       match=create_db.REPLACED_MESSAGE):
+        with writer:
+            writer.execute(insert)
+    writer.close()
+
+    connection = sqlite3.connect(synced_file)
+    assert connection.execute(
+        "SELECT name FROM Stadiums WHERE stadium_id >= 100000"
+    ).fetchall() == [("Arena Robson",)]
+    assert connection.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger'"
+    ).fetchone() == (0,)
+    connection.close()
@@ -0,0 +1,74 @@
+import sqlite3
+import pyarrow as pa
+import pytest
+import src.export_parquet as export_parquet
+from conftest import create_app_tables, insert_row
+
+
+@pytest.fixture
+def connection(tmp_path):
+    """App database with the matches of two seasons. Arrow reads the rows
+    from its own thread."""
+    connection = sqlite3.connect(str(tmp_path / "app.db"),
+                                 check_same_thread=False)
+    create_app_tables(connection)
+    for match_id, season, goals in [("1", 1, 2), ("2", 1, 0), ("3", 2, 1)]:
+        insert_row(connection, "ClubsMatches", clubMatchId=match_id,
+                   clubId=10, matchId=match_id, seasonid=season,
+                   goals=goals)
+        insert_row(connection, "PlayersMatches",
+                   memberMatchId=match_id, matchId=match_id, clubid=10,
+                   name="robson", goals=goals, rating=7.5 + goals)
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def test_get_schema(connection):
+    schema = export_parquet.get_schema(
+        connection, """SELECT 1 AS number, 1.5 AS real UNION ALL
+        SELECT 2.5, 'a' UNION ALL SELECT NULL, NULL""")
+    assert schema.types == [pa.float64(), pa.string()]
+    schema = export_parquet.get_schema(connection,
+                                       "SELECT NULL AS empty, 'a' AS text")
+    assert schema.types == [pa.string(), pa.string()]
+
+
+def test_export_and_load_by_season(connection, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_parquet, "BATCH_ROWS", 2)
+    folder = str(tmp_path / "parquet")
+    queries = export_parquet.get_queries(connection)
+    assert export_parquet.export(connection, "ClubsMatches",
+                                 queries["ClubsMatches"], folder) == 3
+
+    table = export_parquet.load("ClubsMatches", folder,
+                                columns=["matchId", "goals", "seasonid"],
+                                filters=[("seasonid", "=", 1)])
+    assert sorted(table.to_pylist(), key=lambda row: row["matchId"]) == [
+        {"matchId": "1", "goals": 2, "seasonid": 1},
+        {"matchId": "2", "goals": 0, "seasonid": 1}]
+    # Exported again over the old files
+    export_parquet.export(connection, "ClubsMatches",
+                          queries["ClubsMatches"], folder)
+    assert export_parquet.load("ClubsMatches", folder).num_rows == 3
+
+
+def test_export_view(connection, tmp_path):
+    folder = str(tmp_path / "parquet")
+    export_parquet.export(connection, "PlayerSeasonStats",
+                          export_parquet.VIEWS["PlayerSeasonStats"], folder)
+    table = export_parquet.load("PlayerSeasonStats", folder,
+                                columns=["seasonid", "matches", "goals",
+                                         "rating"])
+    assert sorted(table.to_pylist(), key=lambda row: row["seasonid"]) == [
+        {"seasonid": 1, "matches": 2, "goals": 2, "rating": 8.5},
+        {"seasonid": 2, "matches": 1, "goals": 1, "rating": 8.5}]
+
+
+def test_export_empty_table(connection, tmp_path):
+    folder = tmp_path / "parquet"
+    assert export_parquet.export(connection, "Stadiums",
+                                 'SELECT * FROM "Stadiums"', str(folder)) == 0
+    table = export_parquet.load("Stadiums", str(folder))
+    assert table.num_rows == 0
+    assert "capacity" in table.column_names
@@ -0,0 +1,96 @@
+import sqlite3
+import pytest
+import src.import_pg_dump as import_pg_dump
+import tests.conftest as conftest
+
+
+CLUB_VALUES = ("'5456205', '234', '2021-01-16 15:02:40.338+00', "
+               "'2021-01-16 18:33:08.417+00', 'Estadio Mestalla', 0, 234, "
+               "99010107, '0', '11909822', '16234451', 0, 4078905, "
+               "16234451")
+
+# A function whose body and comments have odd quotes and semicolons, an
+# escape string, a COPY block, a multi-row INSERT with a string over two
+# lines, and a table that the app doesn't have
+DUMP = f"""--
+-- PostgreSQL database dump
+--
+
+SET standard_conforming_strings = on;
+
+CREATE FUNCTION public.touch() RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+BEGIN
+    -- Postgres' clock; not the client's
+    NEW."updatedAt" := now();
+    RETURN NEW;
+END;
+$$;
+
+COMMENT ON TABLE public."Clubes" IS E'O\\'Neil''s clubs; all';
+
+INSERT INTO public."Clubes" VALUES
+    (1, 'Clube; do Robson', {CLUB_VALUES}),
+    (2, 'O''Neil
+FC', {CLUB_VALUES});
+
+COPY public."Robsoners" (memberid, "proName", isfake, number) FROM stdin;
+10\tRob\\tson\tt\t\\N
+11\t\\N\tf\t7
+\\.
+
+COPY public."Logs" (id, message) FROM stdin;
+1\tstarted
+\\.
+
+INSERT INTO public."Logs" VALUES (2, 'done;');
+"""
+
+
+@pytest.mark.parametrize("line, quote, expected", [
+    ("INSERT INTO T VALUES ('a;', 'O''Neil');", None, None),
+    ("COMMENT ON TABLE T IS E'O\\'Neil''s", None, "E'"),
+    ("clubs; all';", "E'", None),
+    ("    AS $body$", None, "$body$"),
+    ("    -- it's; $$", "$body$", "$body$"),
+    ("$body$;", "$body$", None),
+    ("-- it's", None, None),
+    ("SELECT name$1, 'x' -- it's", None, None),
+])
+def test_open_quote(line, quote, expected):
+    assert import_pg_dump.open_quote(line, quote) == expected
+
+
+def test_iter_rows():
+    rows = list(import_pg_dump.iter_rows(DUMP.splitlines(keepends=True)))
+    assert [(table, row[:2]) for table, _, row in rows] == [
+        ("Clubes", (1, "Clube; do Robson")),
+        ("Clubes", (2, "O'Neil\nFC")),
+        ("Robsoners", ("10", "Rob\tson")),
+        ("Robsoners", ("11", None)),
+        ("Logs", ("1", "started")),
+        ("Logs", (2, "done;")),
+    ]
+    assert rows[2][1] == ["memberid", "proName", "isfake", "number"]
+
+
+def test_import_dump(tmp_path):
+    dump_file = tmp_path / "dump.sql"
+    dump_file.write_text(DUMP, encoding="utf-8")
+    database_file = str(tmp_path / "app.db")
+    counts = import_pg_dump.import_dump(str(dump_file), database_file,
+                                        conftest.SQL_FOLDER)
+    assert counts == {"skipped": 2, "Clubs": 2, "Robsoners": 2}
+
+    connection = sqlite3.connect(database_file)
+    assert connection.execute(
+        """SELECT clubId, name, regionId, iscustomteam, kitcolor1
+        FROM Clubs ORDER BY clubId""").fetchall() == [
+        (1, "Clube; do Robson", "5456205", 0, "0"),
+        (2, "O'Neil\nFC", "5456205", 0, "0")]
+    assert connection.execute(
+        """SELECT memberid, proName, isfake, number, name FROM Robsoners
+        ORDER BY memberid""").fetchall() == [
+        (10, "Rob\tson", 1, None, None), (11, None, 0, 7, None)]
+    connection.close()
@@ -0,0 +1,83 @@
+import sqlite3
+import pytest
+import src.create_mock_db as create_mock_db
+import src.mass_crawler as mass_crawler
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    mass_crawler.create_frontier(connection)
+    yield connection
+    connection.close()
+
+
+def statuses(connection) -> dict:
+    return dict(connection.execute(
+        "SELECT clubId, status FROM Frontier ORDER BY clubId"))
+
+
+def test_add_clubs_keeps_the_first_depth_and_the_limit(connection):
+    assert mass_crawler.add_clubs(connection, [1, 2, 2], 0, 5) == 2
+    assert mass_crawler.add_clubs(connection, ["2", 3, 4, 5, 6], 1, 5) == 3
+    assert dict(connection.execute(
+        "SELECT clubId, depth FROM Frontier")) == {
+        "1": 0, "2": 0, "3": 1, "4": 1, "5": 1}
+
+
+def test_claim_closest_clubs_first(connection):
+    mass_crawler.add_clubs(connection, [3], 1, 10)
+    mass_crawler.add_clubs(connection, [1, 2], 0, 10)
+    assert mass_crawler.claim_clubs(connection, 2) == {"1": 0, "2": 0}
+    assert mass_crawler.frontier_stats(connection)[
+        mass_crawler.IN_PROGRESS] == 2
+
+    # A new run takes the clubs that were in progress again
+    mass_crawler.create_frontier(connection)
+    assert mass_crawler.claim_clubs(connection, 10) == {"1": 0, "2": 0,
+                                                        "3": 1}
+
+
+def test_checkpoint(connection):
+    mass_crawler.add_clubs(connection, [1, 2], 0, 10)
+    mass_crawler.add_clubs(connection, [3], 1, 10)
+    clubs = mass_crawler.claim_clubs(connection, 10)
+    opponents = {"1": {"4", "2"}, "3": {"5"}}
+    added = mass_crawler.checkpoint(connection, clubs, {"2"}, opponents,
+                                    max_depth=1, max_clubs=10)
+    # The opponents of 3 are too far from the leaderboards
+    assert added == 1
+    assert statuses(connection) == {
+        "1": mass_crawler.DONE, "2": mass_crawler.PENDING,
+        "3": mass_crawler.DONE, "4": mass_crawler.PENDING}
+
+    for _ in range(mass_crawler.MAX_ATTEMPTS - 1):
+        clubs = mass_crawler.claim_clubs(connection, 10)
+        mass_crawler.checkpoint(connection, clubs, {"2"}, {}, 1, 10)
+    assert statuses(connection)["2"] == mass_crawler.FAILED
+    assert statuses(connection)["4"] == mass_crawler.DONE
+
+
+def test_run_resumes(api_url, tmp_path):
+    database_file = str(tmp_path / "mock.db")
+    create_mock_db.main(database_file)
+
+    def run(max_rounds=None) -> dict:
+        crawler = mass_crawler.MassCrawler(
+            database_file, max_clubs=6, max_depth=1, round_size=4,
+            requests_per_second=0)
+        return crawler.run(max_rounds)
+
+    stats = run(max_rounds=1)
+    assert (stats["rounds"], stats["clubs"], stats["discovered"]) == (1, 4, 6)
+    assert stats["frontier"][mass_crawler.PENDING] == 2
+
+    stats = run()
+    assert (stats["rounds"], stats["clubs"], stats["discovered"]) == (1, 2, 0)
+    assert stats["frontier"] == {
+        mass_crawler.PENDING: 0, mass_crawler.IN_PROGRESS: 0,
+        mass_crawler.DONE: 6, mass_crawler.FAILED: 0}
+    connection = sqlite3.connect(database_file)
+    assert connection.execute(
+        "SELECT COUNT(DISTINCT clubId) FROM Clubs").fetchone()[0] >= 6
+    connection.close()
@@ -0,0 +1,71 @@
+import json
+import src.create_mock_db as create_mock_db
+import src.metrics as metrics
+import src.mock_api as mock_api
+import src.scrapper as scrapper
+
+
+def test_histogram():
+    histogram = metrics.Histogram(buckets=(0.1, 1))
+    for value in [0.05, 0.1, 0.5, 3]:
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.cumulative_counts() == [2, 3, 4]
+    assert (histogram.count, histogram.total, histogram.max) == (4, 3.65, 3)
+
+
+def test_summary_rates():
+    run_metrics = metrics.Metrics()
+    run_metrics.observe("http", "clubs/info", 0.5)
+    run_metrics.observe("stream", "clubs/info", 1.5)
+    run_metrics.count("bytes", "clubs/info", 1000)
+    run_metrics.observe("write", "clubs/info", 0.25)
+    run_metrics.count("rows", "clubs/info", 10)
+    run_metrics.count("errors", "members/stats")
+    endpoints = run_metrics.summary()["endpoints"]
+    assert endpoints["clubs/info"]["bytes_per_second"] == 500
+    assert endpoints["clubs/info"]["rows_per_second"] == 40
+    assert endpoints["clubs/info"]["http"]["mean"] == 0.5
+    assert endpoints["members/stats"] == {"errors": 1}
+
+
+def test_prometheus_and_export(tmp_path):
+    run_metrics = metrics.Metrics()
+    run_metrics.observe("http", "clubs/info", 0.02)
+    run_metrics.observe("http", "clubs/info", 60)
+    run_metrics.count("rows", "clubs/info", 3)
+    lines = run_metrics.prometheus("test").splitlines()
+    assert 'test_http_seconds_bucket{endpoint="clubs/info",le="0.01"} 0' \
+        in lines
+    assert 'test_http_seconds_bucket{endpoint="clubs/info",le="0.025"} 1' \
+        in lines
+    assert 'test_http_seconds_bucket{endpoint="clubs/info",le="+Inf"} 2' \
+        in lines
+    assert 'test_http_seconds_count{endpoint="clubs/info"} 2' in lines
+    assert 'test_rows_total{endpoint="clubs/info"} 3' in lines
+    assert "# TYPE test_write_seconds histogram" in lines
+
+    prom_file, json_file = run_metrics.export("test", str(tmp_path))
+    with open(prom_file) as f:
+        assert f.read() == run_metrics.prometheus("test")
+    with open(json_file) as f:
+        assert json.load(f)["endpoints"]["clubs/info"]["rows"] == 3
+    assert len(run_metrics.export("test", str(tmp_path),
+                                  summary=False)) == 1
+
+
+def test_insert_matches_counts_only_new_rows(tmp_path, monkeypatch):
+    run_metrics = metrics.Metrics()
+    monkeypatch.setattr(scrapper, "METRICS", run_metrics)
+    database_file = str(tmp_path / "mock.db")
+    create_mock_db.main(database_file)
+    connection = scrapper.connect(database_file)
+    response = mock_api.matches_payload(1, n_matches=2, n_members=2)
+    for _ in range(2):
+        scrapper.insert_matches(connection, 1, response)
+    connection.close()
+
+    stats = run_metrics.summary()["endpoints"]["clubs/matches"]
+    # A match, its 2 clubs, their aggregates and their 2 players each
+    assert stats["rows"] == 2 * (1 + 2 + 2 + 2 * 2)
+    assert stats["write"]["count"] == 2
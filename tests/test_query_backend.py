@@ -0,0 +1,82 @@
+import sqlite3
+import pytest
+import src.export_parquet as export_parquet
+import src.query_backend as query_backend
+from conftest import create_app_tables, insert_row
+
+
+CLUB_ID = query_backend.PARAMETERS["seasons"][0]
+
+
+@pytest.fixture
+def database_file(tmp_path):
+    """App database with the matches of our club and an opponent in two
+    seasons, a match without season, and its Parquet exports."""
+    database_file = str(tmp_path / "app.db")
+    connection = sqlite3.connect(database_file, check_same_thread=False)
+    create_app_tables(connection)
+    matches = [("1", 1, 2, 1), ("2", 1, 0, 0), ("3", 2, 1, 3),
+               ("4", None, 5, 0)]
+    for match_id, season, goals, conceded in matches:
+        for club_id, scored, against in [(CLUB_ID, goals, conceded),
+                                         (1, conceded, goals)]:
+            insert_row(connection, "ClubsMatches",
+                       clubMatchId=f"{match_id}{club_id}", clubId=club_id,
+                       matchId=match_id, seasonid=season, goals=scored,
+                       goalsConceded=against)
+            for name in ["a", "b"]:
+                insert_row(connection, "PlayersMatches",
+                           memberMatchId=f"{match_id}{club_id}{name}",
+                           matchId=match_id, clubid=club_id,
+                           name=f"{name}{club_id}",
+                           goals=scored if name == "a" else 0,
+                           mom=int(name == "a"), rating=7.25)
+    connection.commit()
+    folder = str(tmp_path / "parquet")
+    for name, query in export_parquet.get_queries(connection).items():
+        export_parquet.export(connection, name, query, folder)
+    connection.close()
+    return database_file
+
+
+def run_all(backend) -> dict:
+    """The rows of every query, with the numbers as floats, since each
+    engine picks its own types for the sums and averages."""
+    results = {}
+    for name in query_backend.QUERIES:
+        columns, rows = query_backend.run_query(backend, name)
+        results[name] = (columns, [
+            tuple(float(value) if isinstance(value, (int, float))
+                  and not isinstance(value, bool) else value
+                  for value in row) for row in rows])
+    backend.close()
+    return results
+
+
+def test_sqlite_results(database_file):
+    results = run_all(query_backend.get_backend("sqlite", database_file))
+    assert results["seasons"][1] == [(1,), (2,)]
+    assert results["season_results"] == (
+        ["seasonid", "matches", "wins", "draws", "losses", "goals",
+         "goalsConceded"],
+        [(1, 2, 1, 1, 0, 2, 1), (2, 1, 0, 0, 1, 1, 3)])
+    assert results["player_season_stats"][1][0] == (
+        1, f"a{CLUB_ID}", 2, 2, 0, 2, 7.25)
+    assert results["season_tables"][1][:2] == [(1, CLUB_ID, 2, 4, 1),
+                                               (1, 1, 2, 1, -1)]
+    assert results["top_scorers"][1][0] == (f"a{CLUB_ID}", 4, 8)
+
+
+@pytest.mark.parametrize("parquet", [False, True])
+def test_duckdb_matches_sqlite(database_file, tmp_path, parquet):
+    pytest.importorskip("duckdb")
+    parquet_folder = str(tmp_path / "parquet") if parquet else None
+    duckdb_results = run_all(query_backend.get_backend(
+        "duckdb", database_file, parquet_folder))
+    assert duckdb_results == run_all(
+        query_backend.get_backend("sqlite", database_file))
+
+
+def test_sqlite_backend_cant_read_parquet(database_file, tmp_path):
+    with pytest.raises(ValueError):
+        query_backend.get_backend("sqlite", database_file, str(tmp_path))
@@ -0,0 +1,12 @@
+import src.check_query_plans as check_query_plans
+
+
+def test_queries_use_indexes(app_connection):
+    assert check_query_plans.find_scans(app_connection) == {}
+
+
+def test_scan_is_found(app_connection):
+    app_connection.execute("DROP INDEX ClubsClubId")
+    scans = check_query_plans.find_scans(app_connection)
+    assert "CLUB" in scans
+    assert all(step.startswith("SCAN ") for step in scans["CLUB"])
@@ -0,0 +1,105 @@
+import threading
+import time
+import pytest
+import src.create_mock_db as create_mock_db
+import src.scheduler as scheduler
+import src.scrapper as scrapper
+
+
+CLUB_ID = 1
+DAY = 24 * 60 * 60
+
+
+def test_max_staleness():
+    assert scheduler.max_staleness(60) == 60 * 60
+    assert scheduler.max_staleness(DAY) == 60 * 60
+    assert scheduler.max_staleness(DAY + 1) == 6 * 60 * 60
+    assert scheduler.max_staleness(365 * DAY) == 7 * DAY
+
+
+def test_scheduler_runs_and_reschedules_jobs(monkeypatch):
+    monkeypatch.setattr(scheduler, "RETRY_DELAY", 0.01)
+    job_scheduler = scheduler.Scheduler(workers=2)
+    runs = []
+    done = threading.Event()
+
+    def repeated():
+        runs.append("repeated")
+        return 0.01 if runs.count("repeated") < 3 else None
+
+    def failing():
+        runs.append("failing")
+        if runs.count("failing") < 2:
+            raise ValueError("Unavailable")
+        done.set()
+
+    job_scheduler.schedule("later", lambda: runs.append("later"), 0.2)
+    job_scheduler.schedule("repeated", repeated)
+    job_scheduler.schedule("failing", failing, 0.05)
+    thread = threading.Thread(target=job_scheduler.run)
+    thread.start()
+    assert done.wait(5)
+    time.sleep(0.3)
+    job_scheduler.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert runs.count("repeated") == 3
+    assert runs.count("failing") == 2
+    assert runs[-1] == "later"
+
+
+def test_match_poller_backs_off_without_new_matches(monkeypatch):
+    new_matches = [0, 0, 0, 0, 0, 0, 1, 0]
+    monkeypatch.setattr(scrapper, "update_matches",
+                        lambda club_id: new_matches.pop(0))
+    monkeypatch.setattr(scrapper, "update_players", lambda club_id: None)
+    monkeypatch.setattr(scrapper, "update_seasonals", lambda club_id: None)
+    poller = scheduler.MatchPoller(CLUB_ID)
+    intervals = [poller() for _ in range(8)]
+    assert intervals == [120, 240, 480, 960, 1800, 1800, 60, 120]
+
+
+@pytest.fixture
+def database_file(tmp_path, monkeypatch):
+    """Mock database where our club played 4 opponents: 2 and 3 a few
+    hours ago, 4 and 5 ten days ago. 3 and 5 were updated two hours ago."""
+    database_file = str(tmp_path / "mock.db")
+    create_mock_db.main(database_file)
+    connection = scrapper.connect(database_file)
+    now = int(time.time())
+    for opponent, played_ago in [(2, 3 * 60 * 60), (3, 2 * 60 * 60),
+                                 (4, 10 * DAY), (5, 10 * DAY + 1)]:
+        match_id = f"m{opponent}"
+        connection.execute(
+            "INSERT INTO Matches (matchId, timestamp) VALUES (?, ?)",
+            (match_id, now - played_ago))
+        connection.executemany(
+            "INSERT INTO ClubsMatches (clubId, matchId) VALUES (?, ?)",
+            [(str(CLUB_ID), match_id), (str(opponent), match_id)])
+    connection.executemany(
+        """INSERT INTO SyncState (clubId, matchType, updatedAt)
+        VALUES (?, ?, ?)""",
+        [(club_id, scrapper.MATCH_TYPE, now - 2 * 60 * 60)
+         for club_id in ["3", "5"]])
+    connection.commit()
+    connection.close()
+    monkeypatch.setattr(scrapper, "DATABASE_FILE", database_file)
+    return database_file
+
+
+def test_stale_opponents(database_file, monkeypatch):
+    refresher = scheduler.OpponentRefresher(scheduler.Scheduler(1),
+                                            CLUB_ID)
+    # 3 was updated longer ago than its budget of an hour, 5 within its
+    # budget of a week
+    assert refresher.stale_opponents() == ["3", "2", "4"]
+    # Already being refreshed
+    assert refresher.stale_opponents() == []
+
+    monkeypatch.setattr(scrapper, "update_clubs", lambda club_ids: None)
+    monkeypatch.setattr(scrapper, "update_players", lambda club_id: None)
+    monkeypatch.setattr(scrapper, "update_matches", lambda club_id: 0)
+    refresher.refresh(["3", "2", "4"])
+    # Refreshed, even if no match gave them a new high-water mark
+    assert refresher.stale_opponents() == []
+    assert set(refresher.refreshed_at) == {"2", "3", "4"}
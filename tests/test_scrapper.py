@@ -0,0 +1,91 @@
+import re
+import sqlite3
+import pytest
+import src.create_mock_db as create_mock_db
+import src.scrapper as scrapper
+
+
+CLUB_ID = 2654598
+
+
+@pytest.fixture
+def connection(tmp_path):
+    """Connection to an empty scrapper database."""
+    database_file = str(tmp_path / "mock.db")
+    create_mock_db.main(database_file)
+    connection = scrapper.connect(database_file)
+    yield connection
+    connection.close()
+
+
+def matches(*timestamps) -> list:
+    """Response of get_matches with a match at each timestamp, its ID being
+    the timestamp."""
+    return [{"matchId": str(timestamp), "timestamp": str(timestamp)}
+            for timestamp in timestamps]
+
+
+def match_ids(new_matches: list) -> list:
+    return [match["matchId"] for match in new_matches]
+
+
+def test_new_matches_without_sync_state(connection):
+    new_matches = scrapper.get_new_matches(connection, CLUB_ID,
+                                           matches(10, 30, 20))
+    assert match_ids(new_matches) == ["30", "20", "10"]
+
+
+def test_new_matches_stop_at_last_match(connection):
+    with connection:
+        scrapper.update_sync_state(connection.cursor(), CLUB_ID,
+                                   matches(10, 20))
+    new_matches = scrapper.get_new_matches(connection, CLUB_ID,
+                                           matches(5, 20, 30, 40))
+    assert match_ids(new_matches) == ["40", "30"]
+
+
+def test_new_matches_skip_stored(connection):
+    # Stored while updating the opponent
+    connection.execute(
+        "INSERT INTO Matches (matchId, timestamp) VALUES ('30', 30)")
+    new_matches = scrapper.get_new_matches(connection, CLUB_ID,
+                                           matches(20, 30, 40))
+    assert match_ids(new_matches) == ["40", "20"]
+
+
+def test_sync_state_of_other_match_type(connection):
+    with connection:
+        scrapper.update_sync_state(connection.cursor(), CLUB_ID,
+                                   matches(20), match_type="gameType13")
+    new_matches = scrapper.get_new_matches(connection, CLUB_ID,
+                                           matches(10, 20))
+    assert match_ids(new_matches) == ["20", "10"]
+
+
+def test_connect_migrates_text_schema(tmp_path):
+    # The tables of the mock database before the numbers were stored as
+    # numbers
+    database_file = str(tmp_path / "old.db")
+    create_mock_db.main(database_file)
+    connection = sqlite3.connect(database_file)
+    for table in ["Players", "Matches", "ClubsMatches", "PlayersMatches",
+                  "ClubsMatchesAgg"]:
+        sql, = connection.execute(
+            "SELECT sql FROM sqlite_master WHERE name = ?",
+            (table,)).fetchone()
+        connection.execute(f"DROP TABLE {table}")
+        connection.execute(re.sub(r" (INTEGER|REAL)\b", " TEXT", sql))
+    connection.execute("PRAGMA user_version = 0")
+    connection.executemany(
+        """INSERT INTO ClubsMatches (clubId, matchId, goals, goalsAgainst)
+        VALUES (?, ?, ?, ?)""", [("1", "a", "10", ""), ("1", "b", "9", "1")])
+    connection.commit()
+    connection.close()
+
+    connection = scrapper.connect(database_file)
+    assert connection.execute("PRAGMA user_version").fetchone() == (
+        len(create_mock_db.MIGRATIONS),)
+    assert connection.execute(
+        "SELECT matchId, goalsAgainst FROM ClubsMatches ORDER BY goals"
+    ).fetchall() == [("b", 1), ("a", None)]
+    connection.close()
@@ -0,0 +1,49 @@
+import json
+import pytest
+import src.streaming as streaming
+
+
+def split(data: bytes, size: int) -> list:
+    """Chunks of size bytes of data."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+MATCHES = [{"matchId": str(i), "clubs": {"1": {"goals": str(i)}},
+            "name": "Pavilhão 9"} for i in range(20)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 4096])
+def test_iter_array_across_chunks(size):
+    body = json.dumps(MATCHES, ensure_ascii=False).encode()
+    assert list(streaming.iter_array(split(body, size))) == MATCHES
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_iter_array_with_key(size):
+    body = json.dumps({"positionCount": {"goalkeeper": 1},
+                       "members": MATCHES, "after": []}).encode()
+    assert list(streaming.iter_array(split(body, size),
+                                     key="members")) == MATCHES
+
+
+def test_iter_array_missing_key():
+    body = json.dumps({"positionCount": {}}).encode()
+    assert list(streaming.iter_array([body], key="members")) == []
+
+
+def test_iter_array_empty():
+    assert list(streaming.iter_array([b" [ ] "])) == []
+
+
+def test_iter_array_not_an_array():
+    with pytest.raises(ValueError):
+        list(streaming.iter_array([b'{"members": []}']))
+
+
+def test_reader_values():
+    reader = streaming.JSONStreamReader(split(b' "a" , 12.5 true', 2))
+    assert reader.value() == "a"
+    assert reader.expect(",") == ","
+    assert reader.value() == 12.5
+    assert reader.peek() == "t"
+    assert reader.value() is True
@@ -0,0 +1,112 @@
+import random
+import pytest
+import src.create_mock_db as create_mock_db
+import src.scrapper as scrapper
+import src.summaries as summaries
+from conftest import insert_row
+
+
+@pytest.fixture(params=["app", "scrapper"])
+def database(request, tmp_path):
+    """Connection to an empty app or scrapper database, and the names of its
+    columns."""
+    if request.param == "app":
+        yield (request.getfixturevalue("app_connection"),
+               summaries.APP_COLUMNS)
+        return
+    database_file = str(tmp_path / "mock.db")
+    create_mock_db.main(database_file)
+    connection = scrapper.connect(database_file)
+    yield connection, summaries.SCRAPPER_COLUMNS
+    connection.close()
+
+
+def add_match(database: tuple, match_id: str, season: int, clubs: dict):
+    """Insert a match of two clubs, with the goals and players of each
+    club."""
+    connection, columns = database
+    (home, (home_goals, home_players)), (away, (away_goals, away_players)) \
+        = clubs.items()
+    for club_id, goals, conceded, players in [
+            (home, home_goals, away_goals, home_players),
+            (away, away_goals, home_goals, away_players)]:
+        # Only the app tables have a key of their own
+        club_keys = player_keys = {}
+        if columns is summaries.APP_COLUMNS:
+            club_keys = {"clubMatchId": f"{match_id}{club_id}"}
+        insert_row(connection, "ClubsMatches", clubId=club_id,
+                   matchId=match_id, goals=goals, **club_keys,
+                   **{columns["goals_conceded"]: conceded,
+                      columns["season"]: season})
+        for name, player_goals, rating in players:
+            if columns is summaries.APP_COLUMNS:
+                player_keys = {"memberMatchId": f"{match_id}{name}"}
+            insert_row(connection, "PlayersMatches", matchId=match_id,
+                       goals=player_goals, assists=player_goals // 2,
+                       mom=int(rating > 8), rating=rating, **player_keys,
+                       **{columns["player"]: name,
+                          columns["player_club"]: club_id})
+
+
+def random_match(rng: random.Random, match_id: str) -> tuple:
+    """Arguments of add_match for a random match of 3 clubs in 2 seasons."""
+    home, away = rng.sample([1, 2, 3], 2)
+    clubs = {}
+    for club_id in (home, away):
+        players = [(f"player{club_id}{i}", rng.randint(0, 2),
+                    round(rng.uniform(5, 10), 1))
+                   for i in rng.sample(range(4), 2)]
+        clubs[club_id] = (rng.randint(0, 4), players)
+    return match_id, rng.choice([1, 2, None]), clubs
+
+
+def read_summaries(connection) -> dict:
+    return {table: connection.execute(
+                f"SELECT * FROM {table} ORDER BY 1, 2, 3").fetchall()
+            for table in summaries.TABLES}
+
+
+def test_update_matches_rebuild(database):
+    connection, columns = database
+    rng = random.Random(7)
+    for batch in range(5):
+        match_ids = []
+        for i in range(6):
+            match_id = f"{batch}{i:02}"
+            add_match(database, *random_match(rng, match_id))
+            match_ids.append(match_id)
+        summaries.update(connection, match_ids, columns)
+    incremental = read_summaries(connection)
+
+    summaries.rebuild(connection, columns)
+    assert read_summaries(connection) == incremental
+    assert len(incremental["SeasonClubSummary"]) > 0
+
+
+def test_update_removes_keys_without_matches(database):
+    connection, columns = database
+    add_match(database, "1", 1, {1: (2, [("a", 2, 9.0)]),
+                                 2: (1, [("b", 1, 7.0)])})
+    summaries.update(connection, ["1"], columns)
+    keys = summaries.get_keys(connection, ["1"], columns)
+    connection.execute("DELETE FROM ClubsMatches")
+    summaries.refresh(connection, keys, columns)
+    assert read_summaries(connection) == {
+        "SeasonClubSummary": [], "PlayerSeasonSummary": []}
+
+
+def test_season_record(database):
+    connection, columns = database
+    add_match(database, "1", 5, {1: (3, [("a", 2, 9.0)]),
+                                 2: (1, [("b", 1, 6.0)])})
+    add_match(database, "2", 5, {1: (0, [("a", 0, 7.0)]),
+                                 2: (0, [])})
+    summaries.update(connection, ["1", "2"], columns)
+    assert connection.execute(
+        """SELECT matches, wins, draws, losses, goals, goalsConceded
+        FROM SeasonClubSummary WHERE seasonid = 5 AND clubId = 1"""
+    ).fetchone() == (2, 1, 1, 0, 3, 1)
+    assert connection.execute(
+        """SELECT matches, goals, assists, mom, rating
+        FROM PlayerSeasonSummary WHERE name = 'a'""").fetchone() == (
+            2, 2, 1, 1, 8.0)
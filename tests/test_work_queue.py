@@ -0,0 +1,118 @@
+import threading
+import pytest
+import src.benchmark_scrapper as benchmark_scrapper
+import src.work_queue as work_queue
+
+
+@pytest.fixture
+def jobs_file(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def status(connection, club_id: str, endpoint: str = "members/stats"):
+    return connection.execute(
+        """SELECT status, leaseOwner, attempts FROM Jobs
+        WHERE clubId = ? AND endpoint = ?""", (club_id, endpoint)).fetchone()
+
+
+def test_rollback_journal(jobs_file):
+    connection = work_queue.connect(jobs_file)
+    assert connection.execute("PRAGMA journal_mode").fetchone() == (
+        "delete",)
+    connection.close()
+
+
+def test_connections_never_lease_the_same_job(jobs_file):
+    connection = work_queue.connect(jobs_file)
+    work_queue.enqueue(connection, range(40), ["members/stats"])
+    connection.close()
+
+    leased = []
+
+    def lease_all(owner: str):
+        connection = work_queue.connect(jobs_file)
+        while True:
+            _, club_ids = work_queue.lease(connection, owner)
+            if not club_ids:
+                break
+            leased.extend(club_ids)
+        connection.close()
+
+    threads = [threading.Thread(target=lease_all, args=(f"worker{i}",))
+               for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(leased, key=int) == [str(i) for i in range(40)]
+
+
+def test_batch_endpoints_lease_many_clubs(jobs_file):
+    connection = work_queue.connect(jobs_file)
+    work_queue.enqueue(connection, range(15), ["clubs/info"])
+    first = work_queue.lease(connection, "worker")
+    second = work_queue.lease(connection, "worker")
+    assert first[0] == "clubs/info"
+    assert len(first[1]) == 10 and len(second[1]) == 5
+    assert work_queue.lease(connection, "worker") == (None, [])
+    connection.close()
+
+
+def test_expired_lease_is_leased_again(jobs_file):
+    first = work_queue.connect(jobs_file)
+    second = work_queue.connect(jobs_file)
+    work_queue.enqueue(first, [1], ["members/stats"])
+
+    assert work_queue.lease(first, "first", lease_seconds=60) == (
+        "members/stats", ["1"])
+    # Not expired yet
+    assert work_queue.lease(second, "second") == (None, [])
+
+    first.execute("UPDATE Jobs SET leaseExpiry = 0")
+    assert work_queue.lease(second, "second") == ("members/stats", ["1"])
+    assert status(second, "1") == (work_queue.LEASED, "second", 2)
+
+    # The first worker lost the lease, so its result is ignored
+    work_queue.finish(first, "first", "members/stats", ["1"], False)
+    assert status(second, "1") == (work_queue.LEASED, "second", 2)
+    work_queue.finish(second, "second", "members/stats", ["1"], True)
+    assert status(second, "1") == (work_queue.DONE, None, 2)
+    first.close()
+    second.close()
+
+
+def test_expired_lease_out_of_attempts_fails(jobs_file):
+    connection = work_queue.connect(jobs_file)
+    work_queue.enqueue(connection, [1], ["members/stats"])
+    for attempt in range(work_queue.MAX_ATTEMPTS):
+        assert work_queue.lease(connection, "worker",
+                                lease_seconds=-1)[1] == ["1"]
+    assert work_queue.lease(connection, "worker") == (None, [])
+    assert status(connection, "1") == (work_queue.FAILED, None,
+                                       work_queue.MAX_ATTEMPTS)
+    connection.close()
+
+
+def test_release(jobs_file):
+    connection = work_queue.connect(jobs_file)
+    work_queue.enqueue(connection, [1, 2], ["members/stats"])
+    work_queue.lease(connection, "dead")
+    work_queue.lease(connection, "alive")
+    assert work_queue.release(connection, ["dead"]) == 1
+    assert status(connection, "1") == (work_queue.PENDING, None, 1)
+    assert status(connection, "2") == (work_queue.LEASED, "alive", 1)
+    connection.close()
+
+
+def test_run(api_url, tmp_path, jobs_file):
+    database_file = str(tmp_path / "mock.db")
+    benchmark_scrapper.create_benchmark_database(database_file, 6)
+    connection = work_queue.connect(jobs_file)
+    assert work_queue.enqueue(connection, range(1, 7)) == 24
+    connection.close()
+
+    stats = work_queue.run(database_file, jobs_file, n_workers=2,
+                           requests_per_second=1000)
+    assert stats[work_queue.DONE] == 24
+    assert stats[work_queue.FAILED] == 0
+    assert stats["released"] == 0